@@ -0,0 +1,533 @@
+# Copyright 2017-2023 Lawrence Livermore National Security, LLC and other
+# Hatchet Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+
+import copy
+from operator import attrgetter
+
+import numpy as np
+
+from .node import EditCounter, traversal_order
+
+
+def _edit_counts(nodes):
+    """Share an EditCounter with the nodes that have none, and return the
+    current count of the counters of all the nodes.
+
+    Return:
+        (list): (counter, count) pairs
+    """
+    counters = set(map(attrgetter("_edits"), nodes))
+    if None in counters:
+        counters.discard(None)
+        counter = EditCounter()
+        for node in nodes:
+            if node._edits is None:
+                node._edits = counter
+        counters.add(counter)
+    return [(counter, counter.count) for counter in counters]
+
+
+class CompactGraph:
+    """Array-based view of the topology of a Graph.
+
+    Every node of the graph is assigned a position, which is its index in
+    the preorder traversal of the graph (``Graph.traverse()``). All arrays
+    are indexed by position, so metric data laid out in traversal order can
+    be combined with the topology using NumPy operations instead of walking
+    Node objects.
+
+    The children and parents of every node are stored in CSR form: the
+    children of the node at position ``i`` are at the positions
+    ``child_indices[child_offsets[i]:child_offsets[i + 1]]``, and likewise
+    for ``parent_offsets`` and ``parent_indices``. ``nids`` holds the
+    ``_hatchet_nid`` of every node, and ``depth`` and ``frame_ids`` are
+    computed on first use.
+
+    A CompactGraph is a snapshot: it has to be rebuilt when the graph is
+    modified. ``Graph.compact()`` caches one per graph, and rebuilds it
+    once the parents or children of one of its nodes were replaced or added
+    to (see ``is_current``).
+
+    Arguments:
+        graph (Graph): the graph to build the arrays for
+    """
+
+    def __init__(self, graph):
+        sorted_roots = sorted(graph.roots, key=traversal_order)
+        nodes = self._depth_first_search(sorted_roots)
+        self._edit_counts = _edit_counts(nodes)
+        self.nodes = np.empty(len(nodes), dtype=object)
+        self.nodes[:] = nodes
+        self.nids = np.fromiter(
+            (n._hatchet_nid for n in nodes), dtype=np.int64, count=len(nodes)
+        )
+
+        # CSR representation of the children of each node, in the order in
+        # which they appear in node.children
+        child_counts = np.fromiter(
+            (len(n.children) for n in nodes), dtype=np.int64, count=len(nodes)
+        )
+        self.child_offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(child_counts, out=self.child_offsets[1:])
+        self.child_indices = np.fromiter(
+            (self._pos_by_id[id(c)] for n in nodes for c in n.children),
+            dtype=np.int64,
+            count=int(self.child_offsets[-1]),
+        )
+        self.roots = np.array(
+            [self._pos_by_id[id(r)] for r in sorted_roots], dtype=np.int64
+        )
+        self._root_order = np.array(
+            [self._pos_by_id[id(r)] for r in graph.roots], dtype=np.int64
+        )
+
+        # parents are the transpose of the children, ordered by parent
+        # position for every node
+        edge_order = np.argsort(self.child_indices, kind="stable")
+        self.parent_indices = self.edge_parents[edge_order]
+        self.parent_offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.child_indices, minlength=len(nodes)),
+            out=self.parent_offsets[1:],
+        )
+
+        # an edge is a back edge (i.e., closes a cycle) if its target is an
+        # ancestor of its source in the spanning tree
+        sources = self.edge_parents
+        targets = self.child_indices
+        self.is_acyclic = not np.any(
+            (targets <= sources) & (sources < self.tree_end[targets])
+        )
+
+        self._depth = None
+        self._frame_ids = None
+        self._height = None
+
+    @classmethod
+    def from_forest(cls, nodes, parents, depth):
+        """Build the arrays of a forest without traversing its nodes.
+
+        Arguments:
+            nodes (ndarray): the nodes of the forest in the order of
+                ``Graph.traverse()``, i.e., in preorder with roots and
+                children sorted in traversal order
+            parents (ndarray): the position of the parent of every node, or
+                -1 for roots
+            depth (ndarray): the depth of every node
+        """
+        self = cls.__new__(cls)
+        num_nodes = len(nodes)
+        positions = np.arange(num_nodes, dtype=np.int64)
+        self.nodes = nodes
+        self.nids = np.fromiter(
+            (n._hatchet_nid for n in nodes), dtype=np.int64, count=num_nodes
+        )
+        self._pos_by_id = dict(zip(map(id, nodes), range(num_nodes)))
+        self._edit_counts = _edit_counts(nodes)
+
+        # in preorder, the children of every node come in increasing order
+        # of position, and every node has at most one parent
+        is_child = parents >= 0
+        children = positions[is_child]
+        self.child_indices = children[np.argsort(parents[is_child], kind="stable")]
+        self.child_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(parents[is_child], minlength=num_nodes),
+            out=self.child_offsets[1:],
+        )
+        self.roots = positions[~is_child]
+        self._root_order = self.roots
+        self.parent_indices = parents[is_child]
+        self.parent_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(is_child, out=self.parent_offsets[1:])
+        self.is_acyclic = True
+
+        # subtree sizes, accumulated from the deepest nodes up
+        size = np.ones(num_nodes, dtype=np.int64)
+        for level in reversed(self._levels(depth, children)):
+            np.add.at(size, parents[level], size[level])
+        self.tree_parent = parents
+        self.tree_depth = depth
+        self.tree_end = positions + size
+        # a node is left after all the nodes of its subtree, which end at
+        # the same position only if they are deeper
+        self.postorder = np.lexsort((-depth, self.tree_end))
+
+        self._depth = depth
+        self._frame_ids = None
+        self._height = None
+        return self
+
+    def with_nodes(self, nodes):
+        """Return the arrays of a copy of the graph made of other nodes.
+
+        The arrays are shared with this CompactGraph. Only the nodes are
+        replaced, and the nids become the positions, as assigned by
+        ``Graph.enumerate_traverse()``.
+
+        Arguments:
+            nodes (list): the nodes of the copy, in the positions of the
+                nodes they are copied from
+        """
+        other = copy.copy(self)
+        other.nodes = np.empty(len(nodes), dtype=object)
+        other.nodes[:] = nodes
+        other._edit_counts = _edit_counts(nodes)
+        other.nids = np.arange(len(nodes), dtype=np.int64)
+        other._pos_by_id = dict(zip(map(id, nodes), range(len(nodes))))
+        return other
+
+    def has_equal_siblings(self):
+        """True if two roots, or two children of a node, have equal frames.
+
+        The traversal order of such siblings depends on the identity of the
+        nodes, so it may differ in a copy of the graph.
+        """
+        num_frames = len(self.frames)
+        keys = np.concatenate(
+            (
+                self.frame_ids[self.roots],
+                (self.edge_parents + 1) * num_frames
+                + self.frame_ids[self.child_indices],
+            )
+        )
+        return len(np.unique(keys)) < len(keys)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def is_current(self):
+        """True if the parents and children of the nodes were not replaced
+        or added to since the arrays were built."""
+        return all(counter.count == count for counter, count in self._edit_counts)
+
+    @property
+    def edge_parents(self):
+        """Position of the parent of every edge in ``child_indices``."""
+        return np.repeat(np.arange(len(self.nodes)), np.diff(self.child_offsets))
+
+    def _depth_first_search(self, roots):
+        """Assign positions to the nodes reachable from roots and label the
+        depth-first spanning tree of the graph.
+
+        Nodes are visited in the same order as ``Graph.traverse()``, so the
+        nodes discovered from a node form a contiguous range of positions.
+        ``tree_end[i]`` is the (exclusive) end of that range for the node at
+        position ``i``, and ``tree_parent[i]`` is the node it was discovered
+        from (-1 for roots).
+
+        Return:
+            (list): the nodes in preorder
+        """
+        nodes = []
+        pos_by_id = {}
+        tree_parent = []
+        tree_depth = []
+        tree_end = []
+        postorder = []
+
+        for root in roots:
+            if id(root) in pos_by_id:
+                continue
+            pos_by_id[id(root)] = len(nodes)
+            nodes.append(root)
+            tree_parent.append(-1)
+            tree_depth.append(0)
+            tree_end.append(-1)
+            stack = [(len(nodes) - 1, iter(root.sorted_children()))]
+            while stack:
+                pos, children = stack[-1]
+                for child in children:
+                    if id(child) not in pos_by_id:
+                        cpos = len(nodes)
+                        pos_by_id[id(child)] = cpos
+                        nodes.append(child)
+                        tree_parent.append(pos)
+                        tree_depth.append(tree_depth[pos] + 1)
+                        tree_end.append(-1)
+                        stack.append((cpos, iter(child.sorted_children())))
+                        break
+                else:
+                    stack.pop()
+                    tree_end[pos] = len(nodes)
+                    postorder.append(pos)
+
+        self._pos_by_id = pos_by_id
+        self.tree_parent = np.array(tree_parent, dtype=np.int64)
+        self.tree_depth = np.array(tree_depth, dtype=np.int64)
+        self.tree_end = np.array(tree_end, dtype=np.int64)
+        self.postorder = np.array(postorder, dtype=np.int64)
+        return nodes
+
+    def positions(self, nodes):
+        """Return the positions of the given nodes in this graph.
+
+        Nodes are looked up by identity first and by ``_hatchet_nid``
+        otherwise. Nodes that are not part of the graph get position -1.
+        """
+        pos = np.fromiter(
+            (self._pos_by_id.get(id(n), -1) for n in nodes),
+            dtype=np.int64,
+            count=len(nodes),
+        )
+        missing = pos < 0
+        if missing.any():
+            pos[missing] = self.nid_positions(
+                np.fromiter(
+                    (n._hatchet_nid for n in np.asarray(nodes, dtype=object)[missing]),
+                    dtype=np.int64,
+                )
+            )
+        return pos
+
+    def nid_positions(self, nids):
+        """Return the positions of the nodes with the given ``_hatchet_nid``
+        values in this graph, or -1 for the values of no node."""
+        nids = np.asarray(nids, dtype=np.int64)
+        if not len(self.nids):
+            return np.full(len(nids), -1, dtype=np.int64)
+        order = np.argsort(self.nids, kind="stable")
+        sorted_nids = self.nids[order]
+        found = np.searchsorted(sorted_nids, nids)
+        found[found == len(sorted_nids)] = 0
+        return np.where(sorted_nids[found] == nids, order[found], -1)
+
+    @property
+    def in_degree(self):
+        """Number of edges leading to every node."""
+        return np.diff(self.parent_offsets)
+
+    @property
+    def depth(self):
+        """Depth of every node, as assigned by ``Graph.enumerate_depth()``.
+
+        Roots have depth 0, and every other node is one deeper than the
+        node it is first reached from in a depth-first search that follows
+        ``node.children`` in order.
+        """
+        if self._depth is None:
+            depth = [-1] * len(self.nodes)
+            visited = [False] * len(self.nodes)
+            offsets = self.child_offsets.tolist()
+            children = self.child_indices.tolist()
+            for root in self._root_order.tolist():
+                depth[root] = 0
+                stack = [(root, iter(children[offsets[root] : offsets[root + 1]]))]
+                while stack:
+                    pos, remaining = stack[-1]
+                    for c in remaining:
+                        if not visited[c]:
+                            visited[c] = True
+                            depth[c] = depth[pos] + 1
+                            stack.append(
+                                (c, iter(children[offsets[c] : offsets[c + 1]]))
+                            )
+                            break
+                    else:
+                        stack.pop()
+            self._depth = np.array(depth, dtype=np.int64)
+        return self._depth
+
+    @property
+    def frame_ids(self):
+        """Dense integer id of the frame of every node.
+
+        Nodes with equal frames get the same id, and ``frames[i]`` is the
+        frame with id ``i``.
+        """
+        if self._frame_ids is None:
+            self._intern_frames()
+        return self._frame_ids
+
+    @property
+    def frames(self):
+        """Distinct frames of the graph, indexed by frame id."""
+        if self._frame_ids is None:
+            self._intern_frames()
+        return self._frames
+
+    def _intern_frames(self):
+        ids = {}
+        self._frame_ids = np.fromiter(
+            (ids.setdefault(n.frame, len(ids)) for n in self.nodes),
+            dtype=np.int64,
+            count=len(self.nodes),
+        )
+        self._frames = list(ids)
+
+    def is_tree(self):
+        """True if the graph has a single root and every other node is
+        reached by exactly one edge."""
+        if len(self.roots) > 1:
+            return False
+        expected = np.ones(len(self.nodes), dtype=np.int64)
+        expected[self.roots] = 0
+        return np.array_equal(self.in_degree, expected)
+
+    def sum_children(self, values):
+        """Sum the values of the children of every node.
+
+        NaNs count as zero, and a child is added once for every edge that
+        leads to it. Children are added in the order of ``node.children``.
+
+        Arguments:
+            values (ndarray): 2D float array with one row per position
+
+        Return:
+            (ndarray): 2D float array of the same shape as values
+        """
+        result = np.zeros_like(values)
+        np.add.at(result, self.edge_parents, np.nan_to_num(values[self.child_indices]))
+        return result
+
+    @property
+    def height(self):
+        """Length of the longest path from every node to a leaf (acyclic
+        graphs only)."""
+        if self._height is None:
+            height = [0] * len(self.nodes)
+            offsets = self.child_offsets.tolist()
+            children = self.child_indices.tolist()
+            for pos in self.postorder.tolist():
+                for c in children[offsets[pos] : offsets[pos + 1]]:
+                    if height[c] >= height[pos]:
+                        height[pos] = height[c] + 1
+            self._height = np.array(height, dtype=np.int64)
+        return self._height
+
+    @staticmethod
+    def _levels(keys, selection):
+        """Split the indices in selection into groups of equal keys, in
+        increasing order of keys."""
+        order = selection[np.argsort(keys[selection], kind="stable")]
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        return np.split(order, bounds) if len(order) else []
+
+    def _exception_roots(self):
+        """Compute, for every node, the subtrees reachable from it that are
+        not part of its own spanning subtree.
+
+        Subtrees of the spanning tree are nested or disjoint, so each set of
+        reachable nodes is stored as the (minimal) list of spanning subtree
+        roots that cover it. Only valid for acyclic graphs.
+        """
+        end = self.tree_end
+        offsets = self.child_offsets
+        exceptions = [()] * len(self.nodes)
+
+        for pos in self.postorder:
+            children = self.child_indices[offsets[pos] : offsets[pos + 1]]
+            if not len(children):
+                continue
+            lo, hi = pos, end[pos]
+            candidates = []
+            for c in children:
+                if not (lo <= c < hi):
+                    candidates.append(c)
+                candidates.extend(e for e in exceptions[c] if not (lo <= e < hi))
+            if not candidates:
+                continue
+            # drop candidates contained in the subtree of another candidate
+            kept = []
+            reach = -1
+            for c in sorted(set(candidates)):
+                if c >= reach:
+                    kept.append(c)
+                    reach = end[c]
+            exceptions[pos] = tuple(kept)
+
+        return exceptions
+
+    def reduce_descendants(self, values, function="sum"):
+        """Reduce values over the distinct descendants of every node.
+
+        For every node, combine the values of the node and of every node
+        reachable from it, counting each reachable node exactly once.
+        Only valid for acyclic graphs.
+
+        Arguments:
+            values (ndarray): 2D float array with one row per position
+            function (str): one of "sum", "min" or "max". NaNs are ignored;
+                the result is NaN only if all combined values are NaN.
+
+        Return:
+            (ndarray): 2D float array of the same shape as values
+        """
+        reduction = _Reduction(values, function)
+
+        # accumulate spanning subtrees bottom-up, one level at a time
+        nonroots = np.flatnonzero(self.tree_parent >= 0)
+        for level in self._levels(-self.tree_depth, nonroots):
+            reduction.accumulate(self.tree_parent[level], level)
+
+        # add the subtrees that are reachable through non-tree edges
+        if not np.array_equal(self.tree_parent[self.child_indices], self.edge_parents):
+            exceptions = self._exception_roots()
+            owners = np.repeat(np.arange(len(self.nodes)), [len(e) for e in exceptions])
+            if len(owners):
+                subtrees = np.fromiter(
+                    (e for exc in exceptions for e in exc),
+                    dtype=np.int64,
+                    count=len(owners),
+                )
+                reduction.accumulate(owners, subtrees)
+
+        return reduction.result()
+
+    def reduce_subtrees(self, values, function="sum"):
+        """Reduce values over the subtrees of every node.
+
+        Children are combined into their parents in reverse topological
+        order, so a node with several parents is counted once for each
+        path that reaches it. This is exact for trees. Only valid for
+        acyclic graphs.
+
+        Arguments:
+            values (ndarray): 2D float array with one row per position
+            function (str): one of "sum", "min" or "max". NaNs are ignored;
+                the result is NaN only if all combined values are NaN.
+
+        Return:
+            (ndarray): 2D float array of the same shape as values
+        """
+        reduction = _Reduction(values, function)
+
+        # a node's height is larger than the height of all of its children,
+        # so the edges leaving nodes of the same height can be combined in
+        # one batch once all lower heights are done
+        parents = self.edge_parents
+        edges = np.arange(len(parents))
+        for level in self._levels(self.height[parents], edges):
+            reduction.accumulate(parents[level], self.child_indices[level])
+
+        return reduction.result()
+
+
+class _Reduction:
+    """Running reduction of the rows of a 2D array, ignoring NaNs."""
+
+    _ufuncs = {"sum": np.add, "min": np.fmin, "max": np.fmax}
+
+    def __init__(self, values, function):
+        self.ufunc = self._ufuncs[function]
+        if function == "sum":
+            # count the non-NaN values, so that all-NaN sums stay NaN
+            present = ~np.isnan(values)
+            self.values = np.where(present, values, 0.0)
+            self.counts = present.astype(np.int64)
+        else:
+            self.values = values.copy()
+            self.counts = None
+
+    def accumulate(self, targets, sources):
+        """Combine the rows at sources into the rows at targets."""
+        self.ufunc.at(self.values, targets, self.values[sources])
+        if self.counts is not None:
+            np.add.at(self.counts, targets, self.counts[sources])
+
+    def result(self):
+        if self.counts is not None:
+            self.values[self.counts == 0] = np.nan
+        return self.values
@@ -44,8 +44,7 @@ cpdef fast_not_isin(const unsigned long long[:,:] arr1, const unsigned long long
                 result[arr1[i][1]] = True
             else:
                 result[arr1[i][1]] = False
-
-    prior = arr1[i][0]
+        prior = arr1[i][0]
 
     return result
 
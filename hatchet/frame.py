@@ -14,6 +14,8 @@ class Frame:
        attrs (dict): dictionary of attributes and values
     """
 
+    __slots__ = ("attrs", "_tuple_repr", "_hash", "_id")
+
     def __init__(self, attrs=None, **kwargs):
         """Construct a frame from a dictionary, or from immediate kwargs.
 
@@ -47,8 +49,15 @@ class Frame:
             self.attrs["type"] = "None"
 
         self._tuple_repr = None
+        self._hash = None
+        self._id = None
 
     def __eq__(self, other):
+        if self is other:
+            return True
+        # hashes are cached, so this rejects most unequal frames quickly
+        if hash(self) != hash(other):
+            return False
         return self.tuple_repr == other.tuple_repr
 
     def __lt__(self, other):
@@ -58,7 +67,9 @@ class Frame:
         return self.tuple_repr > other.tuple_repr
 
     def __hash__(self):
-        return hash(self.tuple_repr)
+        if self._hash is None:
+            self._hash = hash(self.tuple_repr)
+        return self._hash
 
     def __str__(self):
         """str() with sorted attributes, so output is deterministic."""
@@ -67,6 +78,12 @@ class Frame:
     def __repr__(self):
         return "Frame(%s)" % self
 
+    @property
+    def pool_id(self):
+        """Dense integer id of this frame in the FramePool that created it,
+        or None if it was not created by a pool."""
+        return self._id
+
     @property
     def tuple_repr(self):
         """Make a tuple of attributes and values based on reader."""
@@ -89,3 +106,51 @@ class Frame:
             return tuple(self.attrs.get(name) for name in names)
         else:
             return self.attrs.get(names)
+
+
+class FramePool:
+    """A table of unique frames.
+
+    Readers create one Frame per node, but most frames of a large profile
+    are repeats of a much smaller set (the same function, loop or
+    statement in different calling contexts). A FramePool returns the
+    same Frame object for equal attributes, so repeated frames share one
+    attrs dictionary and one cached hash, and equal frames compare by
+    identity. Every frame in the pool also gets a dense integer id, in
+    order of first appearance.
+
+    Frames from a pool are shared between nodes and must not be modified.
+    """
+
+    def __init__(self):
+        self._frames = {}
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __iter__(self):
+        return iter(self._frames.values())
+
+    def intern(self, attrs):
+        """Return the frame with the given attributes, creating it if it is
+        not in the pool yet.
+
+        Arguments:
+            attrs (dict): dictionary of attributes for the frame
+
+        Return:
+            (Frame): the unique frame with these attributes
+        """
+        if not attrs:
+            raise ValueError("Frame must be constructed with attributes!")
+        if "type" not in attrs:
+            attrs = dict(attrs, type="None")
+        key = tuple(sorted(attrs.items()))
+
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = Frame(dict(attrs))
+            frame._tuple_repr = key
+            frame._id = len(self._frames)
+            self._frames[key] = frame
+        return frame
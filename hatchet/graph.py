@@ -4,10 +4,21 @@
 # SPDX-License-Identifier: MIT
 
 from collections import defaultdict
+import gc
 
+import numpy as np
+
+from .compact_graph import CompactGraph
 from .node import Node, traversal_order, node_traversal_order
 
 
+def _object_array(objects):
+    """Make a 1D object array from a list, even if it holds sequences."""
+    array = np.empty(len(objects), dtype=object)
+    array[:] = objects
+    return array
+
+
 def index_by(attr, objects):
     """Put objects into lists based on the value of an attribute.
 
@@ -25,8 +36,42 @@ class Graph:
 
     def __init__(self, roots):
         assert roots is not None
+        self._compact = None
         self.roots = roots
         self.node_ordering = False
+        # set when GraphFrames in copy-on-write mode share this graph, which
+        # they then copy before modifying (see GraphFrame.own_graph)
+        self.shared = False
+
+    @property
+    def roots(self):
+        return self._roots
+
+    @roots.setter
+    def roots(self, roots):
+        self._roots = roots
+        self.invalidate_cache()
+
+    def compact(self):
+        """Return the array representation of this graph.
+
+        The :class:`~hatchet.compact_graph.CompactGraph` is built on first
+        use and cached until the graph changes: it is rebuilt when the roots
+        are replaced, or when the parents or children of one of its nodes
+        were replaced or added to.
+        """
+        compact = self._compact
+        if compact is None or not compact.is_current():
+            compact = self._compact = CompactGraph(self)
+        return compact
+
+    def invalidate_cache(self):
+        """Drop the cached array representation of this graph.
+
+        Code that modifies the lists of roots, parents or children of an
+        existing graph in place must call this afterwards.
+        """
+        self._compact = None
 
     def traverse(self, order="pre", attrs=None, visited=None):
         """Preorder traversal of all roots of this Graph.
@@ -38,6 +83,19 @@ class Graph:
 
         Only preorder traversal is currently supported.
         """
+        # without a visited dict to fill in, the node order can be taken
+        # from the cached array representation
+        compact = self._compact
+        if visited is None and compact is not None and compact.is_current():
+            if order not in ("pre", "post"):
+                raise ValueError("order must be one of 'pre' or 'post'")
+            nodes = (
+                compact.nodes if order == "pre" else compact.nodes[compact.postorder]
+            )
+            for node in nodes:
+                yield node if attrs is None else node.frame.values(attrs)
+            return
+
         # share visited dict so that we visit each node at most once.
         if visited is None:
             visited = {}
@@ -47,6 +105,25 @@ class Graph:
             for value in root.traverse(order=order, attrs=attrs, visited=visited):
                 yield value
 
+    def traversal_nids(self, order="pre"):
+        """Return the ``_hatchet_nid`` of every node of this Graph, in the
+        order in which ``traverse()`` visits them.
+
+        Arguments:
+            order (str): "pre" or "post" for preorder or postorder
+                (default: pre)
+
+        Return:
+            (ndarray): integer array of node ids
+        """
+        if order not in ("pre", "post"):
+            raise ValueError("order must be one of 'pre' or 'post'")
+
+        compact = self.compact()
+        if order == "pre":
+            return compact.nids.copy()
+        return compact.nids[compact.postorder]
+
     def node_order_traverse(self, order="pre", attrs=None, visited=None):
         """Preorder traversal of all roots of this Graph, sorting by "node order" column.
 
@@ -71,12 +148,7 @@ class Graph:
 
     def is_tree(self):
         """True if this graph is a tree, false otherwise."""
-        if len(self.roots) > 1:
-            return False
-
-        visited = {}
-        list(self.traverse(visited=visited))
-        return all(v == 1 for v in visited.values())
+        return self.compact().is_tree()
 
     def find_merges(self):
         """Find nodes that have the same parent and frame.
@@ -93,7 +165,7 @@ class Graph:
         inverted_merges = defaultdict(
             lambda: []
         )  # merged_node -> list of corresponding old_nodes
-        processed = []
+        processed = set()
 
         def _find_child_merges(node_list):
             index = index_by("frame", node_list)
@@ -125,14 +197,22 @@ class Graph:
                 nodes = []
                 for node_to_merge in inverted_merges[new_node]:
                     nodes.extend(node_to_merge.children)
-                processed.extend(inverted_merges[new_node])
+                processed.update(inverted_merges[new_node])
             # If node is not going to be merged, simply get the list of
             # node's children.
             else:
                 nodes = node.children
-                processed.append(node)
+                processed.add(node)
             _find_child_merges(nodes)
 
+        # a merge target can itself be merged into another node later on.
+        # Point every node at its final target; targets always have a
+        # smaller id than the nodes merged into them, so this terminates.
+        for node, target in merges.items():
+            while merges.get(target, target) is not target:
+                target = merges[target]
+            merges[node] = target
+
         return merges
 
     def merge_nodes(self, merges):
@@ -150,13 +230,29 @@ class Graph:
         def transform(node_list):
             return sorted(set(merges.get(n, n) for n in node_list))
 
+        # collect the parents and children of all nodes merged into each
+        # target, then relink every affected node once
+        merged_into = defaultdict(lambda: [])
         for old, new in merges.items():
-            new.parents = transform(new.parents + old.parents)
-            for parent in new.parents:
-                parent.children = transform(parent.children)
-            new.children = transform(new.children + old.children)
-            for child in new.children:
-                child.parents = transform(child.parents)
+            if old is not new:
+                merged_into[new].append(old)
+
+        targets = set(merges.values())
+        neighbor_parents = {}
+        neighbor_children = {}
+        for new in targets:
+            olds = merged_into.get(new, ())
+            new.parents = transform(new.parents + [p for o in olds for p in o.parents])
+            new.children = transform(
+                new.children + [c for o in olds for c in o.children]
+            )
+            neighbor_parents.update((id(p), p) for p in new.parents)
+            neighbor_children.update((id(c), c) for c in new.children)
+
+        for parent in neighbor_parents.values():
+            parent.children = transform(parent.children)
+        for child in neighbor_children.values():
+            child.parents = transform(child.parents)
         self.roots = transform(self.roots)
 
     def normalize(self):
@@ -175,20 +271,46 @@ class Graph:
         if old_to_new is None:
             old_to_new = {}
 
-        # first pass creates new nodes
-        for node in self.traverse():
-            old_to_new[node] = node.copy()
-
-        # second pass hooks up parents and children
-        for old, new in old_to_new.items():
-            for old_parent in old.parents:
-                new.parents.append(old_to_new[old_parent])
-            for old_child in old.children:
-                new.children.append(old_to_new[old_child])
-
-        graph = Graph([old_to_new[r] for r in self.roots])
+        compact = self.compact()
+        old_nodes = compact.nodes.tolist()
+
+        # the collector would scan the graph over and over while the nodes
+        # are allocated, and they are all reachable anyway
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            # the copies start out numbered in traversal order, like
+            # enumerate_traverse numbers them
+            depth = compact.depth.tolist()
+            new_nodes = [
+                Node(node.frame.copy(), hnid=i, depth=d)
+                for i, (node, d) in enumerate(zip(old_nodes, depth))
+            ]
+            old_to_new.update(zip(old_nodes, new_nodes))
+
+            # hook up the children along the edges of this graph, and the
+            # parents of every node that are part of it (nodes shared with
+            # other graphs may have parents outside of it)
+            position = compact._pos_by_id
+            child_offsets = compact.child_offsets.tolist()
+            children = [new_nodes[c] for c in compact.child_indices.tolist()]
+            for i, (old, new) in enumerate(zip(old_nodes, new_nodes)):
+                new.children = children[child_offsets[i] : child_offsets[i + 1]]
+                new.parents = [
+                    new_nodes[position[id(p)]] for p in old.parents if id(p) in position
+                ]
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        graph = Graph([new_nodes[position[id(r)]] for r in self.roots])
         graph.node_ordering = self.node_ordering
-        graph.enumerate_traverse()
+        if self.node_ordering or compact.has_equal_siblings():
+            graph.enumerate_traverse()
+        else:
+            # frames decide the traversal order of all siblings, so the copy
+            # is traversed like the original and can share its arrays
+            graph._compact = compact.with_nodes(new_nodes)
 
         return graph
 
@@ -201,13 +323,223 @@ class Graph:
         Arguments:
             other (Graph): another Graph
             old_to_new (dict, optional): if provided, this dictionary will
-                be populated with mappings from old node -> new node
+                be populated with mappings from id(old node) -> new node
 
         Return:
             (Graph): new Graph containing all nodes and edges from self and other
         """
-        if old_to_new is None:
-            old_to_new = {}  # mapping from old nodes to new nodes
+        graph, self_map, other_map = self.union_map(other)
+        if old_to_new is not None:
+            for compact, node_map in (
+                (self.compact(), self_map),
+                (other.compact(), other_map),
+            ):
+                old_to_new.update(zip(map(id, compact.nodes), node_map))
+        return graph
+
+    def union_map(self, other):
+        """Create the union of self and other, and map the nodes of both
+        graphs to the nodes of the union (see ``union_many``).
+
+        Arguments:
+            other (Graph): another Graph
+
+        Return:
+            (tuple): the new Graph, and arrays with the new node of every node of self and other, indexed by their positions in ``self.compact()`` and ``other.compact()``
+        """
+        graph, node_maps = Graph.union_many([self, other])
+        return (graph,) + tuple(node_maps)
+
+    @staticmethod
+    def union_many(graphs):
+        """Create the union of any number of graphs in one pass, and map the
+        nodes of every graph to the nodes of the union.
+
+        Nodes are merged if they are reached from corresponding parents (or
+        are roots) and have equal frames. Forests whose siblings have
+        distinct frames are merged by path: every node is identified by the
+        sequence of frames from its root, interned one level at a time with
+        array operations. Other graphs are merged recursively, two at a time.
+
+        Arguments:
+            graphs (list): the Graphs to merge
+
+        Return:
+            (tuple): the new Graph, and a list with, for every graph, an array of the new node of each of its nodes, indexed by their positions in ``graph.compact()``
+        """
+        graphs = list(graphs)
+        if not graphs:
+            raise ValueError("union_many() requires at least one graph")
+
+        result = Graph._union_paths(graphs)
+        if result is not None:
+            return result
+
+        old_to_new = {}
+        if len(graphs) == 1:
+            graph = graphs[0].copy(old_to_new)
+            return graph, [
+                _object_array([old_to_new[n] for n in graphs[0].compact().nodes])
+            ]
+
+        # fold the graphs into the union, and follow every node through the
+        # successive unions
+        graph = graphs[0]._union_merge(graphs[1], old_to_new)
+        node_maps = [
+            _object_array([old_to_new[id(n)] for n in g.compact().nodes])
+            for g in graphs[:2]
+        ]
+        for other in graphs[2:]:
+            old_to_new = {}
+            merged = graph._union_merge(other, old_to_new)
+            node_maps = [
+                _object_array([old_to_new[id(n)] for n in node_map])
+                for node_map in node_maps
+            ]
+            node_maps.append(
+                _object_array([old_to_new[id(n)] for n in other.compact().nodes])
+            )
+            graph = merged
+        return graph, node_maps
+
+    @staticmethod
+    def _union_paths(graphs):
+        """Union of forests by path (see ``union_many``).
+
+        Return:
+            (tuple): as ``union_many``, or None if a graph is not a forest or has siblings with equal frames
+        """
+        compacts = [g.compact() for g in graphs]
+        for compact in compacts:
+            in_degree = compact.in_degree
+            if in_degree[compact.roots].any() or (
+                in_degree.sum() != len(compact) - len(compact.roots)
+            ):
+                return None
+
+        # ids of the distinct frames of all graphs, and their sort order
+        frame_ids = {}
+        gids = [
+            np.array(
+                [frame_ids.setdefault(f, len(frame_ids)) for f in c.frames],
+                dtype=np.int64,
+            )[c.frame_ids]
+            for c in compacts
+        ]
+        frames = list(frame_ids)
+        frame_rank = np.empty(len(frames), dtype=np.int64)
+        frame_rank[sorted(range(len(frames)), key=lambda i: frames[i].tuple_repr)] = (
+            np.arange(len(frames))
+        )
+
+        # all nodes of the first graph, then all nodes of the second, etc.
+        bounds = np.zeros(len(compacts) + 1, dtype=np.int64)
+        np.cumsum([len(c) for c in compacts], out=bounds[1:])
+        owner = np.repeat(np.arange(len(compacts)), np.diff(bounds))
+        nodes = np.concatenate([c.nodes for c in compacts])
+        frame = np.concatenate(gids)
+        parent = np.concatenate(
+            [
+                np.where(c.tree_parent >= 0, c.tree_parent + offset, -1)
+                for c, offset in zip(compacts, bounds[:-1].tolist())
+            ]
+        )
+        depth = np.concatenate([c.tree_depth for c in compacts])
+
+        # path id of every node, assigned one depth at a time from the
+        # (path id of the parent, frame id) pairs. The first node with a path
+        # represents it, so the nodes of earlier graphs come first.
+        path = np.empty(len(nodes), dtype=np.int64)
+        path_parent = []
+        representative = []
+        level_bounds = [0]
+        for level in CompactGraph._levels(depth, np.arange(len(nodes))):
+            parent_path = np.where(
+                parent[level] >= 0, path[np.maximum(parent[level], 0)], -1
+            )
+            keys = (parent_path + 1) * len(frames) + frame[level]
+            unique_keys, first, inverse = np.unique(
+                keys, return_index=True, return_inverse=True
+            )
+            # siblings with equal frames in the same graph
+            by_owner = np.lexsort((keys, owner[level]))
+            same = np.diff(keys[by_owner]) == 0
+            same &= np.diff(owner[level][by_owner]) == 0
+            if same.any():
+                return None
+            path[level] = level_bounds[-1] + inverse
+            path_parent.append(parent_path[first])
+            representative.append(level[first])
+            level_bounds.append(level_bounds[-1] + len(unique_keys))
+        if len(level_bounds) == 1:
+            return Graph([]), [nodes[:0] for c in compacts]
+        path_parent = np.concatenate(path_parent)
+        representative = np.concatenate(representative)
+        path_frame = frame[representative]
+        levels = [
+            np.arange(start, end) for start, end in zip(level_bounds, level_bounds[1:])
+        ]
+
+        # preorder position of every path, with children (and roots) sorted
+        # by frame as the recursive merge does: the size of the subtrees of
+        # the earlier siblings gives the offset from the parent
+        subtree = np.ones(len(path_parent), dtype=np.int64)
+        for level in reversed(levels[1:]):
+            np.add.at(subtree, path_parent[level], subtree[level])
+        order = np.lexsort((frame_rank[path_frame], path_parent))
+        sizes = subtree[order]
+        before = np.cumsum(sizes) - sizes
+        siblings = path_parent[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = siblings[1:] != siblings[:-1]
+        offset = np.empty(len(order), dtype=np.int64)
+        offset[order] = before - before[np.flatnonzero(first)][np.cumsum(first) - 1]
+        position = offset.copy()
+        for level in levels[1:]:
+            position[level] = position[path_parent[level]] + 1 + offset[level]
+        preorder = np.empty_like(position)
+        preorder[position] = np.arange(len(position))
+
+        # create the new nodes in preorder, already numbered
+        path_depth = np.repeat(np.arange(len(levels)), np.diff(level_bounds))
+        new_nodes = _object_array(
+            [
+                Node(n.frame.copy(), hnid=i, depth=d)
+                for i, (n, d) in enumerate(
+                    zip(
+                        nodes[representative[preorder]].tolist(),
+                        path_depth[preorder].tolist(),
+                    )
+                )
+            ]
+        )
+        new_parents = path_parent[preorder]
+        new_parents = np.where(new_parents >= 0, position[new_parents], -1)
+        new_roots = []
+        node_list = new_nodes.tolist()
+        for child, p in zip(node_list, new_parents.tolist()):
+            if p < 0:
+                new_roots.append(child)
+            else:
+                new_parent = node_list[p]
+                new_parent.add_child(child)
+                child.add_parent(new_parent)
+
+        graph = Graph(new_roots)
+        graph._compact = CompactGraph.from_forest(
+            new_nodes, new_parents, path_depth[preorder]
+        )
+        graph._compact._frame_ids = path_frame[preorder]
+        graph._compact._frames = frames
+        new_nodes = new_nodes[position]
+        return graph, [
+            new_nodes[path[start:end]]
+            for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+        ]
+
+    def _union_merge(self, other, old_to_new):
+        """Union of two graphs by recursively merging the sorted children of
+        corresponding nodes (see ``union_many``)."""
 
         def _merge(self_children, other_children, parent):
             """Recursively merge children of self and other.
@@ -343,28 +675,27 @@ class Graph:
         return graph
 
     def enumerate_depth(self):
-        def _iter_depth(node, visited):
-            for child in node.children:
-                if child not in visited:
-                    visited.add(child)
-                    # depth of child is depth of node + 1
-                    child._depth = node._depth + 1
-                    _iter_depth(child, visited)
-
-        visited = set()
-        for root in self.roots:
-            root._depth = 0  # depth of root node is 0
-            _iter_depth(root, visited)
+        compact = self.compact()
+        for node, depth in zip(compact.nodes, compact.depth.tolist()):
+            node._depth = depth
 
     def enumerate_traverse(self):
+        # nodes may have been rewired since the last enumeration. Rebuild
+        # the arrays up front, so that the traversals below can use them.
+        self.invalidate_cache()
+        if not self.node_ordering:
+            self.compact()
+
         if not self._check_enumerate_traverse():
             # if "node order" column exists, we traverse sorting by _hatchet_nid
             if self.node_ordering:
                 for i, node in enumerate(self.node_order_traverse()):
                     node._hatchet_nid = i
             else:
-                for i, node in enumerate(self.traverse()):
+                compact = self.compact()
+                for i, node in enumerate(compact.nodes):
                     node._hatchet_nid = i
+                compact.nids = np.arange(len(compact), dtype=np.int64)
 
             self.enumerate_depth()
 
@@ -381,7 +712,7 @@ class Graph:
 
     def __len__(self):
         """Size of the graph in terms of number of nodes."""
-        return sum(1 for _ in self.traverse())
+        return len(self.compact())
 
     def __eq__(self, other):
         """Check if two graphs have the same structure by comparing frame at each
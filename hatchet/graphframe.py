@@ -6,8 +6,10 @@
 import copy
 import json
 import sys
-import traceback
-from collections import defaultdict
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+from functools import partial
 
 import multiprocess as mp
 import numpy as np
@@ -26,32 +28,273 @@ from .query import (
 )
 from .util.deprecated import deprecated_params
 from .util.dot import trees_to_dot
+from .util.executor import SharedFrame, read_chunk, run_in_pool
 
-try:
-    from .cython_modules.libs import graphframe_modules as _gfm_cy
-except ImportError:
-    print("-" * 80)
-    print(
-        """Error: Shared object (.so) not found for cython module.\n\tPlease run install.sh from the hatchet root directory to build modules."""
+# Minimum number of rows filtered by each process of a parallel filter
+_MIN_ROWS_PER_PROC = 5000
+
+# Number of rows filtered serially to estimate the cost of a filter function
+_FILTER_SAMPLE_ROWS = 1000
+
+# Estimated cost (in seconds) of filtering a row in parallel rather than
+# serially: sharing the row, and rebuilding it in a worker
+_PARALLEL_COST_PER_ROW = 1e-5
+
+# Estimated cost (in seconds) per node of the graph of a parallel filter:
+# sharing the graph, and rebuilding it in the workers
+_PARALLEL_COST_PER_NODE = 1e-5
+
+
+def _remap_index(index, graph, node_map):
+    """Map the nodes of the "node" level of a DataFrame index through an
+    array indexed by the positions of the nodes in ``graph.compact()``,
+    looking up every distinct node once.
+
+    Return:
+        (pandas.Index): a copy of index with the mapped nodes
+    """
+    if isinstance(index, pd.MultiIndex):
+        index = index.remove_unused_levels()
+        level = index.names.index("node")
+        positions = _index_node_positions(graph, index.levels[level])
+        return index.set_levels(
+            node_map[positions], level=level, verify_integrity=False
+        )
+    codes, nodes = pd.factorize(index)
+    positions = _index_node_positions(graph, nodes)
+    return pd.Index(node_map[positions][codes], name=index.name)
+
+
+def _index_keys(index, levels):
+    """Keys of the rows of a DataFrame index, in which nodes are replaced by
+    their nid.
+
+    Arguments:
+        index (pandas.Index): an index with a "node" level
+        levels (bool): whether to keep the other levels of a MultiIndex
+
+    Return:
+        (numpy.ndarray or pandas.MultiIndex): the nid of the node of every row, or the MultiIndex with nids in the "node" level
+    """
+    if not isinstance(index, pd.MultiIndex):
+        # reading the nids is much cheaper than hashing the nodes to find
+        # the distinct ones
+        return np.fromiter(
+            (n._hatchet_nid for n in index), dtype=np.int64, count=len(index)
+        )
+    index = index.remove_unused_levels()
+    level = index.names.index("node")
+    nodes, codes = index.levels[level], index.codes[level]
+    nids = np.fromiter(
+        (n._hatchet_nid for n in nodes), dtype=np.int64, count=len(nodes)
     )
-    print("-" * 80)
-    traceback.print_exc()
-    raise
+    if levels:
+        return index.set_levels(nids, level=level, verify_integrity=False)
+    return nids[codes]
+
+
+# Row alignments computed by the arithmetic operators for the last pairs of
+# dataframe indexes, which chained operators on a graph reuse. The indexes are
+# only referenced weakly, so that cached alignments do not keep graphs alive.
+_MAX_ALIGNMENTS = 16
+_alignments = OrderedDict()
+
+
+def _forget_alignment(key, ref):
+    """Drop the cached alignment of key when one of its indexes, referenced by
+    ref, is deleted."""
+    cached = _alignments.get(key)
+    if cached is not None and (cached[0] is ref or cached[1] is ref):
+        del _alignments[key]
 
 
-def parallel_apply(filter_function, dataframe, queue):
-    """A function called in parallel, which does a pandas apply on part of a
-    dataframe and returns the results via multiprocessing queue function."""
+def _aligned_rows(index, other_index):
+    """Position in other_index of the row with the same index as every row
+    of index, or -1, with nodes compared by nid.
+
+    Alignments are cached for the last pairs of indexes (pandas indexes are
+    immutable).
+
+    Return:
+        (numpy.ndarray): the positions, or None if the indexes have different levels or other_index has duplicate rows
+    """
+    # the same index, or views of it
+    if index.is_(other_index):
+        return np.arange(len(index))
+
+    key = (id(index), id(other_index))
+    cached = _alignments.get(key)
+    if cached is not None and cached[0]() is index and cached[1]() is other_index:
+        _alignments.move_to_end(key)
+        return cached[2]
+
+    rows = None
+    if list(index.names) == list(other_index.names):
+        keys = _index_keys(index, True)
+        other_keys = _index_keys(other_index, True)
+        if isinstance(keys, pd.MultiIndex):
+            if other_keys.is_unique:
+                rows = other_keys.get_indexer(keys)
+        else:
+            order = np.argsort(other_keys, kind="stable")
+            sorted_keys = other_keys[order]
+            if not (sorted_keys[1:] == sorted_keys[:-1]).any():
+                found = np.searchsorted(sorted_keys, keys)
+                found[found == len(sorted_keys)] = 0
+                hit = (len(sorted_keys) > 0) & (sorted_keys[found] == keys)
+                rows = np.where(hit, order[found], -1)
+
+    forget = partial(_forget_alignment, key)
+    _alignments[key] = (
+        weakref.ref(index, forget),
+        weakref.ref(other_index, forget),
+        rows,
+    )
+    if len(_alignments) > _MAX_ALIGNMENTS:
+        _alignments.popitem(last=False)
+    return rows
+
+
+class _PendingMetrics(object):
+    """Metric columns computed by an arithmetic operator, to be written into
+    a dataframe only when the dataframe is accessed (see
+    ``GraphFrame._arithmetic``).
+
+    Arguments:
+        dataframe (DataFrame): the dataframe providing the index and the
+            other columns, which is not modified
+        columns (dict): the values of every metric column, as 1D arrays
+    """
+
+    def __init__(self, dataframe, columns):
+        self.dataframe = dataframe
+        self.columns = columns
+
+    def materialize(self):
+        dataframe = self.dataframe.copy(deep=False)
+        for name, values in self.columns.items():
+            dataframe[name] = values
+        return dataframe
+
+
+def _index_node_positions(graph, nodes):
+    """Positions of the distinct nodes of an index in ``graph.compact()``."""
+    positions = graph.compact().positions(nodes)
+    if (positions < 0).any():
+        raise ValueError("The dataframe has nodes that are not in the graph.")
+    return positions
+
+
+def parallel_apply(filter_function, chunk):
+    """A function called in parallel, which does a pandas apply on a chunk
+    of a SharedFrame and returns the mask of the rows to keep."""
+    dataframe = read_chunk(chunk)
     filtered_rows = dataframe.apply(filter_function, axis=1)
-    filtered_df = dataframe[filtered_rows]
-    queue.put(filtered_df)
+    return filtered_rows.to_numpy(dtype=bool)
+
+
+def _filter_rows(filter_function, dataframe, num_procs, graph):
+    """Apply a filter function to the rows of a DataFrame, in parallel if it
+    is expected to be faster than serially.
+
+    The filter is first applied serially to a sample of the rows, to estimate
+    its cost per row. The remaining rows are filtered by the shared process
+    pool only if the time saved by splitting them between num_procs
+    processes (at most one per CPU) outweighs the cost of sending them and
+    the graph to the workers. Since the workers see copies of the graph
+    (see ``SharedFrame``), the result does not depend on whether the
+    filter is applied in parallel.
+
+    Returns:
+        (numpy.ndarray): the mask of the rows to keep
+    """
+    sample = min(_FILTER_SAMPLE_ROWS, len(dataframe))
+    start = time.perf_counter()
+    sample_rows = dataframe.iloc[:sample].apply(filter_function, axis=1)
+    cost_per_row = (time.perf_counter() - start) / sample
+    rest = dataframe.iloc[sample:]
+    num_procs = min(num_procs, mp.cpu_count(), len(rest) // _MIN_ROWS_PER_PROC)
+    compact = graph.compact()
+    shared = None
+    if (
+        num_procs > 1
+        and dataframe.columns.is_unique
+        and len(rest) * (cost_per_row * (1 - 1 / num_procs) - _PARALLEL_COST_PER_ROW)
+        > len(compact) * _PARALLEL_COST_PER_NODE
+    ):
+        try:
+            # the workers read the metrics and the graph from shared memory
+            shared = SharedFrame(rest, compact)
+        except ValueError:
+            # some rows have nodes that are not part of the graph
+            pass
+    if shared is not None:
+        try:
+            masks = run_in_pool(
+                parallel_apply,
+                [(filter_function, chunk) for chunk in shared.chunks(num_procs)],
+                num_procs,
+            )
+        finally:
+            shared.close()
+    else:
+        masks = [rest.apply(filter_function, axis=1).to_numpy(dtype=bool)]
+    return np.concatenate([sample_rows.to_numpy(dtype=bool)] + masks)
+
+
+_REDUCTION_FUNCTIONS = {
+    "sum": lambda x: x.sum(min_count=1),
+    "min": lambda x: x.min(),
+    "max": lambda x: x.max(),
+}
+
+# NumPy implementation of the arithmetic operators, by pandas method name
+_ARITHMETIC_UFUNCS = {
+    "add": np.add,
+    "sub": np.subtract,
+    "div": np.true_divide,
+    "mul": np.multiply,
+}
+
+# Aggregations of GraphFrame.reduce, applied to the rows of every node grouped
+# across profiles
+_ENSEMBLE_FUNCTIONS = {
+    "sum": lambda grouped: grouped.sum(min_count=1),
+    "mean": lambda grouped: grouped.mean(),
+    "min": lambda grouped: grouped.min(),
+    "max": lambda grouped: grouped.max(),
+    "median": lambda grouped: grouped.median(),
+    "std": lambda grouped: grouped.std(),
+}
+
+
+def _reduction_function(function):
+    """Return the callable implementing a named reduction ("sum", "min",
+    "max"), or function itself if it is already a callable."""
+    if isinstance(function, str):
+        if function not in _REDUCTION_FUNCTIONS:
+            raise ValueError(
+                "function must be a callable or one of {}".format(
+                    ", ".join(_REDUCTION_FUNCTIONS)
+                )
+            )
+        return _REDUCTION_FUNCTIONS[function]
+    return function
 
 
 class GraphFrame:
     """An input dataset is read into an object of this type, which includes a graph
     and a dataframe.
+
+    In copy-on-write mode (``copy_on_write`` set to True on the class or on
+    a GraphFrame, and inherited by the GraphFrames derived from it), graphs
+    are treated as immutable and shared: ``deepcopy`` copies the dataframe,
+    whose nodes still refer to the shared graph, and the graph is only
+    copied by ``own_graph``, before its topology is modified in place.
     """
 
+    copy_on_write = False
+
     def __init__(
         self,
         graph,
@@ -86,6 +329,7 @@ class GraphFrame:
             )
 
         self.graph = graph
+        self._pending = None
         self.dataframe = dataframe
         self.exc_metrics = [] if exc_metrics is None else exc_metrics
         self.inc_metrics = [] if inc_metrics is None else inc_metrics
@@ -385,6 +629,23 @@ class GraphFrame:
 
         HDF5Writer(filename).write(self, key=key, **kwargs)
 
+    @property
+    def dataframe(self):
+        """DataFrame of this GraphFrame, indexed by the nodes of its graph.
+
+        The result of an arithmetic operator is written into the dataframe
+        when the dataframe is first accessed.
+        """
+        if self._pending is not None:
+            self._dataframe = self._pending.materialize()
+            self._pending = None
+        return self._dataframe
+
+    @dataframe.setter
+    def dataframe(self, dataframe):
+        self._dataframe = dataframe
+        self._pending = None
+
     def copy(self):
         """Return a partially shallow copy of the graphframe.
 
@@ -402,14 +663,18 @@ class GraphFrame:
                 default_metric (str): N/A
                 metadata (dict): Copy of self's metadata
         """
-        return GraphFrame(
+        other = GraphFrame(
             self.graph,
-            self.dataframe.copy(deep=False),
+            self._dataframe.copy(deep=False),
             copy.copy(self.exc_metrics),
             copy.copy(self.inc_metrics),
             self.default_metric,
             copy.copy(self.metadata),
         )
+        # the result of an arithmetic operator is not modified, only replaced
+        other._pending = self._pending
+        self._share_graph(other)
+        return other
 
     def deepcopy(self):
         """Return a deep copy of the graphframe.
@@ -419,25 +684,19 @@ class GraphFrame:
 
         Returns:
             other (GraphFrame): Copy of self
-                graph (graph): Deep copy of self's graph
-                dataframe (DataFrame): Pandas "deep" copy with node objects updated to match graph from "node_clone"
+                graph (graph): Deep copy of self's graph (in copy-on-write mode, self's graph, copied by ``own_graph`` when needed)
+                dataframe (DataFrame): Pandas "deep" copy with node objects updated to match the graph
                 exc_metrics (list): Copy of self's exc_metrics
                 inc_metrics (list): Copy of self's inc_metrics
                 default_metric (str): N/A
                 metadata (dict): Copy of self's metadata
         """
-        node_clone = {}
-        graph_copy = self.graph.copy(node_clone)
-        dataframe_copy = self.dataframe.copy()
-
-        index_names = dataframe_copy.index.names
-        dataframe_copy.reset_index(inplace=True)
-
-        dataframe_copy["node"] = dataframe_copy["node"].apply(lambda x: node_clone[x])
-
-        dataframe_copy.set_index(index_names, inplace=True)
+        if self.copy_on_write:
+            graph_copy, dataframe_copy = self.graph, self.dataframe.copy()
+        else:
+            graph_copy, dataframe_copy = self._copy_graph()
 
-        return GraphFrame(
+        other = GraphFrame(
             graph_copy,
             dataframe_copy,
             copy.deepcopy(self.exc_metrics),
@@ -445,6 +704,41 @@ class GraphFrame:
             self.default_metric,
             copy.deepcopy(self.metadata),
         )
+        self._share_graph(other)
+        return other
+
+    def own_graph(self):
+        """Return the graph of this graphframe, ready to be modified in place.
+
+        In copy-on-write mode, the graph may be shared with other
+        GraphFrames, in which case it is copied first, and the dataframe is
+        indexed by the nodes of the copy.
+
+        Returns:
+            (Graph): the graph of this graphframe
+        """
+        if self.graph.shared:
+            self.graph, self.dataframe = self._copy_graph()
+        return self.graph
+
+    def _copy_graph(self):
+        """Copy the graph, and the dataframe indexed by the new nodes."""
+        node_clone = {}
+        graph_copy = self.graph.copy(node_clone)
+        nodes = self.graph.compact().nodes
+        node_map = np.empty(len(nodes), dtype=object)
+        node_map[:] = [node_clone[n] for n in nodes]
+
+        dataframe_copy = self.dataframe.copy()
+        dataframe_copy.index = _remap_index(dataframe_copy.index, self.graph, node_map)
+        return graph_copy, dataframe_copy
+
+    def _share_graph(self, other):
+        """Pass the copy-on-write mode of self to a GraphFrame derived from it,
+        and mark their graph as shared if it is the same."""
+        other.copy_on_write = self.copy_on_write
+        if self.copy_on_write and other.graph is self.graph:
+            self.graph.shared = True
 
     def drop_index_levels(self, function=np.mean):
         """Drop all index levels but `node`."""
@@ -470,61 +764,54 @@ class GraphFrame:
         filter_obj,
         squash=True,
         update_inc_cols=True,
-        num_procs=mp.cpu_count(),
-        rec_limit=1000,
+        num_procs=None,
+        rec_limit=None,
         multi_index_mode="off",
+        vectorized=False,
     ):
         """Filter the dataframe using a user-supplied function.
 
-        Note: Operates in parallel on user-supplied lambda functions.
+        Note: Operates in parallel on user-supplied lambda functions, if they
+        are slow enough for parallelism to pay off. The "node" column passed
+        to them then holds copies of the nodes, along with copies of their
+        parents and children, which compare equal to the nodes of the graph.
 
         Arguments:
             filter_obj (callable, list, or QueryMatcher): the filter to apply to the GraphFrame.
             squash (boolean, optional): if True, automatically call squash for the user.
             update_inc_cols (boolean, optional): if True, update inclusive columns when performing squash.
-            rec_limit: set Python recursion limit, increase if running into
-                recursion depth errors) (default: 1000).
+            num_procs (int, optional): the number of processes used to apply the filter (by default, all the CPUs for a callable, and one for a query, whose predicates are only evaluated in parallel when asked to).
+            rec_limit (int, optional): if provided, set the Python recursion limit to this value (increase it if squashing a graph with cycles runs into recursion depth errors).
+            vectorized (boolean, optional): if True, filter_obj is a callable applied once to the whole dataframe (with the index reset, as for a row), returning a boolean Series or array of the rows to keep.
         """
-        sys.setrecursionlimit(rec_limit)
-
-        dataframe_copy = self.dataframe.copy()
+        if rec_limit is not None:
+            sys.setrecursionlimit(rec_limit)
 
+        # reset_index copies the dataframe
         index_names = self.dataframe.index.names
-        dataframe_copy.reset_index(inplace=True)
+        dataframe_copy = self.dataframe.reset_index()
 
         filtered_df = None
 
-        if callable(filter_obj):
-            # applying pandas filter using the callable function
-            if num_procs > 1:
-                # perform filter in parallel (default)
-                queue = mp.Queue()
-                processes = []
-                returned_frames = []
-                subframes = np.array_split(dataframe_copy, num_procs)
-
-                # Manually create a number of processes equal to the number of
-                # logical cpus available
-                for pid in range(num_procs):
-                    process = mp.Process(
-                        target=parallel_apply,
-                        args=(filter_obj, subframes[pid], queue),
-                    )
-                    process.start()
-                    processes.append(process)
-
-                # Stores filtered subframes in a list: 'returned_frames', for
-                # pandas concatenation. This intermediary list is used because
-                # pandas concat is faster when called only once on a list of
-                # dataframes, than when called multiple times appending onto a
-                # frame of increasing size.
-                for pid in range(num_procs):
-                    returned_frames.append(queue.get())
-
-                for proc in processes:
-                    proc.join()
+        if callable(filter_obj) and vectorized:
+            # applying the callable function to all the rows at once
+            filtered_rows = np.asarray(filter_obj(dataframe_copy), dtype=bool)
+            if filtered_rows.shape != (len(dataframe_copy),):
+                raise InvalidFilter(
+                    "A vectorized filter must return one boolean value per row."
+                )
+            filtered_df = dataframe_copy.iloc[np.flatnonzero(filtered_rows)]
 
-                filtered_df = pd.concat(returned_frames)
+        elif callable(filter_obj):
+            if num_procs is None:
+                num_procs = mp.cpu_count()
+            # applying pandas filter using the callable function
+            if num_procs > 1 and len(dataframe_copy) > _FILTER_SAMPLE_ROWS:
+                # perform filter in parallel if the filter is slow enough
+                filtered_rows = _filter_rows(
+                    filter_obj, dataframe_copy, num_procs, self.graph
+                )
+                filtered_df = dataframe_copy.iloc[np.flatnonzero(filtered_rows)]
 
             else:
                 # perform filter sequentiually if num_procs = 1
@@ -545,10 +832,20 @@ class GraphFrame:
             # If an old-style query is provided, extract the underlying new-style query.
             elif issubclass(type(filter_obj), AbstractQuery):
                 query = filter_obj._get_new_query()
-            query_matches = self.query_engine.apply(query, self.graph, self.dataframe)
-            # match_set = list(set().union(*query_matches))
-            # filtered_df = dataframe_copy.loc[dataframe_copy["node"].isin(match_set)]
-            filtered_df = dataframe_copy.loc[dataframe_copy["node"].isin(query_matches)]
+            node_mask = self.query_engine.apply_mask(
+                query, self.graph, self.dataframe, num_procs or 1
+            )
+            # keep the rows of the matching nodes, looking up the position of
+            # every distinct node once
+            index = self.dataframe.index
+            if isinstance(index, pd.MultiIndex):
+                level = index.names.index("node")
+                node_positions = self.graph.compact().positions(index.levels[level])
+                positions = node_positions[index.codes[level]]
+            else:
+                positions = self.graph.compact().positions(index)
+            rows = (positions >= 0) & node_mask[positions]
+            filtered_df = dataframe_copy.iloc[np.flatnonzero(rows)]
         else:
             raise InvalidFilter(
                 "The argument passed to filter must be a callable, a query path list, or a QueryMatcher object."
@@ -566,6 +863,7 @@ class GraphFrame:
         filtered_gf.inc_metrics = self.inc_metrics
         filtered_gf.default_metric = self.default_metric
         filtered_gf.metadata = self.metadata
+        self._share_graph(filtered_gf)
 
         if squash:
             return filtered_gf.squash(update_inc_cols)
@@ -580,11 +878,168 @@ class GraphFrame:
         Arguments:
             update_inc_cols (boolean, optional): if True, update inclusive columns.
         """
-        index_names = self.dataframe.index.names
-        self.dataframe.reset_index(inplace=True)
+        index = self.dataframe.index
+        index_names = list(index.names)
+        node_level = index_names.index("node")
+
+        # map rows to the unique nodes in the old dataframe through integer
+        # codes. MultiIndex levels can contain nodes without any rows left
+        # (e.g., after a filter), so only keep the nodes that are used.
+        if isinstance(index, pd.MultiIndex):
+            node_codes = index.codes[node_level]
+            level_nodes = index.levels[node_level]
+        else:
+            node_codes, level_nodes = pd.factorize(index)
+        used = np.unique(node_codes[node_codes >= 0])
+        old_nodes = level_nodes.to_numpy(dtype=object)[used]
 
         # create new nodes for each unique node in the old dataframe
-        old_to_new = {n: n.copy() for n in set(self.dataframe["node"])}
+        graph, new_nodes = self._squash_graph(old_nodes)
+
+        # at this point, the graph is potentially invalid, as some nodes
+        # may have children with identical frames.
+        merges = graph.normalize()
+        new_nodes = [merges.get(n, n) for n in new_nodes]
+
+        # rows with the same (merged) node and non-node index values are
+        # aggregated. Nodes are identified by dense integer keys.
+        node_keys = {}
+        for n in new_nodes:
+            node_keys.setdefault(id(n), (len(node_keys), n))
+        level_keys = np.full(len(level_nodes), -1, dtype=np.int64)
+        level_keys[used] = [node_keys[id(n)][0] for n in new_nodes]
+        level_new_nodes = np.empty(len(level_nodes), dtype=object)
+        level_new_nodes[used] = new_nodes
+
+        keys = [np.take(level_keys, node_codes)]
+        if isinstance(index, pd.MultiIndex):
+            keys = [
+                keys[0] if i == node_level else index.codes[i]
+                for i in range(index.nlevels)
+            ]
+        valid = np.logical_and.reduce([k >= 0 for k in keys])
+
+        df = self.dataframe.reset_index()
+        df["node"] = np.take(level_new_nodes, node_codes)
+        if not valid.all():
+            # groupby drops rows with missing index values
+            df = df[valid]
+            keys = [k[valid] for k in keys]
+
+        group = pd.Series(0, index=df.index).groupby(keys, sort=False).ngroup()
+        group = group.to_numpy()
+        _, first_rows = np.unique(group, return_index=True)
+
+        # metric columns are summed with min_count=1 (default is 0), so sum
+        # of an all-NA series is NaN, not 0. Other columns keep the value of
+        # the first row of each group.
+        agg_df = df.iloc[first_rows].reset_index(drop=True)
+        metrics = [
+            col
+            for col in df.columns
+            if col not in index_names and col in self.exc_metrics + self.inc_metrics
+        ]
+        if metrics:
+            sums = df[metrics].groupby(group).sum(min_count=1)
+            for col in metrics:
+                agg_df[col] = sums[col].to_numpy()
+
+        if isinstance(index, pd.MultiIndex):
+            # build the index from the codes we already have, rather than
+            # hashing every node again
+            levels = list(index.levels)
+            levels[node_level] = pd.Index(
+                [n for _, n in node_keys.values()], dtype=object, name="node"
+            )
+            agg_df.index = pd.MultiIndex(
+                levels=levels,
+                codes=[k[first_rows] for k in keys],
+                names=index_names,
+                verify_integrity=False,
+            ).remove_unused_levels()
+            agg_df.drop(columns=index_names, inplace=True)
+        else:
+            agg_df.set_index(index_names, inplace=True)
+        agg_df.sort_index(inplace=True)
+
+        # put it all together
+        new_gf = GraphFrame(
+            graph,
+            agg_df,
+            self.exc_metrics,
+            self.inc_metrics,
+            self.default_metric,
+            self.metadata,
+        )
+        self._share_graph(new_gf)
+        if update_inc_cols:
+            new_gf.update_inclusive_columns()
+        return new_gf
+
+    def _squash_graph(self, old_nodes):
+        """Helper function for squash that builds a graph containing only
+        new copies of old_nodes.
+
+        A new node is connected to the new copies of the first old nodes
+        reachable from its old node without going through other nodes
+        of old_nodes. For acyclic graphs this is computed on the compact
+        graph in one pass in postorder.
+
+        Return:
+            (tuple): the new Graph, and the list of new nodes corresponding
+                to old_nodes
+        """
+        compact = self.graph.compact()
+        positions = compact.positions(old_nodes)
+        if not compact.is_acyclic or (positions < 0).any():
+            return self._squash_graph_reference(old_nodes)
+
+        new_nodes = [n.copy() for n in old_nodes]
+        new_by_pos = {}
+        for pos, old, new in zip(positions.tolist(), old_nodes, new_nodes):
+            new._hatchet_nid = old._hatchet_nid
+            new_by_pos[pos] = new
+
+        offsets = compact.child_offsets.tolist()
+        children = compact.child_indices.tolist()
+
+        # frontier[pos] are the first new nodes reachable from pos, in
+        # order of discovery
+        frontier = [None] * len(compact)
+
+        def reachable(positions):
+            found = {}
+            for c in positions:
+                for n in frontier[c]:
+                    found[id(n)] = n
+            return found.values()
+
+        for pos in compact.postorder.tolist():
+            new = new_by_pos.get(pos)
+            below = children[offsets[pos] : offsets[pos + 1]]
+            if new is None:
+                frontier[pos] = tuple(reachable(below))
+                continue
+            frontier[pos] = (new,)
+            for child in reachable(below):
+                new.add_child(child)
+                child.add_parent(new)
+
+        root_positions = compact.positions(self.graph.roots)
+        graph = Graph(list(reachable(root_positions.tolist())))
+        if self.graph.node_ordering:
+            graph.node_ordering = True
+        graph.enumerate_traverse()
+
+        return graph, new_nodes
+
+    def _squash_graph_reference(self, old_nodes):
+        """Helper function for squash that rewires the graph recursively.
+
+        This is the reference implementation of ``_squash_graph``, used for
+        graphs with cycles.
+        """
+        old_to_new = {n: n.copy() for n in old_nodes}
         for i in old_to_new:
             old_to_new[i]._hatchet_nid = i._hatchet_nid
 
@@ -636,45 +1091,7 @@ class GraphFrame:
             graph.node_ordering = True
         graph.enumerate_traverse()
 
-        # reindex new dataframe with new nodes
-        df = self.dataframe.copy()
-        df["node"] = df["node"].apply(lambda x: old_to_new[x])
-
-        # at this point, the graph is potentially invalid, as some nodes
-        # may have children with identical frames.
-        merges = graph.normalize()
-        df["node"] = df["node"].apply(lambda n: merges.get(n, n))
-
-        self.dataframe.set_index(index_names, inplace=True)
-        df.set_index(index_names, inplace=True)
-        # create dict that stores aggregation function for each column
-        agg_dict = {}
-        for col in df.columns.tolist():
-            if col in self.exc_metrics + self.inc_metrics:
-                # use min_count=1 (default is 0) here, so sum of an all-NA
-                # series is NaN, not 0
-                # when min_count=1, sum([NaN, NaN)] = NaN
-                # when min_count=0, sum([NaN, NaN)] = 0
-                agg_dict[col] = lambda x: x.sum(min_count=1)
-            else:
-                agg_dict[col] = lambda x: x.iloc[0]
-
-        # perform a groupby to merge nodes with the same callpath
-        agg_df = df.groupby(index_names).agg(agg_dict)
-        agg_df.sort_index(inplace=True)
-
-        # put it all together
-        new_gf = GraphFrame(
-            graph,
-            agg_df,
-            self.exc_metrics,
-            self.inc_metrics,
-            self.default_metric,
-            self.metadata,
-        )
-        if update_inc_cols:
-            new_gf.update_inclusive_columns()
-        return new_gf
+        return graph, [old_to_new[n] for n in old_nodes]
 
     def _init_sum_columns(self, columns, out_columns):
         """Helper function for subtree_sum and subgraph_sum."""
@@ -690,9 +1107,72 @@ class GraphFrame:
 
         return out_columns
 
-    def subtree_sum(
-        self, columns, out_columns=None, function=lambda x: x.sum(min_count=1)
-    ):
+    def _sum_layout(self, compact, columns):
+        """Helper function to lay out metric columns as node x (rank, thread)
+        matrices for the vectorized sum engines.
+
+        Returns a tuple of the graph position and the non-node index key of
+        every row, the number of nodes and the number of distinct keys, or
+        None if the dataframe cannot be laid out that way.
+        """
+        if not all(
+            pd.api.types.is_numeric_dtype(self.dataframe[col]) for col in columns
+        ):
+            return None
+
+        index = self.dataframe.index
+        if not index.is_unique:
+            return None
+
+        if isinstance(index, pd.MultiIndex):
+            level = index.names.index("node")
+            codes = index.codes[level]
+            if (codes < 0).any():
+                return None
+            positions = compact.positions(index.levels[level])[codes]
+            keys, uniques = pd.factorize(index.droplevel(level))
+            num_keys = len(uniques)
+        else:
+            codes, uniques = pd.factorize(index)
+            positions = compact.positions(uniques)[codes]
+            keys = np.zeros(len(index), dtype=np.int64)
+            num_keys = 1
+
+        if (positions < 0).any() or (keys < 0).any():
+            return None
+        return positions, keys, len(compact), num_keys
+
+    def _vectorized_sum(self, layout, engine, columns, out_columns, function):
+        """Helper function to apply a vectorized engine to columns.
+
+        Arguments:
+            layout (tuple): row layout returned by ``_sum_layout``
+            engine (callable): takes a (nodes x keys) matrix and the name of
+                the reduction and returns the reduced matrix
+        """
+        positions, keys, num_nodes, num_keys = layout
+
+        # all columns are reduced together: column j of the metric in
+        # columns[i] is stored in column i * num_keys + j of the matrix
+        matrix = np.full((num_nodes, num_keys * len(columns)), np.nan)
+        for i, col in enumerate(columns):
+            matrix[positions, keys + i * num_keys] = self.dataframe[col].to_numpy(
+                dtype=np.float64
+            )
+        result = engine(matrix, function)
+
+        results = {}
+        for i, (col, out) in enumerate(zip(columns, out_columns)):
+            values = result[positions, keys + i * num_keys]
+            dtype = self.dataframe[col].dtype
+            if pd.api.types.is_integer_dtype(dtype) and not np.isnan(values).any():
+                values = values.astype(dtype)
+            results[out] = values
+
+        for out, values in results.items():
+            self.dataframe[out] = values
+
+    def subtree_sum(self, columns, out_columns=None, function="sum"):
         """Compute sum of elements in subtrees.  Valid only for trees.
 
         For each row in the graph, ``out_columns`` will contain the
@@ -704,15 +1184,45 @@ class GraphFrame:
         ``subgraph_sum`` (which calls ``subtree_sum`` if it can), unless
         you have a good reason not to.
 
+        For acyclic graphs and the "sum", "min" and "max" reductions,
+        children are accumulated into their parents on NumPy arrays, one
+        level of the graph at a time. Other reductions and cyclic graphs
+        fall back to ``_subtree_sum_reference``.
+
         Arguments:
             columns (list of str): names of columns to sum (default: all columns)
             out_columns (list of str): names of columns to store results
                 (default: in place)
-            function (callable): associative operator used to sum
-                elements, sum of an all-NA series is NaN (default: sum(min_count=1))
+            function (callable or str): associative operator used to sum
+                elements, or one of "sum", "min" and "max". The sum of an
+                all-NA series is NaN (default: "sum")
         """
         out_columns = self._init_sum_columns(columns, out_columns)
+        reduction = _reduction_function(function)
+
+        if isinstance(function, str):
+            compact = self.graph.compact()
+            layout = self._sum_layout(compact, out_columns)
+            if compact.is_acyclic and layout is not None:
+                self._vectorized_sum(
+                    layout, compact.reduce_subtrees, out_columns, out_columns, function
+                )
+                return
+
+        self._subtree_sum_reference(out_columns, reduction)
+
+    def _subtree_sum_reference(self, out_columns, function):
+        """Compute sum of elements in subtrees by traversing the graph in
+        postorder.
 
+        This is the reference implementation of ``subtree_sum``, used for
+        arbitrary reduction functions and for graphs with cycles.
+
+        Arguments:
+            out_columns (list of str): names of initialized columns to sum
+                in place
+            function (callable): associative operator used to sum elements
+        """
         # sum over the output columns
         for node in self.graph.traverse(order="post"):
             if node.children:
@@ -750,32 +1260,61 @@ class GraphFrame:
                             self.dataframe.loc[[node] + node.children, col]
                         )
 
-    def subgraph_sum(
-        self, columns, out_columns=None, function=lambda x: x.sum(min_count=1)
-    ):
+    def subgraph_sum(self, columns, out_columns=None, function="sum"):
         """Compute sum of elements in subgraphs.
 
         For each row in the graph, ``out_columns`` will contain the
         element-wise sum of all values in ``columns`` for that row's node
         and all of its descendants.
 
-        This algorithm is worst-case quadratic in the size of the graph,
-        so we try to call ``subtree_sum`` if we can.  In general, there
-        is not a particularly efficient algorithm known for subgraph
-        sums, so this does about as well as we know how.
+        For acyclic graphs and the "sum", "min" and "max" reductions, the
+        sums are computed on NumPy arrays: the distinct descendants of each
+        node are described by a few subtrees of a spanning tree of the
+        graph, so the cost stays close to linear for call graphs that are
+        mostly tree-shaped. Other reductions and cyclic graphs fall back to
+        ``_subgraph_sum_reference``, which is worst-case quadratic. We call
+        ``subtree_sum`` if we can.
 
         Arguments:
             columns (list of str):  names of columns to sum (default: all columns)
             out_columns (list of str): names of columns to store results
                 (default: in place)
-            function (callable): associative operator used to sum
-                elements, sum of an all-NA series is NaN (default: sum(min_count=1))
+            function (callable or str): associative operator used to sum
+                elements, or one of "sum", "min" and "max". The sum of an
+                all-NA series is NaN (default: "sum")
         """
         if self.graph.is_tree():
             self.subtree_sum(columns, out_columns, function)
             return
 
         out_columns = self._init_sum_columns(columns, out_columns)
+        reduction = _reduction_function(function)
+
+        if isinstance(function, str):
+            compact = self.graph.compact()
+            layout = self._sum_layout(compact, columns)
+            if compact.is_acyclic and layout is not None:
+                self._vectorized_sum(
+                    layout, compact.reduce_descendants, columns, out_columns, function
+                )
+                return
+
+        self._subgraph_sum_reference(columns, out_columns, reduction)
+
+    def _subgraph_sum_reference(self, columns, out_columns, function):
+        """Compute sum of elements in subgraphs by traversing the subgraph of
+        every node.
+
+        This is the reference implementation of ``subgraph_sum``, used for
+        arbitrary reduction functions and for graphs with cycles. It is
+        worst-case quadratic in the size of the graph.
+
+        Arguments:
+            columns (list of str): names of columns to sum
+            out_columns (list of str): names of initialized columns to store
+                results
+            function (callable): associative operator used to sum elements
+        """
         for node in self.graph.traverse():
             subgraph_nodes = list(node.traverse())
             # TODO: need a better way of aggregating inclusive metrics when
@@ -829,6 +1368,11 @@ class GraphFrame:
            name, minus "(inc)"
         2. If the corresponding inclusive metric's name does not end in "(inc)", the exclusive metric will have the same
            name as the inclusive metric, followed by a "(exc)" suffix
+
+        The inclusive values of the children of all nodes are summed at once
+        with NumPy over the edges of the graph, for every rank and thread.
+        Dataframes that cannot be laid out as node x (rank, thread) matrices
+        fall back to ``_generate_exclusive_columns_reference``.
         """
         # TODO Change how exclusive-inclusive pairs are determined when inc_metrics and exc_metrics are changed
         # Iterate over inclusive metrics and collect tuples of (new exclusive metrics name, inclusive metric name)
@@ -852,6 +1396,37 @@ class GraphFrame:
             # suffix) to the generation list.
             else:
                 generation_pairs.append((inc + " (exc)", inc))
+        if generation_pairs:
+            compact = self.graph.compact()
+            exc_columns = [pair[0] for pair in generation_pairs]
+            inc_columns = [pair[1] for pair in generation_pairs]
+            layout = self._sum_layout(compact, inc_columns)
+            if layout is not None:
+                self._vectorized_sum(
+                    layout,
+                    lambda values, _: values - compact.sum_children(values),
+                    inc_columns,
+                    exc_columns,
+                    None,
+                )
+            else:
+                self._generate_exclusive_columns_reference(generation_pairs)
+        # Add the newly created metrics to self.exc_metrics
+        self.exc_metrics.extend([metric_tuple[0] for metric_tuple in generation_pairs])
+        self.exc_metrics = list(set(self.exc_metrics))
+
+    def _generate_exclusive_columns_reference(self, generation_pairs):
+        """Generate exclusive metrics by looking up the inclusive metrics of
+        the children of every node in the dataframe.
+
+        This is the reference implementation of
+        ``generate_exclusive_columns``, used when the dataframe cannot be
+        laid out as node x (rank, thread) matrices.
+
+        Arguments:
+            generation_pairs (list of tuple): pairs of (exclusive metric name,
+                inclusive metric name)
+        """
         # Consider each new exclusive metric and its corresponding inclusive metric
         for exc, inc in generation_pairs:
             # Process of obtaining inclusive data for a node differs if the DataFrame has an Index vs a MultiIndex
@@ -901,9 +1476,6 @@ class GraphFrame:
                 self.dataframe = self.dataframe.assign(
                     **{exc: pd.Series(data=new_data)}
                 )
-        # Add the newly created metrics to self.exc_metrics
-        self.exc_metrics.extend([metric_tuple[0] for metric_tuple in generation_pairs])
-        self.exc_metrics = list(set(self.exc_metrics))
 
     def update_inclusive_columns(self):
         """Update inclusive columns (typically after operations that rewire the
@@ -953,30 +1525,149 @@ class GraphFrame:
         if self.graph is other.graph:
             return
 
-        node_map = {}
-        union_graph = self.graph.union(other.graph, node_map)
+        union_graph, self_map, other_map = self.graph.union_map(other.graph)
 
-        self_index_names = self.dataframe.index.names
-        other_index_names = other.dataframe.index.names
-
-        self.dataframe.reset_index(inplace=True)
-        other.dataframe.reset_index(inplace=True)
-
-        self.dataframe["node"] = self.dataframe["node"].apply(lambda x: node_map[id(x)])
-        other.dataframe["node"] = other.dataframe["node"].apply(
-            lambda x: node_map[id(x)]
+        # set_axis copies the data, which the dataframes may share with others
+        self.dataframe = self.dataframe.set_axis(
+            _remap_index(self.dataframe.index, self.graph, self_map)
+        )
+        other.dataframe = other.dataframe.set_axis(
+            _remap_index(other.dataframe.index, other.graph, other_map)
         )
 
         # add missing rows to copy of self's dataframe in preparation for
         # operation
         self._insert_missing_rows(other)
 
-        self.dataframe.set_index(self_index_names, inplace=True, drop=True)
-        other.dataframe.set_index(other_index_names, inplace=True, drop=True)
-
         self.graph = union_graph
         other.graph = union_graph
 
+    @staticmethod
+    def unify_many(gfs, profiles=None):
+        """Combine any number of graphframes into one, over the union of their
+        graphs.
+
+        The union graph is built in a single pass over all graphs (see
+        ``Graph.union_many``), and the nodes of every dataframe are mapped
+        onto it once. The rows of all dataframes are stacked, with a new
+        "profile" index level (after the existing levels) telling which
+        graphframe they come from. The graphframes are not modified.
+
+        Arguments:
+            gfs (list): the GraphFrames to combine, with the same index levels
+            profiles (list, optional): the label of every graphframe in the
+                "profile" level (default: 0, 1, ...)
+
+        Return:
+            (GraphFrame): new graphframe
+        """
+        gfs = list(gfs)
+        if not gfs:
+            raise ValueError("unify_many() requires at least one GraphFrame")
+        if profiles is None:
+            profiles = list(range(len(gfs)))
+        elif len(profiles) != len(gfs):
+            raise ValueError("unify_many() requires one profile per GraphFrame")
+        elif len(set(profiles)) != len(profiles):
+            raise ValueError("unify_many() requires distinct profiles")
+
+        index_names = list(gfs[0].dataframe.index.names)
+        if "profile" in index_names:
+            raise ValueError("GraphFrames already have a 'profile' index level")
+        for gf in gfs[1:]:
+            if list(gf.dataframe.index.names) != index_names:
+                raise ValueError(
+                    "unify_many() requires GraphFrames with the same index levels"
+                )
+
+        union_graph, node_maps = Graph.union_many([gf.graph for gf in gfs])
+        dataframes = []
+        for gf, node_map in zip(gfs, node_maps):
+            dataframe = gf.dataframe.copy(deep=False)
+            dataframe.index = _remap_index(dataframe.index, gf.graph, node_map)
+            dataframes.append(dataframe)
+        dataframe = pd.concat(dataframes, keys=profiles, names=["profile"], sort=False)
+        dataframe = dataframe.reorder_levels(index_names + ["profile"])
+
+        def merged(lists):
+            return list(dict.fromkeys(m for metrics in lists for m in metrics))
+
+        return GraphFrame(
+            union_graph,
+            dataframe,
+            merged(gf.exc_metrics for gf in gfs),
+            merged(gf.inc_metrics for gf in gfs),
+            gfs[0].default_metric,
+            {profile: copy.copy(gf.metadata) for profile, gf in zip(profiles, gfs)},
+        )
+
+    @staticmethod
+    def reduce(gfs, op="sum"):
+        """Aggregate the metrics of any number of graphframes over the union
+        of their graphs.
+
+        The graphframes are combined by ``unify_many``, and the metric values
+        of every row (i.e., node, and other index levels) are aggregated
+        across the graphframes that have it. Graphframes that do not have a
+        row do not contribute to it. Other columns take their first
+        non-missing value across the graphframes.
+
+        Arguments:
+            gfs (list): the GraphFrames to aggregate, with the same index levels
+            op (str, float or callable): "sum", "mean", "min", "max", "median"
+                or "std", a percentile between 0 and 100, or a function passed
+                to ``DataFrameGroupBy.agg``
+
+        Return:
+            (GraphFrame): new graphframe
+        """
+        if isinstance(op, str):
+            if op not in _ENSEMBLE_FUNCTIONS:
+                raise ValueError(
+                    "op must be a percentile, a callable or one of {}".format(
+                        ", ".join(_ENSEMBLE_FUNCTIONS)
+                    )
+                )
+            aggregate = _ENSEMBLE_FUNCTIONS[op]
+        elif callable(op):
+
+            def aggregate(grouped):
+                return grouped.agg(op)
+
+        elif 0 <= op <= 100:
+
+            def aggregate(grouped):
+                return grouped.quantile(op / 100.0)
+
+        else:
+            raise ValueError("percentiles must be between 0 and 100")
+
+        combined = GraphFrame.unify_many(gfs)
+        dataframe = combined.dataframe
+        index_names = [name for name in dataframe.index.names if name != "profile"]
+        metrics = [
+            column
+            for column in dataframe.columns
+            if column in combined.exc_metrics or column in combined.inc_metrics
+        ]
+        others = [column for column in dataframe.columns if column not in metrics]
+
+        # aggregate over the rows with the same index, other than the profile
+        grouped = dataframe.groupby(level=index_names, sort=False)
+        result = aggregate(grouped[metrics])
+        if others:
+            result = pd.concat([result, grouped[others].first()], axis=1)
+        result = result[list(dataframe.columns)]
+
+        return GraphFrame(
+            combined.graph,
+            result,
+            combined.exc_metrics,
+            combined.inc_metrics,
+            combined.default_metric,
+            copy.copy(gfs[0].metadata),
+        )
+
     @deprecated_params(
         metric="metric_column",
         name="name_column",
@@ -1277,113 +1968,179 @@ class GraphFrame:
 
         return self
 
-    def _insert_missing_rows(self, other):
-        """Helper function to add rows that exist in other, but not in self.
+    def _arithmetic(self, other, name, inplace=False):
+        """Apply an arithmetic operator to the metrics of self and other.
 
-        This returns a graphframe with a modified dataframe. The new rows will
-        contain zeros for numeric columns.
+        If self and other have different graphs, they are unified first (a
+        copy of other, and of self unless inplace is True). The metrics of
+        every row of self are then combined with those of the row of other
+        with the same index, as aligned NumPy arrays. The alignment of the
+        rows is cached, so it is computed once for chained operators on the
+        same graph. As with ``DataFrame.update``, self keeps its values
+        where the result is NaN.
+
+        The new metric columns are written into a dataframe only when the
+        dataframe of the result is accessed, so chained operators such as
+        ``(a - b) / b`` do not build intermediate dataframes.
+
+        Arguments:
+            other (GraphFrame): the right operand
+            name (str): "add", "sub", "div" or "mul"
+            inplace (bool): whether to store the result in self
 
         Return:
-            (GraphFrame): self's modified graphframe
+            (GraphFrame): self or a new graphframe
         """
+        result = self if inplace else self.copy()
+        if result.graph is not other.graph:
+            other = other.copy()
+            result.unify(other)
+
+        rows = _aligned_rows(result._dataframe.index, other._dataframe.index)
+        if rows is None:
+            if not inplace:
+                # DataFrame.update writes into the data shared with self
+                result.dataframe = result.dataframe.copy()
+            return result._operator(other, getattr(result.dataframe, name))
+
+        # unioned set of self and other exclusive and inclusive metrics
         all_metrics = list(
             set().union(
-                self.exc_metrics, self.inc_metrics, other.exc_metrics, other.inc_metrics
+                result.exc_metrics,
+                result.inc_metrics,
+                other.exc_metrics,
+                other.inc_metrics,
             )
         )
-
-        # make two 2D nparrays arrays with two columns:
-        # 1) the hashed value of a node and 2) a numerical index
-        # Many operations are stacked here to reduce the need for storing
-        # large intermediary datasets
-        self_hsh_ndx = np.vstack(
-            (
-                np.array(
-                    [x.__hash__() for x in self.dataframe["node"]], dtype=np.uint64
-                ),
-                self.dataframe.index.values.astype(np.uint64),
-            )
-        ).T
-        other_hsh_ndx = np.vstack(
-            (
-                np.array(
-                    [x.__hash__() for x in other.dataframe["node"]], dtype=np.uint64
-                ),
-                other.dataframe.index.values.astype(np.uint64),
-            )
-        ).T
-
-        # sort our 2D arrays by hashed node value so a binary search can be used
-        # in the cython function fast_not_isin
-        self_hsh_ndx_sorted = self_hsh_ndx[self_hsh_ndx[:, 0].argsort()]
-        other_hsh_ndx_sorted = other_hsh_ndx[other_hsh_ndx[:, 0].argsort()]
-
-        # get nodes that exist in other, but not in self, set metric columns to 0 for
-        # these rows
-        other_not_in_self = other.dataframe[
-            _gfm_cy.fast_not_isin(
-                other_hsh_ndx_sorted,
-                self_hsh_ndx_sorted,
-                other_hsh_ndx_sorted.shape[0],
-                self_hsh_ndx_sorted.shape[0],
-            )
-        ]
-        # get nodes that exist in self, but not in other
-        self_not_in_other = self.dataframe[
-            _gfm_cy.fast_not_isin(
-                self_hsh_ndx_sorted,
-                other_hsh_ndx_sorted,
-                self_hsh_ndx_sorted.shape[0],
-                other_hsh_ndx_sorted.shape[0],
-            )
+        metrics = [m for m in all_metrics if m in result._dataframe.columns]
+        # only numeric metrics are combined as float arrays, the others are
+        # combined by pandas
+        numeric = [
+            m
+            for m in metrics
+            if result._metric_dtype(m).kind in "iuf"
+            and other._metric_dtype(m).kind in "iuf"
         ]
-
-        # if there are missing nodes in either self or other, add a new column
-        # called _missing_node
-        if not self_not_in_other.empty:
-            self.dataframe = self.dataframe.assign(
-                _missing_node=np.zeros(len(self.dataframe), dtype=np.short)
-            )
-        if not other_not_in_self.empty:
-            # initialize with 2 to save filling in later
-            other_not_in_self = other_not_in_self.assign(
-                _missing_node=[int(2) for x in range(len(other_not_in_self))]
+        values = result._metric_values(numeric)
+        other_values = np.full(values.shape, np.nan)
+        found = rows >= 0
+        other_values[found] = other._metric_values(numeric)[rows[found]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            combined = _ARITHMETIC_UFUNCS[name](values, other_values)
+        combined = np.where(np.isnan(combined), values, combined)
+
+        columns = dict(result._pending.columns) if result._pending else {}
+        dataframe = result._pending.dataframe if result._pending else result._dataframe
+        for j, metric in enumerate(numeric):
+            column = combined[:, j]
+            # as DataFrame.update, keep the dtype of integer columns when
+            # the results are integers
+            dtype = result._metric_dtype(metric)
+            if dtype.kind in "iu":
+                with np.errstate(invalid="ignore"):
+                    cast = column.astype(dtype)
+                if (cast == column).all():
+                    column = cast
+            columns[metric] = column
+
+        others = [m for m in metrics if m not in numeric]
+        if others:
+            frame = pd.DataFrame(
+                {
+                    m: columns[m] if m in columns else dataframe[m].to_numpy()
+                    for m in others
+                },
+                index=dataframe.index,
             )
+            frame.update(getattr(frame, name)(other.dataframe[others]))
+            columns.update((m, frame[m].to_numpy()) for m in others)
+
+        result._pending = _PendingMetrics(dataframe, columns)
+        return result
+
+    def _metric_dtype(self, metric):
+        """Dtype of a metric column, or of its pending result (see
+        ``_metric_values``)."""
+        pending = self._pending
+        if pending is not None and metric in pending.columns:
+            return pending.columns[metric].dtype
+        dataframe = pending.dataframe if pending is not None else self._dataframe
+        return dataframe[metric].dtype
+
+    def _metric_values(self, metrics):
+        """Values of metric columns as a 2D float array, read from the pending
+        result of an arithmetic operator without writing it into the
+        dataframe."""
+        pending = self._pending
+        columns = pending.columns if pending is not None else {}
+        dataframe = pending.dataframe if pending is not None else self._dataframe
+        values = np.empty((len(dataframe), len(metrics)))
+        for j, metric in enumerate(metrics):
+            if metric in columns:
+                values[:, j] = columns[metric]
+            else:
+                values[:, j] = dataframe[metric].to_numpy(dtype=np.float64)
+        return values
 
-            # add a new column to self if other has nodes not in self
-            if self_not_in_other.empty:
-                self.dataframe["_missing_node"] = np.zeros(
-                    len(self.dataframe), dtype=np.short
-                )
+    def _insert_missing_rows(self, other):
+        """Helper function to add rows that exist in other, but not in self.
 
-        # get lengths to pass into
-        onis_len = len(other_not_in_self)
-        snio_len = len(self_not_in_other)
+        The dataframes of self and other must be indexed by nodes of the same
+        graph. Rows are matched by their whole index if self and other have
+        the same index levels, and by node otherwise, with nodes compared by
+        nid. The rows of other that are not in self are appended to self's
+        dataframe, with NaN metrics.
 
-        # case where self is a superset of other
-        if snio_len != 0:
-            self_missing_node = self.dataframe["_missing_node"].values
-            snio_indices = self_not_in_other.index.values
+        If some rows are only in self or only in other, self's dataframe gets
+        a "_missing_node" column, which is 1 for the rows only in self, 2 for
+        the rows appended from other, and 0 for the rows in both.
 
-            # This function adds 1 to all nodes in self.dataframe['_missing_node'] which
-            # are in self but not in the other graphframe
-            _gfm_cy.insert_one_for_self_nodes(snio_len, self_missing_node, snio_indices)
-            self.dataframe["_missing_node"] = np.array(
-                [n for n in self_missing_node], dtype=np.short
+        Return:
+            (GraphFrame): self's modified graphframe
+        """
+        all_metrics = list(
+            set().union(
+                self.exc_metrics, self.inc_metrics, other.exc_metrics, other.inc_metrics
             )
+        )
+
+        levels = list(self.dataframe.index.names) == list(other.dataframe.index.names)
+        self_keys = _index_keys(self.dataframe.index, levels)
+        other_keys = _index_keys(other.dataframe.index, levels)
+        if isinstance(self_keys, pd.MultiIndex):
+            self_in_other = self_keys.isin(other_keys)
+            other_in_self = other_keys.isin(self_keys)
+        else:
+            self_in_other = np.isin(self_keys, other_keys)
+            other_in_self = np.isin(other_keys, self_keys)
 
-        # for nodes that only exist in other, set the metric to be nan (since
-        # it's a missing node in self)
-        # replaces individual metric assignments with np.zeros
-        for j in all_metrics:
-            other_not_in_self[j] = np.full(onis_len, np.nan)
+        if self_in_other.all() and other_in_self.all():
+            return self
 
-        # append missing rows (nodes that exist in other, but not in self) to self's
-        # dataframe
-        self.dataframe = pd.concat(
-            [self.dataframe, other_not_in_self], axis=0, sort=True
+        # 1 for rows only in self, 0 for rows in both
+        self.dataframe = self.dataframe.assign(
+            _missing_node=np.where(self_in_other, 0, 1).astype(np.short)
         )
 
+        # rows only in other, with NaN metrics since they are missing in self
+        other_not_in_self = other.dataframe.iloc[np.flatnonzero(~other_in_self)]
+        other_not_in_self = other_not_in_self.assign(
+            **{metric: np.nan for metric in all_metrics}
+        ).assign(_missing_node=np.full(len(other_not_in_self), 2, dtype=np.short))
+
+        if levels:
+            self.dataframe = pd.concat(
+                [self.dataframe, other_not_in_self], axis=0, sort=True
+            )
+        else:
+            # the levels missing from other are NaN in the appended rows
+            index_names = self.dataframe.index.names
+            self.dataframe = pd.concat(
+                [self.dataframe.reset_index(), other_not_in_self.reset_index()],
+                axis=0,
+                sort=True,
+            ).set_index(index_names)
+
         return self
 
     def groupby_aggregate(self, groupby_function, agg_function):
@@ -1500,6 +2257,7 @@ class GraphFrame:
             self.default_metric,
             self.metadata,
         )
+        self._share_graph(new_gf)
         new_gf.drop_index_levels()
         return new_gf
 
@@ -1512,14 +2270,7 @@ class GraphFrame:
         Return:
             (GraphFrame): new graphframe
         """
-        # create a copy of both graphframes
-        self_copy = self.copy()
-        other_copy = other.copy()
-
-        # unify copies of graphframes
-        self_copy.unify(other_copy)
-
-        return self_copy._operator(other_copy, self_copy.dataframe.add)
+        return self._arithmetic(other, "add")
 
     def sub(self, other):
         """Returns the column-wise difference of two graphframes as a new
@@ -1531,14 +2282,7 @@ class GraphFrame:
         Return:
             (GraphFrame): new graphframe
         """
-        # create a copy of both graphframes
-        self_copy = self.copy()
-        other_copy = other.copy()
-
-        # unify copies of graphframes
-        self_copy.unify(other_copy)
-
-        return self_copy._operator(other_copy, self_copy.dataframe.sub)
+        return self._arithmetic(other, "sub")
 
     def div(self, other):
         """Returns the column-wise float division of two graphframes as a new graphframe.
@@ -1549,14 +2293,7 @@ class GraphFrame:
         Return:
             (GraphFrame): new graphframe
         """
-        # create a copy of both graphframes
-        self_copy = self.copy()
-        other_copy = other.copy()
-
-        # unify copies of graphframes
-        self_copy.unify(other_copy)
-
-        return self_copy._operator(other_copy, self_copy.dataframe.divide)
+        return self._arithmetic(other, "div")
 
     def mul(self, other):
         """Returns the column-wise float multiplication of two graphframes as a new graphframe.
@@ -1567,14 +2304,7 @@ class GraphFrame:
         Return:
             (GraphFrame): new graphframe
         """
-        # create a copy of both graphframes
-        self_copy = self.copy()
-        other_copy = other.copy()
-
-        # unify copies of graphframes
-        self_copy.unify(other_copy)
-
-        return self_copy._operator(other_copy, self_copy.dataframe.multiply)
+        return self._arithmetic(other, "mul")
 
     def __iadd__(self, other):
         """Computes column-wise sum of two graphframes and stores the result in
@@ -1587,13 +2317,7 @@ class GraphFrame:
         Return:
             (GraphFrame): self's graphframe modified
         """
-        # create a copy of other's graphframe
-        other_copy = other.copy()
-
-        # unify self graphframe and copy of other graphframe
-        self.unify(other_copy)
-
-        return self._operator(other_copy, self.dataframe.add)
+        return self._arithmetic(other, "add", inplace=True)
 
     def __add__(self, other):
         """Returns the column-wise sum of two graphframes as a new graphframe.
@@ -1628,13 +2352,7 @@ class GraphFrame:
         Return:
             (GraphFrame): self's graphframe modified
         """
-        # create a copy of other's graphframe
-        other_copy = other.copy()
-
-        # unify self graphframe and other graphframe
-        self.unify(other_copy)
-
-        return self._operator(other_copy, self.dataframe.sub)
+        return self._arithmetic(other, "sub", inplace=True)
 
     def __sub__(self, other):
         """Returns the column-wise difference of two graphframes as a new
@@ -1659,13 +2377,7 @@ class GraphFrame:
         Return:
             (GraphFrame): self's graphframe modified
         """
-        # create a copy of other's graphframe
-        other_copy = other.copy()
-
-        # unify self graphframe and other graphframe
-        self.unify(other_copy)
-
-        return self._operator(other_copy, self.dataframe.div)
+        return self._arithmetic(other, "div", inplace=True)
 
     def __truediv__(self, other):
         """Returns the column-wise float division of two graphframes as a new
@@ -1690,13 +2402,7 @@ class GraphFrame:
         Return:
             (GraphFrame): self's graphframe modified
         """
-        # create a copy of other's graphframe
-        other_copy = other.copy()
-
-        # unify self graphframe and other graphframe
-        self.unify(other_copy)
-
-        return self._operator(other_copy, self.dataframe.mul)
+        return self._arithmetic(other, "mul", inplace=True)
 
 
 class InvalidFilter(Exception):
@@ -19,29 +19,85 @@ def node_traversal_order(node):
     return node._hatchet_nid
 
 
+class EditCounter:
+    """Number of edits of the parents and children of a set of nodes.
+
+    The nodes of a graph share one when the graph caches its array
+    representation (see ``CompactGraph``), which is stale once the count
+    has changed.
+    """
+
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
 @total_ordering
 class Node:
     """A node in the graph. The node only stores its frame."""
 
+    # no per-instance __dict__: large calling context trees have millions of
+    # nodes
+    __slots__ = (
+        "frame",
+        "_depth",
+        "_hatchet_nid",
+        "_parents",
+        "_children",
+        "_edits",
+    )
+
     def __init__(self, frame_obj, parent=None, hnid=-1, depth=-1):
         self.frame = frame_obj
         self._depth = depth
         self._hatchet_nid = hnid
+        self._edits = None
 
-        self.parents = []
+        self._parents = []
         if parent is not None:
             self.add_parent(parent)
-        self.children = []
+        self._children = []
+
+    @property
+    def parents(self):
+        return self._parents
+
+    @parents.setter
+    def parents(self, parents):
+        self._parents = parents
+        self._edited()
+
+    @property
+    def children(self):
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        self._children = children
+        self._edited()
+
+    def _edited(self):
+        """Count an edit of the parents or children of this node.
+
+        Replacing the parents or children, or adding one with
+        ``add_parent`` or ``add_child``, is counted. Code that modifies the
+        lists in place must call ``Graph.invalidate_cache()`` instead.
+        """
+        if self._edits is not None:
+            self._edits.count += 1
 
     def add_parent(self, node):
         """Adds a parent to this node's list of parents."""
         assert isinstance(node, Node)
-        self.parents.append(node)
+        self._parents.append(node)
+        self._edited()
 
     def add_child(self, node):
         """Adds a child to this node's list of children."""
         assert isinstance(node, Node)
-        self.children.append(node)
+        self._children.append(node)
+        self._edited()
 
     def paths(self):
         """List of tuples, one for each path from this node to any root.
@@ -113,6 +169,13 @@ class Node:
 
         return True
 
+    def sorted_children(self):
+        """Children of this node in traversal order."""
+        children = self.children
+        if len(children) < 2:
+            return children
+        return sorted(children, key=traversal_order)
+
     def traverse(self, order="pre", attrs=None, visited=None):
         """Traverse the tree depth-first and yield each node.
 
@@ -123,31 +186,7 @@ class Node:
             visited (dict, optional): dictionary in which each visited
                 node's in-degree will be stored
         """
-        if order not in ("pre", "post"):
-            raise ValueError("order must be one of 'pre' or 'post'")
-
-        if visited is None:
-            visited = {}
-
-        key = id(self)
-        if key in visited:
-            # count the number of times we reached
-            visited[key] += 1
-            return
-        visited[key] = 1
-
-        def value(node):
-            return node if attrs is None else node.frame.values(attrs)
-
-        if order == "pre":
-            yield value(self)
-
-        for child in sorted(self.children, key=traversal_order):
-            for item in child.traverse(order=order, attrs=attrs, visited=visited):
-                yield item
-
-        if order == "post":
-            yield value(self)
+        return self._traverse(Node.sorted_children, order, attrs, visited)
 
     def node_order_traverse(self, order="pre", attrs=None, visited=None):
         """Traverse the tree depth-first and yield each node, sorting children by "node order".
@@ -159,12 +198,29 @@ class Node:
             visited (dict, optional): dictionary in which each visited
                 node's in-degree will be stored
         """
+
+        def children_by_node_order(node):
+            return sorted(node.children, key=node_traversal_order)
+
+        return self._traverse(children_by_node_order, order, attrs, visited)
+
+    def _traverse(self, ordered_children, order, attrs, visited):
+        """Depth-first traversal with an explicit stack, so that deep graphs
+        do not hit the recursion limit.
+
+        Arguments:
+            ordered_children (callable): returns the children of a node in
+                the order in which they are visited
+        """
         if order not in ("pre", "post"):
             raise ValueError("order must be one of 'pre' or 'post'")
 
         if visited is None:
             visited = {}
 
+        def value(node):
+            return node if attrs is None else node.frame.values(attrs)
+
         key = id(self)
         if key in visited:
             # count the number of times we reached
@@ -172,20 +228,27 @@ class Node:
             return
         visited[key] = 1
 
-        def value(node):
-            return node if attrs is None else node.frame.values(attrs)
-
         if order == "pre":
             yield value(self)
 
-        for child in sorted(self.children, key=node_traversal_order):
-            for item in child.node_order_traverse(
-                order=order, attrs=attrs, visited=visited
-            ):
-                yield item
-
-        if order == "post":
-            yield value(self)
+        stack = [(self, iter(ordered_children(self)))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                key = id(child)
+                if key in visited:
+                    visited[key] += 1
+                    continue
+                visited[key] = 1
+
+                if order == "pre":
+                    yield value(child)
+                stack.append((child, iter(ordered_children(child))))
+                break
+            else:
+                stack.pop()
+                if order == "post":
+                    yield value(node)
 
     def __hash__(self):
         return self._hatchet_nid
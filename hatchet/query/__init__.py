@@ -6,7 +6,8 @@
 # Make flake8 ignore unused names in this file
 # flake8: noqa: F401
 
-from .query import Query
+from .query import Query, vectorized_predicate
+from .report import QueryReport
 from .compound import (
     CompoundQuery,
     ConjunctionQuery,
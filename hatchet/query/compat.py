@@ -14,7 +14,7 @@ except ImportError:
 import sys
 import warnings
 
-from .query import Query
+from .query import Query, match_all
 from .compound import (
     CompoundQuery,
     ConjunctionQuery,
@@ -285,7 +285,7 @@ class QueryMatcher(AbstractQuery):
         else:
             raise InvalidQueryPath("Provided query is not a valid object dialect query")
 
-    def match(self, wildcard_spec=".", filter_func=lambda row: True):
+    def match(self, wildcard_spec=".", filter_func=match_all):
         """Start a query with a root node described by the arguments.
 
         Arguments:
@@ -299,7 +299,7 @@ class QueryMatcher(AbstractQuery):
         self.true_query.match(wildcard_spec, filter_func)
         return self
 
-    def rel(self, wildcard_spec=".", filter_func=lambda row: True):
+    def rel(self, wildcard_spec=".", filter_func=match_all):
         """Add another edge and node to the query.
 
         Arguments:
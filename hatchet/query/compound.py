@@ -5,6 +5,7 @@
 
 from abc import abstractmethod
 
+import numpy as np
 import sys
 
 from .query import Query
@@ -45,6 +46,14 @@ class CompoundQuery(object):
         """
         pass
 
+    def _apply_op_to_masks(self, subquery_masks):
+        """Combines the results of the subqueries, given as boolean masks over
+        the nodes of the graph, based on the operation the subclass represents.
+
+        Returns None if the operation is only implemented by ``_apply_op_to_results``.
+        """
+        return None
+
 
 class ConjunctionQuery(CompoundQuery):
     """A compound query that combines the results of its subqueries
@@ -79,6 +88,17 @@ class ConjunctionQuery(CompoundQuery):
         intersection_set = set(subquery_results[0]).intersection(*subquery_results[1:])
         return list(intersection_set)
 
+    def _apply_op_to_masks(self, subquery_masks):
+        """Combines the results of the subqueries using set conjunction.
+
+        Arguments:
+            subquery_masks (list): the boolean mask of the nodes matched by each subquery
+
+        Returns:
+            (numpy.ndarray): the mask of the nodes satisfying the conjunction of the subqueries' results
+        """
+        return np.logical_and.reduce(subquery_masks)
+
 
 class DisjunctionQuery(CompoundQuery):
     """A compound query that combines the results of its subqueries
@@ -113,6 +133,17 @@ class DisjunctionQuery(CompoundQuery):
         union_set = set().union(*subquery_results)
         return list(union_set)
 
+    def _apply_op_to_masks(self, subquery_masks):
+        """Combines the results of the subqueries using set disjunction.
+
+        Arguments:
+            subquery_masks (list): the boolean mask of the nodes matched by each subquery
+
+        Returns:
+            (numpy.ndarray): the mask of the nodes satisfying the disjunction of the subqueries' results
+        """
+        return np.logical_or.reduce(subquery_masks)
+
 
 class ExclusiveDisjunctionQuery(CompoundQuery):
     """A compound query that combines the results of its subqueries
@@ -147,6 +178,17 @@ class ExclusiveDisjunctionQuery(CompoundQuery):
             xor_set = xor_set.symmetric_difference(set(res))
         return list(xor_set)
 
+    def _apply_op_to_masks(self, subquery_masks):
+        """Combines the results of the subqueries using exclusive set disjunction.
+
+        Arguments:
+            subquery_masks (list): the boolean mask of the nodes matched by each subquery
+
+        Returns:
+            (numpy.ndarray): the mask of the nodes satisfying the exclusive disjunction of the subqueries' results
+        """
+        return np.logical_xor.reduce(subquery_masks)
+
 
 class NegationQuery(CompoundQuery):
     """A compound query that inverts/negates the result of
@@ -179,3 +221,14 @@ class NegationQuery(CompoundQuery):
         nodes = set(graph.traverse())
         query_nodes = set(subquery_results[0])
         return list(nodes.difference(query_nodes))
+
+    def _apply_op_to_masks(self, subquery_masks):
+        """Inverts the results of the subquery.
+
+        Arguments:
+            subquery_masks (list): the boolean mask of the nodes matched by the subquery
+
+        Returns:
+            (numpy.ndarray): the mask of the nodes in the Graph not contained in the subquery's results
+        """
+        return ~subquery_masks[0]
@@ -3,7 +3,11 @@
 #
 # SPDX-License-Identifier: MIT
 
+from collections import OrderedDict
+from contextlib import contextmanager
 from itertools import groupby
+import weakref
+import numpy as np
 import pandas as pd
 
 from .errors import InvalidQueryFilter
@@ -11,54 +15,613 @@ from ..node import Node, traversal_order
 from .query import Query
 from .compound import CompoundQuery
 from .object_dialect import ObjectQuery
+from .report import QueryReport
 from .string_dialect import parse_string_dialect
+from ..util.executor import SharedFrame, read_chunk, run_in_pool
+
+
+def _neighbors(positions, offsets, indices):
+    """Concatenate the neighbors of the given positions in a CSR structure."""
+    starts = offsets[positions]
+    counts = offsets[positions + 1] - starts
+    ends = np.cumsum(counts)
+    return indices[
+        np.arange(ends[-1] if len(ends) else 0)
+        + np.repeat(starts - ends + counts, counts)
+    ]
+
+
+def _closure(mask, allowed, offsets, indices, forward):
+    """Extend a mask of nodes along the edges of a CSR structure.
+
+    Going forward, the neighbors in allowed of the nodes in the mask are
+    added. Going backward, the neighbors of the nodes in both the mask and
+    allowed are added. This is repeated until the mask doesn't change.
+    """
+    result = mask.copy()
+    frontier = np.flatnonzero(mask)
+    while len(frontier):
+        if not forward:
+            frontier = frontier[allowed[frontier]]
+        nbrs = _neighbors(frontier, offsets, indices)
+        if forward:
+            nbrs = nbrs[allowed[nbrs]]
+        frontier = np.unique(nbrs[~result[nbrs]])
+        result[frontier] = True
+    return result
+
+
+def _column_hash(column):
+    """Hash the values of a column, or return None if they are not hashable."""
+    values = column.to_numpy()
+    if values.dtype != object:
+        return hash((values.dtype.str, values.shape, values.tobytes()))
+    try:
+        return hash(tuple(values.ravel()))
+    except TypeError:
+        return None
+
+
+def _data_stamp(dframe, columns, hashes):
+    """Identify the values of the columns of a DataFrame read by a predicate.
+
+    Arguments:
+        dframe (pandas.DataFrame): the DataFrame
+        columns (list): the columns read by the predicate, or None for all the columns
+        hashes (dict): the hashes of the columns of dframe computed so far, filled in with the new ones
+
+    Returns:
+        (tuple): the stamp, or None if the values of a column cannot be hashed
+    """
+    if columns is None:
+        columns = list(dframe.columns)
+    stamp = []
+    for name in columns:
+        if name not in hashes:
+            hashes[name] = (
+                _column_hash(dframe[name]) if name in dframe.columns else "missing"
+            )
+        if hashes[name] is None:
+            return None
+        stamp.append((name, hashes[name]))
+    return tuple(stamp)
+
+
+@contextmanager
+def _phase(report, name):
+    """Time a phase of the application of a query if a report is requested."""
+    if report is None:
+        yield
+    else:
+        with report.timer.phase(name):
+            yield
+
+
+# Minimum number of nodes evaluated by each process of a parallel evaluation
+_MIN_NODES_PER_PROC = 512
+
+
+def _evaluate_node_rows(predicates, rows):
+    """Evaluate predicates on the row(s) of each node.
+
+    Arguments:
+        predicates (list): the predicates to evaluate
+        rows (list): (node, row(s)) pairs (see ``QueryEngine._node_rows``)
+
+    Returns:
+        (numpy.ndarray): boolean matrix whose element [j, k] is True if rows[k] match predicates[j]
+    """
+    results = np.zeros((len(predicates), len(rows)), dtype=bool)
+    for k, (_, row) in enumerate(rows):
+        for j, predicate in enumerate(predicates):
+            if predicate(row):
+                results[j, k] = True
+    return results
+
+
+def _evaluate_chunk(predicates, index_columns, index_names, chunk):
+    """Evaluate predicates on the row(s) of each node of a chunk of a
+    SharedFrame, in a worker of the shared pool.
+
+    Returns:
+        (tuple): the nids of the nodes, and the boolean matrix returned by ``_evaluate_node_rows``
+    """
+    dframe = read_chunk(chunk).set_index(index_columns)
+    dframe.index.names = index_names
+    rows = list(QueryEngine._node_rows(dframe))
+    nids = np.fromiter(
+        (node._hatchet_nid for node, _ in rows), dtype=np.int64, count=len(rows)
+    )
+    return nids, _evaluate_node_rows(predicates, rows)
 
 
 class QueryEngine:
     """Class for applying queries to GraphFrames."""
 
-    def __init__(self):
-        """Creates the QueryEngine."""
+    def __init__(self, max_cached_predicates=32):
+        """Creates the QueryEngine.
+
+        Arguments:
+            max_cached_predicates (int, optional): the maximum number of predicate results kept between queries (see ``clear_predicate_cache``)
+        """
         self.search_cache = {}
+        self.max_cached_predicates = max_cached_predicates
+        self.predicate_cache = OrderedDict()
 
     def reset_cache(self):
         """Resets the cache in the QueryEngine."""
         self.search_cache = {}
 
-    def apply(self, query, graph, dframe):
+    def apply(self, query, graph, dframe, num_procs=1, report=None):
         """Apply the query to a GraphFrame.
 
         Arguments:
             query (Query or CompoundQuery): the query being applied
             graph (Graph): the Graph to which the query is being applied
             dframe (pandas.DataFrame): the DataFrame associated with the graph
+            num_procs (int, optional): the number of processes evaluating the predicates that are not vectorized, node by node; matching the paths always runs in this process
+            report (QueryReport, optional): filled in with how the query was applied (see ``explain``)
 
         Returns:
             (list): A list representing the set of nodes from paths that match the query
         """
+        mask = self.apply_mask(query, graph, dframe, num_procs, report)
+        return graph.compact().nodes[mask].tolist()
+
+    def explain(self, query, graph, dframe, num_procs=1):
+        """Apply the query to a GraphFrame, and report how it was applied.
+
+        The report lists the query nodes with how their predicates were
+        evaluated, how many nodes they match, how many partial paths reach
+        them and how many of those are part of matching paths, along with the
+        time spent in each phase. Printing the report shows it as a table.
+
+        Arguments:
+            query (Query or CompoundQuery): the query being applied
+            graph (Graph): the Graph to which the query is being applied
+            dframe (pandas.DataFrame): the DataFrame associated with the graph
+            num_procs (int, optional): the number of processes evaluating the predicates that are not vectorized, node by node; matching the paths always runs in this process
+
+        Returns:
+            (QueryReport): the report
+        """
+        report = QueryReport(query)
+        self.apply_mask(query, graph, dframe, num_procs, report)
+        return report
+
+    def apply_mask(self, query, graph, dframe, num_procs=1, report=None):
+        """Apply the query to a GraphFrame, and return the matching nodes as a
+        boolean mask.
+
+        Arguments:
+            query (Query or CompoundQuery): the query being applied
+            graph (Graph): the Graph to which the query is being applied
+            dframe (pandas.DataFrame): the DataFrame associated with the graph
+            num_procs (int, optional): the number of processes evaluating the predicates that are not vectorized, node by node; matching the paths always runs in this process
+            report (QueryReport, optional): filled in with how the query was applied (see ``explain``)
+
+        Returns:
+            (numpy.ndarray): the mask of the nodes from paths that match the query, indexed by the positions of the graph's CompactGraph
+        """
         if issubclass(type(query), Query):
             self.reset_cache()
-            matches = []
-            visited = set()
-            for root in sorted(graph.roots, key=traversal_order):
-                self._apply_impl(query, dframe, root, visited, matches)
-            assert len(visited) == len(graph)
-            matched_node_set = list(set().union(*matches))
-            # return matches
-            return matched_node_set
+            compact = graph.compact()
+            if report is not None:
+                for quantifier, predicate in query:
+                    report.add_stage(quantifier, predicate)
+            matched = self._cache_nodes(query, graph, dframe, num_procs, report)
+            if len(self.search_cache) < len(compact):
+                # Nodes without rows are cached (or rejected) one by one
+                with _phase(report, "rows"):
+                    for pos, node in enumerate(compact.nodes):
+                        if node._hatchet_nid not in self.search_cache:
+                            self._cache_node(node, query, dframe)
+                            matched[self.search_cache[node._hatchet_nid], pos] = True
+                            if report is not None:
+                                for stage in report.stages:
+                                    stage["evaluations"] += 1
+            with _phase(report, "match"):
+                mask = self._match_query(query, compact, matched, report)
+            if report is not None:
+                report.num_nodes = len(compact)
+                report.num_matches = int(mask.sum())
+                for stage, matches in zip(report.stages, matched.sum(axis=1).tolist()):
+                    stage["matches"] = matches
+                    stage["selectivity"] = matches / max(len(compact), 1)
+            return mask
         elif issubclass(type(query), CompoundQuery):
-            results = []
+            masks = []
             for subq in query.subqueries:
                 subq_obj = subq
                 if isinstance(subq, list):
                     subq_obj = ObjectQuery(subq)
                 elif isinstance(subq, str):
                     subq_obj = parse_string_dialect(subq)
-                results.append(self.apply(subq_obj, graph, dframe))
-            return query._apply_op_to_results(results, graph)
+                subreport = None
+                if report is not None:
+                    subreport = QueryReport(subq_obj)
+                    report.subqueries.append(subreport)
+                masks.append(
+                    self.apply_mask(subq_obj, graph, dframe, num_procs, subreport)
+                )
+            with _phase(report, "combine"):
+                mask = query._apply_op_to_masks(masks)
+                if mask is None:
+                    # The compound query only combines lists of nodes
+                    compact = graph.compact()
+                    results = [compact.nodes[m].tolist() for m in masks]
+                    nodes = query._apply_op_to_results(results, graph)
+                    mask = np.zeros(len(compact), dtype=bool)
+                    positions = compact.positions(nodes)
+                    mask[positions[positions >= 0]] = True
+            if report is not None:
+                report.operation = type(query).__name__
+                report.num_nodes = len(mask)
+                report.num_matches = int(mask.sum())
+            return mask
         else:
             raise TypeError("Invalid query data type ({})".format(str(type(query))))
 
+    def _cache_nodes(self, query, graph, dframe, num_procs=1, report=None):
+        """Cache (Memoize) the parts of the query that each node of the graph matches.
+
+        Predicates with a vectorized form (see ``vectorized_predicate``) are
+        evaluated once over the whole DataFrame, unless the vectorized form
+        returns None. The remaining predicates are
+        evaluated per node, fetching the row(s) of each node only once.
+        Nodes without rows in the DataFrame are not cached.
+
+        Arguments:
+            query (Query): the query being applied
+            graph (Graph): the Graph to which the query is being applied
+            dframe (pandas.DataFrame): the DataFrame containing node metrics and other data
+            num_procs (int, optional): the number of processes evaluating the predicates per node
+            report (QueryReport, optional): filled in with how the predicates were evaluated
+
+        Returns:
+            (numpy.ndarray): boolean matrix whose element [i, pos] is True if the node at position pos of the graph's CompactGraph matches query node i
+        """
+        compact = graph.compact()
+        # matched[i, pos] is True if the node at position pos of the compact
+        # graph matches query node i
+        matched = np.zeros((len(query), len(compact)), dtype=bool)
+        # index of the first query node with the same predicate
+        first_index = {}
+        duplicates = []
+        row_predicates = []
+        # the keys of the predicate results in the predicate cache
+        cache_keys = {}
+        hashes = {}
+        stages = [{} for _ in range(len(query))] if report is None else report.stages
+        with _phase(report, "predicates"):
+            for i, (_, predicate) in enumerate(query):
+                if id(predicate) in first_index:
+                    duplicates.append((i, first_index[id(predicate)]))
+                    stages[i]["evaluation"] = "shared"
+                    continue
+                first_index[id(predicate)] = i
+                fingerprint = getattr(predicate, "fingerprint", None)
+                if fingerprint is not None:
+                    columns = getattr(predicate, "columns", None)
+                    stamp = _data_stamp(dframe, columns, hashes)
+                    if stamp is not None:
+                        cache_keys[i] = (fingerprint, stamp)
+                if i in cache_keys:
+                    cached = self._cached_matches(cache_keys[i], dframe, compact)
+                    if cached is not None:
+                        matched[i] = cached
+                        stages[i]["evaluation"] = "cached"
+                        continue
+                frame_predicate = getattr(predicate, "vectorized", None)
+                result = None if frame_predicate is None else frame_predicate(dframe)
+                if result is None:
+                    row_predicates.append((i, predicate))
+                    stages[i]["evaluation"] = "rows"
+                    continue
+                stages[i]["evaluation"] = "vectorized"
+                stages[i]["evaluations"] = 1
+                positions = compact.positions(result.index[result.to_numpy(dtype=bool)])
+                matched[i, positions[positions >= 0]] = True
+                if i in cache_keys:
+                    self._cache_matches(cache_keys[i], dframe, compact, matched[i])
+
+        has_rows = np.zeros(len(compact), dtype=bool)
+        if row_predicates:
+            predicates = [predicate for _, predicate in row_predicates]
+            with _phase(report, "rows"):
+                evaluated = self._evaluate_rows(predicates, compact, dframe, num_procs)
+            for positions, results in evaluated:
+                found = positions >= 0
+                has_rows[positions[found]] = True
+                for (i, _), result in zip(row_predicates, results):
+                    matched[i, positions[found & result]] = True
+            if report is not None:
+                for i, _ in row_predicates:
+                    stages[i]["evaluations"] = int(has_rows.sum())
+            for i, _ in row_predicates:
+                if i in cache_keys:
+                    self._cache_matches(cache_keys[i], dframe, compact, matched[i])
+        else:
+            positions = compact.positions(dframe.index.unique("node"))
+            has_rows[positions[positions >= 0]] = True
+        for i, first in duplicates:
+            matched[i] = matched[first]
+
+        nids = compact.nids.tolist()
+        matched_by_node = matched.T.tolist()
+        query_indices = range(len(query))
+        for pos in np.flatnonzero(has_rows).tolist():
+            self.search_cache[nids[pos]] = [
+                i for i, match in zip(query_indices, matched_by_node[pos]) if match
+            ]
+        return matched
+
+    def _match_query(self, query, compact, matched, report=None):
+        """Find the nodes of all the paths of the graph that match the query.
+
+        The query is treated as an automaton whose states are pairs (node,
+        query index), where the node is the last node of a partial path and
+        the query index is the next query node to match. A node is part of a
+        matching path if one of its states is both reachable from a starting
+        state and able to reach an accepting state. Both sets are computed
+        one query node at a time over the arrays of the CompactGraph, so the
+        cost is linear in the size of the graph times the length of the query,
+        wherever the "*" wildcards are.
+
+        Arguments:
+            query (Query): the query being applied
+            compact (CompactGraph): the array-based view of the graph
+            matched (numpy.ndarray): the matrix returned by ``_cache_nodes``
+            report (QueryReport, optional): filled in with the number of partial paths reaching each query node
+
+        Returns:
+            (numpy.ndarray): the mask of the positions of the nodes that are part of a match
+        """
+        num_nodes = len(compact)
+        num_qnodes = len(query)
+        wcards = [wcard for wcard, _ in query.query_pattern]
+        for wcard in wcards:
+            if wcard not in (".", "*"):
+                raise InvalidQueryFilter(
+                    'Query wildcards must (internally) be one of "." or "*"'
+                )
+        # matches[num_qnodes] is the (empty) set of nodes matching the
+        # query node after the last one
+        matches = np.zeros((num_qnodes + 1, num_nodes), dtype=bool)
+        matches[:num_qnodes] = matched
+        parents = compact.edge_parents
+        children = compact.child_indices
+        leaf = np.diff(compact.child_offsets) == 0
+
+        def with_child(mask):
+            """Mask of the nodes that have a child in mask."""
+            result = np.zeros(num_nodes, dtype=bool)
+            result[parents[mask[children]]] = True
+            return result
+
+        def of_parent(mask):
+            """Mask of the nodes that have a parent in mask."""
+            result = np.zeros(num_nodes, dtype=bool)
+            result[children[mask[parents]]] = True
+            return result
+
+        # A "*" query node extends a path ending at a node with the children
+        # that match it but not the next query node. Paths continue from
+        # these children, unless they are leaves.
+        extend = [
+            matches[i] & ~matches[i + 1] & ~leaf if wcard == "*" else None
+            for i, wcard in enumerate(wcards)
+        ]
+
+        def advance(i, mask):
+            """Target states (in query index i + 1) of the transitions leaving
+            the states (node in mask, i)."""
+            if wcards[i] == ".":
+                return of_parent(mask) & matches[i]
+            # The "*" ends at the node if it is a leaf or if one of its
+            # children matches the next query node
+            ends = leaf | with_child(matches[i + 1])
+            result = mask & ends
+            if i == num_qnodes - 1:
+                # The last "*" also ends at nodes with a child that doesn't
+                # match it, and at the leaves that match it.
+                result |= mask & with_child(~matches[i])
+                result |= of_parent(mask) & matches[i] & leaf
+            return result
+
+        # Starting states
+        starts = np.zeros((num_qnodes + 1, num_nodes), dtype=bool)
+        starts[0 if wcards[0] == "*" else 1] |= matches[0]
+        if wcards[0] == "*" and num_qnodes > 1:
+            starts[0 if wcards[1] == "*" else 2] |= matches[1]
+
+        # Forward: states reachable from a starting state
+        stages = [{} for _ in range(num_qnodes)] if report is None else report.stages
+        reached = starts
+        for i in range(num_qnodes):
+            if wcards[i] == "*":
+                num_reached = int(reached[i].sum())
+                reached[i] = _closure(
+                    reached[i],
+                    extend[i],
+                    compact.child_offsets,
+                    compact.child_indices,
+                    forward=True,
+                )
+                stages[i]["expansions"] = int(reached[i].sum()) - num_reached
+            reached[i + 1] |= advance(i, reached[i])
+        for i in range(num_qnodes):
+            stages[i]["reached"] = int(reached[i + 1].sum())
+
+        # Backward: reached states from which an accepting state (i.e., the
+        # whole query is matched) can be reached
+        coreached = reached[num_qnodes]
+        accepted = coreached.copy()
+        for i in range(num_qnodes - 1, -1, -1):
+            stages[i]["accepted"] = int(coreached.sum())
+            if wcards[i] == ".":
+                leads = with_child(coreached & matches[i])
+            else:
+                leads = (leaf | with_child(matches[i + 1])) & coreached
+                if i == num_qnodes - 1:
+                    leads |= with_child(~matches[i]) & coreached
+                    leads |= with_child(matches[i] & leaf & coreached)
+                leads = _closure(
+                    leads,
+                    extend[i],
+                    compact.parent_offsets,
+                    compact.parent_indices,
+                    forward=False,
+                )
+            coreached = leads & reached[i]
+            accepted |= coreached
+        return accepted
+
+    def _cached_matches(self, key, dframe, compact):
+        """Look up the matches of a predicate in the predicate cache.
+
+        Arguments:
+            key (tuple): the fingerprint of the predicate and the stamp of the columns it reads (see ``_data_stamp``)
+            dframe (pandas.DataFrame): the DataFrame the predicate is applied to
+            compact (CompactGraph): the array-based view of the graph
+
+        Returns:
+            (numpy.ndarray): the cached mask of the matching positions of compact, or None
+        """
+        entry = self.predicate_cache.get(key)
+        if entry is None:
+            return None
+        index_ref, compact_ref, matches = entry
+        # Positions are only valid for the same rows, in the same snapshot
+        # of the graph
+        if index_ref() is not dframe.index or compact_ref() is not compact:
+            return None
+        self.predicate_cache.move_to_end(key)
+        return matches
+
+    def _cache_matches(self, key, dframe, compact, matches):
+        """Add the matches of a predicate to the predicate cache, evicting the
+        least recently used entries if the cache is full.
+
+        The DataFrame index and the CompactGraph are only referenced weakly,
+        so the cache does not keep the data of dropped GraphFrames alive.
+
+        Arguments:
+            key (tuple): the fingerprint of the predicate and the stamp of the columns it reads (see ``_data_stamp``)
+            dframe (pandas.DataFrame): the DataFrame the predicate was applied to
+            compact (CompactGraph): the array-based view of the graph
+            matches (numpy.ndarray): the mask of the matching positions of compact
+        """
+        if self.max_cached_predicates <= 0:
+            return
+        self.predicate_cache[key] = (
+            weakref.ref(dframe.index),
+            weakref.ref(compact),
+            matches.copy(),
+        )
+        while len(self.predicate_cache) > self.max_cached_predicates:
+            self.predicate_cache.popitem(last=False)
+
+    def clear_predicate_cache(self):
+        """Clears the cache of predicate results shared between queries.
+
+        Cached results are only reused while the rows of the DataFrame, the
+        values of the columns read by the predicate, and the Graph are
+        unchanged, so clearing the cache only releases memory.
+        """
+        self.predicate_cache.clear()
+
+    def _evaluate_rows(self, predicates, compact, dframe, num_procs=1):
+        """Evaluate predicates on the row(s) of each node of a DataFrame.
+
+        With more than one process, the nodes are split into contiguous
+        ranges of the node index, evaluated by the shared process pool. The
+        workers see copies of the graph (see ``SharedFrame``).
+
+        Arguments:
+            predicates (list): the predicates to evaluate
+            compact (CompactGraph): the array-based view of the graph
+            dframe (pandas.DataFrame): the DataFrame containing node metrics and other data
+            num_procs (int, optional): the number of processes to use
+
+        Returns:
+            (list): pairs of the positions of a range of nodes in compact (-1 for nodes not in the graph), and a boolean matrix whose element [j, k] is True if the node at positions[k] matches predicates[j]
+        """
+        index = dframe.index
+        if isinstance(index, pd.MultiIndex):
+            level = index.names.index("node")
+            codes = index.codes[level]
+            node_positions = compact.positions(index.levels[level])
+        else:
+            codes, nodes = pd.factorize(index)
+            node_positions = compact.positions(nodes)
+        num_nodes = len(node_positions)
+        num_procs = max(1, min(num_procs, num_nodes // _MIN_NODES_PER_PROC))
+        if (
+            num_procs == 1
+            or not dframe.columns.is_unique
+            or set(index.names) & set(dframe.columns)
+        ):
+            rows = list(self._node_rows(dframe))
+            positions = compact.positions([node for node, _ in rows])
+            found = positions >= 0
+            results = np.zeros((len(predicates), len(rows)), dtype=bool)
+            results[:, found] = _evaluate_node_rows(
+                predicates, [row for row, keep in zip(rows, found) if keep]
+            )
+            return [(positions, results)]
+
+        # the rows of the nodes of the graph, with the rows of every node
+        # next to each other
+        rows = dframe.reset_index()
+        index_columns = list(rows.columns[: index.nlevels])
+        keep = node_positions[codes] >= 0
+        order = np.flatnonzero(keep)[np.argsort(codes[keep], kind="stable")]
+        rows = rows.iloc[order]
+        bounds = np.searchsorted(
+            codes[order], np.linspace(0, num_nodes, num_procs + 1).astype(np.int64)
+        )
+        # the workers read the metrics and the graph from shared memory
+        shared = SharedFrame(rows, compact)
+        try:
+            evaluated = run_in_pool(
+                _evaluate_chunk,
+                [
+                    (predicates, index_columns, list(index.names), chunk)
+                    for chunk in shared.chunks(bounds=bounds)
+                ],
+                num_procs,
+            )
+        finally:
+            shared.close()
+        return [(compact.nid_positions(nids), results) for nids, results in evaluated]
+
+    @staticmethod
+    def _node_rows(dframe):
+        """Iterate over the nodes of a DataFrame and their row(s), as passed to
+        query predicates.
+
+        Arguments:
+            dframe (pandas.DataFrame): the DataFrame containing node metrics and other data
+
+        Returns:
+            (generator): (node, row) pairs, where row is a Series, or a DataFrame for multi-indexed data
+        """
+        index = dframe.index
+        if isinstance(index, pd.MultiIndex):
+            if index.names[0] == "node":
+                for node, rows in dframe.groupby(level="node", sort=False):
+                    yield node, rows
+                return
+            for node in index.unique("node"):
+                yield node, pd.concat([dframe.loc[node]], keys=[node], names=["node"])
+        elif index.is_unique:
+            for node, row in dframe.iterrows():
+                yield node, row
+        else:
+            for node in index.unique():
+                yield node, dframe.loc[node]
+
     def _cache_node(self, node, query, dframe):
         """Cache (Memoize) the parts of the query that the node matches.
 
@@ -220,38 +783,3 @@ class QueryEngine:
             # Update the query node
             pattern_idx += 1
         return matches
-
-    def _apply_impl(self, query, dframe, node, visited, matches):
-        """Traverse the subgraph with the specified root, and collect all paths that match the query.
-
-        Arguments:
-            query (Query): the query being applied
-            dframe (pandas.DataFrame): the DataFrame containing the metrics for the queried GraphFrame
-            node (Node): the root node of the subgraph that is being queried
-            visited (set): a set that keeps track of what nodes have been visited in the traversal to minimize the amount of work that is repeated
-            matches (list): the list in which the final set of matches are stored
-        """
-        # If the node has already been visited (or is None for some
-        # reason), skip it.
-        if node is None or node._hatchet_nid in visited:
-            return
-        # Cache the node if it's not already cached
-        if node._hatchet_nid not in self.search_cache:
-            self._cache_node(node, query, dframe)
-        # If the node matches the starting/root node of the query,
-        # try to get all query matches in the subgraph rooted at
-        # this node.
-        if query.query_pattern[0][0] == "*":
-            if 1 in self.search_cache[node._hatchet_nid]:
-                sub_match = self._match_pattern(query, dframe, node, 1)
-                if sub_match is not None:
-                    matches.extend(sub_match)
-        if 0 in self.search_cache[node._hatchet_nid]:
-            sub_match = self._match_pattern(query, dframe, node, 0)
-            if sub_match is not None:
-                matches.extend(sub_match)
-        # Note that the node is now visited.
-        visited.add(node._hatchet_nid)
-        # Continue the Depth First Search.
-        for child in sorted(node.children, key=traversal_order):
-            self._apply_impl(query, dframe, child, visited, matches)
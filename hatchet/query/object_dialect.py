@@ -3,8 +3,10 @@
 #
 # SPDX-License-Identifier: MIT
 
+import ast
 from numbers import Real
 import numpy as np
+import operator
 import pandas as pd
 from pandas.api.types import (
     is_numeric_dtype,
@@ -14,7 +16,29 @@ import re
 import sys
 
 from .errors import InvalidQueryPath, InvalidQueryFilter, MultiIndexModeMismatch
-from .query import Query
+from .query import NodeRows, NotVectorizable, Query, match_all, vectorized_predicate
+
+
+# Longer operators first, so that ">=" is not parsed as ">" followed by "="
+_COMPARISON_OPERATORS = (
+    (">=", operator.ge),
+    ("<=", operator.le),
+    ("==", operator.eq),
+    ("!=", operator.ne),
+    ("<>", operator.ne),
+    ("<", operator.lt),
+    (">", operator.gt),
+)
+
+_OPERAND_CONSTANTS = {
+    "np.nan": np.nan,
+    "np.inf": np.inf,
+    "-np.inf": -np.inf,
+}
+
+_NUMERIC_FILTER_ERROR = "Attribute {} has a numeric type. Valid filters for this attribute are a string starting with a comparison operator or a real number."
+
+_FILTER_ERROR = "Filter must be one of the following:\n  * A regex string for a String attribute\n  * A string starting with a comparison operator for a Numeric attribute\n  * A number for a Numeric attribute\n"
 
 
 def _process_multi_index_mode(apply_result, multi_index_mode):
@@ -27,103 +51,222 @@ def _process_multi_index_mode(apply_result, multi_index_mode):
     )
 
 
-def _process_predicate(attr_filter, multi_index_mode):
-    """Converts high-level API attribute filter to a lambda"""
-    compops = ("<", ">", "==", ">=", "<=", "<>", "!=")  # ,
-
-    def filter_series(df_row):
-        def filter_single_series(df_row, key, single_value):
-            if key == "depth":
-                node = df_row.name
-                if isinstance(single_value, str) and single_value.lower().startswith(
-                    compops
-                ):
-                    return eval("{} {}".format(node._depth, single_value))
-                if isinstance(single_value, Real):
-                    # If the value for "depth" is -1, check if the node is a leaf
-                    if single_value == -1:
-                        return len(node.children) == 0
-                    return node._depth == single_value
-                raise InvalidQueryFilter(
-                    "Attribute {} has a numeric type. Valid filters for this attribute are a string starting with a comparison operator or a real number.".format(
-                        key
-                    )
-                )
-            if key == "node_id":
-                node = df_row.name
-                if isinstance(single_value, str) and single_value.lower().startswith(
-                    compops
-                ):
-                    return eval("{} {}".format(node._hatchet_nid, single_value))
-                if isinstance(single_value, Real):
-                    return node._hatchet_nid == single_value
-                raise InvalidQueryFilter(
-                    "Attribute {} has a numeric type. Valid filters for this attribute are a string starting with a comparison operator or a real number.".format(
-                        key
-                    )
-                )
-            if key not in df_row.keys():
-                return False
-            if isinstance(df_row[key], str):
-                if not isinstance(single_value, str):
-                    raise InvalidQueryFilter(
-                        "Value for attribute {} must be a string.".format(key)
-                    )
-                return re.match(single_value + r"\Z", df_row[key]) is not None
-            if isinstance(df_row[key], Real):
-                if isinstance(single_value, str) and single_value.lower().startswith(
-                    compops
-                ):
-                    # compare nan metric value to numeric query
-                    # (e.g. np.nan > 5)
-                    if pd.isnull(df_row[key]):
-                        nan_str = "np.nan"
-                        # compare nan metric value to nan query
-                        # (e.g., np.nan == np.nan)
-                        if nan_str in single_value:
-                            return eval("pd.isnull({}) == True".format(nan_str))
-                        return eval("{} {}".format(nan_str, single_value))
-                    elif np.isinf(df_row[key]):
-                        inf_str = "np.inf"
-                        # compare inf metric value to inf query
-                        # (e.g., np.inf == np.inf)
-                        if inf_str in single_value:
-                            return eval("np.isinf({}) == True".format(inf_str))
-                        return eval("{} {}".format(inf_str, single_value))
-                    else:
-                        return eval("{} {}".format(df_row[key], single_value))
-
-                if isinstance(single_value, Real):
-                    return df_row[key] == single_value
+class _Comparison(object):
+    """A comparison string of the Object-based dialect (e.g., "> 5"), parsed
+    into an operator and an operand."""
+
+    def __init__(self, text):
+        self.text = text
+        self.op = None
+        self.operand = None
+        for symbol, op in _COMPARISON_OPERATORS:
+            if text.startswith(symbol):
+                operand = text[len(symbol) :].strip()
+                if operand in _OPERAND_CONSTANTS:
+                    self.op = op
+                    self.operand = _OPERAND_CONSTANTS[operand]
+                else:
+                    try:
+                        self.operand = ast.literal_eval(operand)
+                        self.op = op
+                    except (SyntaxError, ValueError):
+                        pass
+                break
+        # Comparisons of NaN (resp. infinite) values with a query containing
+        # NaN (resp. infinity) always match
+        self.nan_query = "np.nan" in text
+        self.inf_query = "np.inf" in text
+
+    @staticmethod
+    def parse(value):
+        """Returns the comparison for a filter value, or None if the value is
+        not a string starting with a comparison operator."""
+        if isinstance(value, str) and value.lower().startswith(
+            tuple(symbol for symbol, _ in _COMPARISON_OPERATORS)
+        ):
+            return _Comparison(value)
+        return None
+
+    def __call__(self, values):
+        """Compares a value or a numpy array of values."""
+        if self.op is None:
+            raise InvalidQueryFilter("Invalid comparison: {}".format(self.text))
+        with np.errstate(invalid="ignore"):
+            return self.op(values, self.operand)
+
+    def metric(self, value):
+        """Compares a single metric value, with special handling of NaN and
+        infinite values."""
+        if pd.isnull(value):
+            return self.nan_query or self(np.nan)
+        if np.isinf(value):
+            return self.inf_query or self(np.inf)
+        return self(value)
+
+    def metrics(self, values):
+        """Vectorized version of "metric" for a numpy array of numbers."""
+        if not isinstance(self.operand, Real):
+            raise NotVectorizable()
+        nans = np.isnan(values)
+        infs = np.isinf(values)
+        matches = np.asarray(self(values), dtype=bool)
+        matches[nans] = self.nan_query or self(np.nan)
+        matches[infs] = self.inf_query or self(np.inf)
+        return matches
+
+
+class _AttributeFilter(object):
+    """A single value filtering an attribute of the Object-based dialect."""
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.comparison = _Comparison.parse(value)
+        self._regex = None
+
+    @property
+    def regex(self):
+        """The compiled regex for string values, or None."""
+        if self._regex is None and isinstance(self.value, str):
+            self._regex = re.compile(self.value + r"\Z")
+        return self._regex
+
+    def node(self, node, leaf_depth):
+        """Filters the "depth" or "node_id" attribute of a node."""
+        attr = node._depth if self.key == "depth" else node._hatchet_nid
+        if self.comparison is not None:
+            return self.comparison(attr)
+        if isinstance(self.value, Real):
+            # If the value for "depth" is -1, check if the node is a leaf
+            if leaf_depth and self.key == "depth" and self.value == -1:
+                return len(node.children) == 0
+            return attr == self.value
+        raise InvalidQueryFilter(_NUMERIC_FILTER_ERROR.format(self.key))
+
+    def series(self, df_row):
+        """Filters the row of a node (single-indexed data)."""
+        if self.key in ("depth", "node_id"):
+            return self.node(df_row.name, True)
+        if self.key not in df_row.keys():
+            return False
+        return self.metric(df_row[self.key])
+
+    def metric(self, value):
+        """Filters a single metric value."""
+        if isinstance(value, str):
+            if self.regex is None:
                 raise InvalidQueryFilter(
-                    "Attribute {} has a numeric type. Valid filters for this attribute are a string starting with a comparison operator or a real number.".format(
-                        key
-                    )
+                    "Value for attribute {} must be a string.".format(self.key)
                 )
+            return self.regex.match(value) is not None
+        if isinstance(value, Real):
+            if self.comparison is not None:
+                return self.comparison.metric(value)
+            if isinstance(self.value, Real):
+                return value == self.value
+            raise InvalidQueryFilter(_NUMERIC_FILTER_ERROR.format(self.key))
+        raise InvalidQueryFilter(_FILTER_ERROR)
+
+    def dframe(self, df_row, multi_index_mode):
+        """Filters the rows of a node (multi-indexed data)."""
+        if self.key in ("depth", "node_id"):
+            return self.node(df_row.index.get_level_values("node")[0], False)
+        if self.key not in df_row.columns:
+            return False
+        column = df_row[self.key]
+        if is_string_dtype(column):
+            matches = self.strings(column.to_numpy())
+        elif is_numeric_dtype(column):
+            matches = self.numbers(column.to_numpy())
+        else:
+            raise InvalidQueryFilter(_FILTER_ERROR)
+        return _process_multi_index_mode(matches, multi_index_mode)
+
+    def strings(self, values):
+        """Filters an array of strings."""
+        if self.regex is None:
             raise InvalidQueryFilter(
-                "Filter must be one of the following:\n  * A regex string for a String attribute\n  * A string starting with a comparison operator for a Numeric attribute\n  * A number for a Numeric attribute\n"
+                "Value for attribute {} must be a string.".format(self.key)
             )
+        match = self.regex.match
+        return np.array([match(v) is not None for v in values], dtype=bool)
+
+    def numbers(self, values):
+        """Filters a numpy array of numbers (multi-indexed data)."""
+        if self.comparison is not None:
+            return np.asarray(self.comparison(values), dtype=bool)
+        if isinstance(self.value, Real):
+            return values == self.value
+        raise InvalidQueryFilter(_NUMERIC_FILTER_ERROR.format(self.key))
 
-        matches = True
-        for k, v in attr_filter.items():
-            metric_name = k
-            if isinstance(k, (tuple, list)) and len(k) == 1:
-                metric_name = k[0]
+    def frame(self, rows):
+        """Filters all the nodes of a DataFrame at once.
+
+        Returns:
+            (numpy.ndarray): the boolean result for each node of rows
+        """
+        if self.key in ("depth", "node_id"):
+            leaf_depth = not rows.multi_index
+            return np.array(
+                [bool(self.node(n, leaf_depth)) for n in rows.nodes], dtype=bool
+            )
+        column = rows.column(self.key)
+        if column is None:
+            return np.zeros(len(rows.nodes), dtype=bool)
+        try:
+            if rows.multi_index:
+                matches = self._multi_index_frame(column)
+            else:
+                matches = self._single_index_frame(column)
+        except InvalidQueryFilter:
+            # Let the per-node predicate raise, if a node reaches this filter
+            raise NotVectorizable()
+        return rows.reduce(matches)
+
+    def _single_index_frame(self, column):
+        kind = column.dtype.kind
+        if kind in "iuf":
+            values = column.to_numpy()
+            if self.comparison is not None:
+                return self.comparison.metrics(values)
+            if isinstance(self.value, Real):
+                return values == self.value
+            raise InvalidQueryFilter(_NUMERIC_FILTER_ERROR.format(self.key))
+        if kind == "O":
+            return np.array(
+                [bool(self.metric(v)) for v in column.to_numpy()], dtype=bool
+            )
+        raise NotVectorizable()
+
+    def _multi_index_frame(self, column):
+        if column.dtype == object:
+            # The dtype of the rows of each node depends on their values
+            values = column.to_numpy()
+            if all(isinstance(v, str) for v in values):
+                return self.strings(values)
+            raise NotVectorizable()
+        if is_string_dtype(column):
+            return self.strings(column.to_numpy())
+        if is_numeric_dtype(column):
+            return self.numbers(column.to_numpy())
+        raise NotVectorizable()
+
+
+def _process_predicate(attr_filter, multi_index_mode):
+    """Converts high-level API attribute filter to a predicate"""
+    filters = []
+    for k, v in attr_filter.items():
+        metric_name = k
+        if isinstance(k, (tuple, list)) and len(k) == 1:
+            metric_name = k[0]
+        # Strings are processed as non-iterables
+        values = [v]
+        if not isinstance(v, str):
             try:
-                _ = iter(v)
-                # Manually raise TypeError if v is a string so that
-                # the string is processed as a non-iterable
-                if isinstance(v, str):
-                    raise TypeError
-            # Runs if v is not iterable (e.g., list, tuple, etc.)
+                values = list(v)
             except TypeError:
-                matches = matches and filter_single_series(df_row, metric_name, v)
-            else:
-                for single_value in v:
-                    matches = matches and filter_single_series(
-                        df_row, metric_name, single_value
-                    )
-        return matches
+                pass
+        filters.extend(_AttributeFilter(metric_name, value) for value in values)
 
     def filter_dframe(df_row):
         if multi_index_mode == "off":
@@ -131,88 +274,40 @@ def _process_predicate(attr_filter, multi_index_mode):
                 "The ObjectQuery's 'multi_index_mode' argument \
                 cannot be set to 'off' when using multi-indexed data"
             )
-
-        def filter_single_dframe(node, df_row, key, single_value):
-            if key == "depth":
-                if isinstance(single_value, str) and single_value.lower().startswith(
-                    compops
-                ):
-                    return eval("{} {}".format(node._depth, single_value))
-                if isinstance(single_value, Real):
-                    return node._depth == single_value
-                raise InvalidQueryFilter(
-                    "Attribute {} has a numeric type. Valid filters for this attribute are a string starting with a comparison operator or a real number.".format(
-                        key
-                    )
-                )
-            if key == "node_id":
-                if isinstance(single_value, str) and single_value.lower().startswith(
-                    compops
-                ):
-                    return eval("{} {}".format(node._hatchet_nid, single_value))
-                if isinstance(single_value, Real):
-                    return node._hatchet_nid == single_value
-                raise InvalidQueryFilter(
-                    "Attribute {} has a numeric type. Valid filters for this attribute are a string starting with a comparison operator or a real number.".format(
-                        key
-                    )
-                )
-            if key not in df_row.columns:
-                return False
-            if is_string_dtype(df_row[key]):
-                if not isinstance(single_value, str):
-                    raise InvalidQueryFilter(
-                        "Value for attribute {} must be a string.".format(key)
-                    )
-                apply_ret = df_row[key].apply(
-                    lambda x: re.match(single_value + r"\Z", x) is not None
-                )
-                return _process_multi_index_mode(apply_ret, multi_index_mode)
-            if is_numeric_dtype(df_row[key]):
-                if isinstance(single_value, str) and single_value.lower().startswith(
-                    compops
-                ):
-                    apply_ret = df_row[key].apply(
-                        lambda x: eval("{} {}".format(x, single_value))
-                    )
-                    return _process_multi_index_mode(apply_ret, multi_index_mode)
-                if isinstance(single_value, Real):
-                    apply_ret = df_row[key].apply(lambda x: x == single_value).any()
-                    return _process_multi_index_mode(apply_ret, multi_index_mode)
-                raise InvalidQueryFilter(
-                    "Attribute {} has a numeric type. Valid filters for this attribute are a string starting with a comparison operator or a real number.".format(
-                        key
-                    )
-                )
-            raise InvalidQueryFilter(
-                "Filter must be one of the following:\n  * A regex string for a String attribute\n  * A string starting with a comparison operator for a Numeric attribute\n  * A number for a Numeric attribute\n"
-            )
-
-        matches = True
-        node = df_row.name.to_frame().index[0][0]
-        for k, v in attr_filter.items():
-            metric_name = k
-            if isinstance(k, (tuple, list)) and len(k) == 1:
-                metric_name = k[0]
-            try:
-                _ = iter(v)
-                if isinstance(v, str):
-                    raise TypeError
-            except TypeError:
-                matches = matches and filter_single_dframe(node, df_row, metric_name, v)
-            else:
-                for single_value in v:
-                    matches = matches and filter_single_dframe(
-                        node, df_row, metric_name, single_value
-                    )
-        return matches
+        return all(f.dframe(df_row, multi_index_mode) for f in filters)
 
     def filter_choice(df_row):
         if isinstance(df_row, pd.DataFrame):
             return filter_dframe(df_row)
-        return filter_series(df_row)
+        return all(f.series(df_row) for f in filters)
 
-    return filter_choice if attr_filter != {} else lambda row: True
+    def filter_frame(dframe):
+        try:
+            rows = NodeRows(dframe, multi_index_mode)
+            matches = np.ones(len(rows.nodes), dtype=bool)
+            for f in filters:
+                # Like the per-node predicate, stop at the first filter that
+                # no node matches
+                if not matches.any():
+                    break
+                matches &= f.frame(rows)
+        except NotVectorizable:
+            return None
+        return pd.Series(matches, index=rows.nodes)
+
+    if attr_filter == {}:
+        return match_all
+    fingerprint = (
+        "object",
+        multi_index_mode,
+        tuple((f.key, type(f.value), f.value) for f in filters),
+    )
+    try:
+        hash(fingerprint)
+    except TypeError:
+        return vectorized_predicate(filter_choice, filter_frame)
+    columns = list(dict.fromkeys(f.key for f in filters))
+    return vectorized_predicate(filter_choice, filter_frame, fingerprint, columns)
 
 
 class ObjectQuery(Query):
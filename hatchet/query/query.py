@@ -3,9 +3,105 @@
 #
 # SPDX-License-Identifier: MIT
 
+import numpy as np
+import pandas as pd
+
 from .errors import InvalidQueryPath
 
 
+def vectorized_predicate(predicate, frame_predicate, fingerprint=None, columns=None):
+    """Attach a vectorized form to a query predicate.
+
+    The QueryEngine evaluates predicates with a vectorized form once over the
+    whole DataFrame instead of once per node. Predicates with a fingerprint
+    are evaluated once per DataFrame: their results are reused by the
+    following queries applied by the same QueryEngine, as long as the
+    columns read by the predicate hold the same values.
+
+    Arguments:
+        predicate (Callable): the predicate, accepting the row(s) of a single node
+        frame_predicate (Callable): accepts the whole DataFrame and returns a boolean pandas Series indexed by node, equivalent to applying "predicate" to the row(s) of each node, or None to fall back to "predicate"
+        fingerprint (hashable, optional): a value identifying the filtering done by the predicate, equal for equivalent predicates
+        columns (list, optional): the DataFrame columns read by the predicate (all columns if not provided)
+
+    Returns:
+        (Callable): the predicate
+    """
+    predicate.vectorized = frame_predicate
+    if fingerprint is not None:
+        predicate.fingerprint = fingerprint
+    if columns is not None:
+        predicate.columns = columns
+    return predicate
+
+
+def match_all(row):
+    """Predicate matching any node."""
+    return True
+
+
+vectorized_predicate(
+    match_all,
+    lambda dframe: pd.Series(True, index=dframe.index.unique("node")),
+    fingerprint="match_all",
+    columns=[],
+)
+
+
+class NotVectorizable(Exception):
+    """Raised when a predicate cannot be evaluated over a whole DataFrame."""
+
+
+class NodeRows(object):
+    """The rows of a DataFrame grouped by node, as seen by the vectorized
+    form of predicates.
+
+    For multi-indexed data, per-row matches are reduced to per-node matches
+    according to the multi-index mode ("any" or "all").
+    """
+
+    def __init__(self, dframe, multi_index_mode):
+        index = dframe.index
+        if "node" not in index.names:
+            raise NotVectorizable()
+        self.dframe = dframe
+        self.multi_index_mode = multi_index_mode
+        self.multi_index = isinstance(index, pd.MultiIndex)
+        if self.multi_index:
+            if multi_index_mode not in ("any", "all"):
+                raise NotVectorizable()
+            level = index.names.index("node")
+            self.codes = index.codes[level]
+            counts = np.bincount(self.codes, minlength=len(index.levels[level]))
+            self.used = counts > 0
+            self.nodes = index.levels[level][self.used]
+        else:
+            if not index.is_unique:
+                raise NotVectorizable()
+            self.nodes = index
+
+    def column(self, key):
+        """Returns the column for key, or None if there is no such column."""
+        try:
+            column = self.dframe[key]
+        except KeyError:
+            return None
+        if not isinstance(column, pd.Series):
+            raise NotVectorizable()
+        return column
+
+    def reduce(self, matches):
+        """Reduces the per-row matches to per-node matches."""
+        if not self.multi_index:
+            return matches
+        length = len(self.used)
+        if self.multi_index_mode == "any":
+            counts = np.bincount(self.codes, weights=matches, minlength=length)
+            return counts[self.used] > 0
+        counts = np.bincount(self.codes, weights=~matches, minlength=length)
+        return counts[self.used] == 0
+
+
 class Query(object):
     """Class for representing and building Hatchet Call Path Queries"""
 
@@ -13,7 +109,7 @@ class Query(object):
         """Create new Query"""
         self.query_pattern = []
 
-    def match(self, quantifier=".", predicate=lambda row: True):
+    def match(self, quantifier=".", predicate=match_all):
         """Start a query with a root node described by the arguments.
 
         Arguments:
@@ -28,7 +124,7 @@ class Query(object):
         self._add_node(quantifier, predicate)
         return self
 
-    def rel(self, quantifier=".", predicate=lambda row: True):
+    def rel(self, quantifier=".", predicate=match_all):
         """Add a new node to the end of the query.
 
         Arguments:
@@ -45,7 +141,7 @@ class Query(object):
         self._add_node(quantifier, predicate)
         return self
 
-    def relation(self, quantifer=".", predicate=lambda row: True):
+    def relation(self, quantifer=".", predicate=match_all):
         """Alias to Query.rel. Add a new node to the end of the query.
 
         Arguments:
@@ -65,7 +161,7 @@ class Query(object):
         """Allows users to iterate over the Query like a list."""
         return iter(self.query_pattern)
 
-    def _add_node(self, quantifer=".", predicate=lambda row: True):
+    def _add_node(self, quantifer=".", predicate=match_all):
         """Add a node to the query.
 
         Arguments:
@@ -0,0 +1,119 @@
+# Copyright 2017-2023 Lawrence Livermore National Security, LLC and other
+# Hatchet Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+
+from io import StringIO
+
+from ..util.timer import Timer
+
+
+class QueryReport(object):
+    """Report of how the QueryEngine applied a query (see ``QueryEngine.explain``).
+
+    Attributes:
+        query (Query or CompoundQuery): the query that was applied
+        num_nodes (int): the number of nodes in the graph
+        num_matches (int): the number of nodes from paths that match the query
+        timer (Timer): the wall time of each phase of the application
+        stages (list): for a Query, one dict per query node (see ``add_stage``)
+        operation (str): for a CompoundQuery, the name of its class
+        subqueries (list): for a CompoundQuery, the reports of its subqueries
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.num_nodes = 0
+        self.num_matches = 0
+        self.timer = Timer()
+        self.stages = []
+        self.operation = None
+        self.subqueries = []
+
+    def add_stage(self, quantifier, predicate):
+        """Add the stage of a query node, before the query is applied.
+
+        A stage has the following keys:
+            quantifier (str): the "." or "*" wildcard of the query node
+            predicate (str): a description of the predicate of the query node
+            evaluation (str): how the predicate was evaluated: "cached" (by an earlier query), "vectorized" (over the whole DataFrame), "rows" (node by node) or "shared" (with an earlier query node having the same predicate)
+            evaluations (int): the number of calls to the predicate
+            matches (int): the number of nodes matching the predicate
+            selectivity (float): the fraction of the nodes matching the predicate
+            reached (int): the number of partial paths (i.e., distinct last nodes and query nodes) matching the query up to the query node
+            expansions (int): for "*", the number of partial paths added by repeating the wildcard, counted by "reached" for the previous query node
+            accepted (int): the number of partial paths counted by "reached" that are part of a matching path
+        """
+        self.stages.append(
+            {
+                "quantifier": quantifier,
+                "predicate": _describe(predicate),
+                "evaluation": None,
+                "evaluations": 0,
+                "matches": 0,
+                "selectivity": 0.0,
+                "reached": 0,
+                "expansions": 0,
+                "accepted": 0,
+            }
+        )
+
+    def __str__(self):
+        out = StringIO()
+        self._write(out, "")
+        return out.getvalue()
+
+    def _write(self, out, indent):
+        if self.operation is not None:
+            out.write(
+                "%s%s: %d of %d nodes\n"
+                % (indent, self.operation, self.num_matches, self.num_nodes)
+            )
+            for subquery in self.subqueries:
+                subquery._write(out, indent + "    ")
+        else:
+            out.write(
+                "%sQuery: %d of %d nodes\n" % (indent, self.num_matches, self.num_nodes)
+            )
+            out.write(
+                "%s    %-3s %-10s %11s %9s %11s %9s %10s %9s  %s\n"
+                % (
+                    indent,
+                    "#",
+                    "evaluation",
+                    "evaluations",
+                    "matches",
+                    "selectivity",
+                    "reached",
+                    "expansions",
+                    "accepted",
+                    "predicate",
+                )
+            )
+            for i, stage in enumerate(self.stages):
+                out.write(
+                    "%s    %-3s %-10s %11d %9d %11.3f %9d %10d %9d  %s\n"
+                    % (
+                        indent,
+                        "%d%s" % (i, stage["quantifier"]),
+                        stage["evaluation"],
+                        stage["evaluations"],
+                        stage["matches"],
+                        stage["selectivity"],
+                        stage["reached"],
+                        stage["expansions"],
+                        stage["accepted"],
+                        stage["predicate"],
+                    )
+                )
+        for line in str(self.timer).splitlines():
+            out.write("%s%s\n" % (indent, line))
+
+
+def _describe(predicate):
+    """Describe a predicate by its fingerprint (see ``vectorized_predicate``)
+    or its name."""
+    fingerprint = getattr(predicate, "fingerprint", None)
+    if fingerprint is not None:
+        return str(fingerprint)
+    return getattr(predicate, "__name__", type(predicate).__name__)
@@ -3,18 +3,21 @@
 #
 # SPDX-License-Identifier: MIT
 
+import ast
+from collections import OrderedDict
 from numbers import Real
+import operator
 import re
 import sys
-import pandas as pd  # noqa: F401
-from pandas.api.types import is_numeric_dtype, is_string_dtype  # noqa: F401
-import numpy as np  # noqa: F401
+import pandas as pd
+from pandas.api.types import is_numeric_dtype, is_string_dtype
+import numpy as np
 from textx import metamodel_from_str
 from textx.exceptions import TextXError
 import warnings
 
 from .errors import InvalidQueryPath, InvalidQueryFilter, RedundantQueryFilterWarning
-from .query import Query
+from .query import NodeRows, NotVectorizable, Query, vectorized_predicate
 
 
 # PEG grammar for the String-based dialect
@@ -56,8 +59,31 @@ MetricId: '(' ids+=SingleMetricId[','] ')' | ids=SingleMetricId;
 SingleMetricId: INT | STRING;
 """
 
-# TextX metamodel for the String-based dialect
-cypher_query_mm = metamodel_from_str(CYPHER_GRAMMAR)
+# TextX metamodel for the String-based dialect, built on first use
+_cypher_query_mm = None
+
+# Maximum number of parsed queries kept by StringQuery
+_MAX_PARSED_QUERIES = 256
+
+# Parsed queries, keyed by query text and multi_index_mode, in least
+# recently used order
+_parsed_queries = OrderedDict()
+
+
+def _cypher_query_metamodel():
+    """Get the TextX metamodel for the String-based dialect, building it the
+    first time a query is parsed instead of when hatchet is imported."""
+    global _cypher_query_mm
+    if _cypher_query_mm is None:
+        _cypher_query_mm = metamodel_from_str(CYPHER_GRAMMAR)
+    return _cypher_query_mm
+
+
+def __getattr__(name):
+    # Keep the metamodel available as a module attribute
+    if name == "cypher_query_mm":
+        return _cypher_query_metamodel()
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
 
 
 def cname(obj):
@@ -65,33 +91,253 @@ def cname(obj):
     return obj.__class__.__name__
 
 
-def filter_check_types(type_check, df_row, filt_lambda):
-    """Utility function used in String-based predicates
-       to make sure the node data used in the actual boolean predicate
-       is of the correct type.
+def _python_string(value):
+    """Interpret a string value of a query the way a Python string literal
+    is interpreted (e.g., for escape sequences in regular expressions)."""
+    try:
+        return ast.literal_eval('"{}"'.format(value))
+    except (SyntaxError, ValueError):
+        return value
 
-    Arguments:
-        type_check (str): a string containing a boolean Python expression used to validate node data typing
-        df_row (pandas.Series or pandas.DataFrame): the row (or sub-DataFrame) representing the data for the current node being tested
-        filt_lambda (Callable): the lambda used to actually confirm whether the node satisfies the predicate
 
-    Returns:
-        (bool): True if the node satisfies the predicate. False otherwise
+def _warn_redundant(obj, prop, outcome):
+    warnings.warn(
+        """
+        The '{}' property of a Node is strictly non-negative.
+        This condition will always be {}.
+        The statement that triggered this warning is:
+        {}
+        """.format(
+            prop, outcome, obj
+        ),
+        RedundantQueryFilterWarning,
+    )
+
+
+# Operators applied to a single value of a node (and the condition's value)
+_OPERATORS = {
+    "==": operator.eq,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "startswith": lambda elem, value: elem.startswith(value),
+    "endswith": lambda elem, value: elem.endswith(value),
+    "contains": lambda elem, value: value in elem,
+    "match": lambda elem, value: value.match(elem) is not None,
+    "isna": lambda elem, value: pd.isna(elem),
+    "isinf": lambda elem, value: np.isinf(elem),
+    "is_none": lambda elem, value: elem is None,
+    "is_not_none": lambda elem, value: elem is not None,
+    "leaf": lambda node, value: len(node.children) == 0,
+}
+
+_STRING_OPERATORS = ("startswith", "endswith", "contains", "match")
+
+
+class _Condition(object):
+    """A single condition of the WHERE clause of a String-based query.
+
+    A condition applies an operator to a metric (i.e., a DataFrame column) or
+    to an attribute of the node ("depth", "node_id" or the node itself), and
+    can be evaluated on the row(s) of one node or on a whole DataFrame.
     """
-    try:
-        if type_check == "" or eval(type_check):
-            return filt_lambda(df_row)
+
+    def __init__(self, target, op, value=None, key=None, check=None, negate=False):
+        """
+        Arguments:
+            target (str): "metric", "depth", "node_id" or "node"
+            op (str): a key of _OPERATORS
+            value: the value compared against
+            key (str or tuple): the column of a "metric" condition
+            check (str): the type required for the values, "str", "real" or None
+            negate (bool): whether the condition is negated
+        """
+        self.target = target
+        self.op = op
+        self.value = value
+        self.key = key
+        self.check = check
+        self.negate = negate
+        self._operator = _OPERATORS[op]
+
+    @property
+    def fingerprint(self):
+        """A tuple equal for equivalent conditions."""
+        return (
+            self.target,
+            self.op,
+            type(self.value),
+            self.value,
+            self.key,
+            self.check,
+            self.negate,
+        )
+
+    def _node_attr(self, node):
+        if self.target == "depth":
+            return node._depth
+        if self.target == "node_id":
+            return node._hatchet_nid
+        return node
+
+    def _row_value(self, df_row, multi_index_mode):
+        if self.target == "metric":
+            return df_row[self.key]
+        if multi_index_mode != "off":
+            return self._node_attr(df_row.index.get_level_values("node")[0])
+        return self._node_attr(df_row.name)
+
+    def check_row(self, df_row, multi_index_mode):
+        """Checks the type of the data of a node used by the condition."""
+        if self.check is None:
+            return True
+        value = self._row_value(df_row, multi_index_mode)
+        if self.target != "metric":
+            return isinstance(value, Real)
+        if multi_index_mode != "off":
+            if self.check == "str":
+                return is_string_dtype(value)
+            return is_numeric_dtype(value)
+        if self.check == "str":
+            return isinstance(value, str)
+        return isinstance(value, Real)
+
+    def match_row(self, df_row, multi_index_mode):
+        """Evaluates the condition on the row(s) of a node."""
+        value = self._row_value(df_row, multi_index_mode)
+        if self.target == "metric" and multi_index_mode != "off":
+            result = value.apply(lambda elem: self._operator(elem, self.value))
+            if multi_index_mode == "any":
+                result = result.any()
+            else:
+                result = result.all()
         else:
-            raise InvalidQueryFilter("Type mismatch in filter")
-    except KeyError:
-        return False
+            result = self._operator(value, self.value)
+        return not result if self.negate else bool(result)
 
+    def check_frame(self, rows):
+        """Checks the type of the data used by the condition for all nodes.
 
-########################################################################
-# NOTE: the use of single and double quotes in processing string-dialect
-#       queries is EXTREMELY important. Inner strings (e.g., for metric
-#       names) MUST use single quotes.
-########################################################################
+        Returns:
+            (bool): True if the data of all nodes has the right type
+        """
+        if self.target != "metric":
+            return all(isinstance(self._node_attr(n), Real) for n in rows.nodes)
+        column = rows.column(self.key)
+        if rows.multi_index_mode != "off":
+            if self.check == "real":
+                return is_numeric_dtype(column)
+            # is_string_dtype may depend on the values of object columns
+            if is_string_dtype(column):
+                return True
+            if column.dtype == object:
+                raise NotVectorizable()
+            return False
+        if self.check == "real":
+            if column.dtype.kind in "iuf":
+                return True
+            if column.dtype.kind == "b":
+                raise NotVectorizable()
+            return all(isinstance(v, Real) for v in column.to_numpy(dtype=object))
+        return all(isinstance(v, str) for v in column.to_numpy(dtype=object))
+
+    def match_frame(self, rows):
+        """Evaluates the condition for all nodes.
+
+        Returns:
+            (numpy.ndarray): the boolean result for each node of rows
+        """
+        if self.target != "metric":
+            matches = np.array(
+                [
+                    bool(self._operator(self._node_attr(n), self.value))
+                    for n in rows.nodes
+                ],
+                dtype=bool,
+            )
+        else:
+            column = rows.column(self.key)
+            if column is None:
+                raise NotVectorizable()
+            if column.dtype.kind in "iufb" and self.op not in _STRING_OPERATORS:
+                values = column.to_numpy()
+                if self.op in ("is_none", "is_not_none"):
+                    matches = np.full(len(values), self.op == "is_not_none")
+                else:
+                    matches = np.asarray(self._operator(values, self.value))
+            else:
+                values = column.to_numpy(dtype=object)
+                if self.op in _STRING_OPERATORS and not all(
+                    isinstance(v, str) for v in values
+                ):
+                    raise NotVectorizable()
+                matches = np.array(
+                    [bool(self._operator(v, self.value)) for v in values], dtype=bool
+                )
+            matches = rows.reduce(matches.astype(bool))
+        return ~matches if self.negate else matches
+
+
+def _compile_predicate(conditions, multi_index_mode):
+    """Compiles the conditions on a query node into a predicate.
+
+    Arguments:
+        conditions (list): pairs of a boolean operator ("and", "or", or None for the first condition) and a _Condition
+        multi_index_mode (str): the multi-index mode of the query
+
+    Returns:
+        (Callable): the predicate, with a vectorized form
+    """
+    # "and" binds tighter than "or"
+    groups = []
+    for bool_op, cond in conditions:
+        if bool_op != "and" or not groups:
+            groups.append([])
+        groups[-1].append(cond)
+    checked = [cond for _, cond in conditions if cond.check is not None]
+
+    def predicate(df_row):
+        try:
+            for cond in checked:
+                if not cond.check_row(df_row, multi_index_mode):
+                    raise InvalidQueryFilter("Type mismatch in filter")
+            return any(
+                all(cond.match_row(df_row, multi_index_mode) for cond in group)
+                for group in groups
+            )
+        except KeyError:
+            return False
+
+    def frame_predicate(dframe):
+        try:
+            rows = NodeRows(dframe, multi_index_mode)
+            if (multi_index_mode != "off") != rows.multi_index:
+                return None
+            for cond in checked:
+                if cond.target == "metric" and rows.column(cond.key) is None:
+                    return pd.Series(False, index=rows.nodes)
+                if not cond.check_frame(rows):
+                    raise InvalidQueryFilter("Type mismatch in filter")
+            matches = np.zeros(len(rows.nodes), dtype=bool)
+            for group in groups:
+                group_matches = np.ones(len(rows.nodes), dtype=bool)
+                for cond in group:
+                    group_matches &= cond.match_frame(rows)
+                matches |= group_matches
+        except NotVectorizable:
+            return None
+        return pd.Series(matches, index=rows.nodes)
+
+    fingerprint = (
+        "string",
+        multi_index_mode,
+        tuple((bool_op, cond.fingerprint) for bool_op, cond in conditions),
+    )
+    columns = list(
+        dict.fromkeys(cond.key for _, cond in conditions if cond.target == "metric")
+    )
+    return vectorized_predicate(predicate, frame_predicate, fingerprint, columns)
 
 
 class StringQuery(Query):
@@ -100,8 +346,13 @@ class StringQuery(Query):
     def __init__(self, cypher_query, multi_index_mode="off"):
         """Builds a new StringQuery object representing a query in the String-based dialect.
 
+        The most recently used queries are only parsed once: StringQuery
+        objects built from the same query text and multi_index_mode share
+        their predicates.
+
         Arguments:
             cypher_query (str): a query in the String-based dialect
+            multi_index_mode (str, optional): how the predicates match the rows of a node in multi-indexed data ("off", "all" or "any")
         """
         if sys.version_info[0] == 2:
             super(StringQuery, self).__init__()
@@ -109,9 +360,32 @@ class StringQuery(Query):
             super().__init__()
         assert multi_index_mode in ["off", "all", "any"]
         self.multi_index_mode = multi_index_mode
+        key = (cypher_query, multi_index_mode)
+        parsed = _parsed_queries.get(key)
+        if parsed is not None:
+            # Reuse the parsed query, including its compiled predicates
+            _parsed_queries.move_to_end(key)
+            wcards, wcard_pos, filters, query_pattern = parsed
+            self.wcards = [list(wcard) for wcard in wcards]
+            self.wcard_pos = dict(wcard_pos)
+            self.filters = [list(conditions) for conditions in filters]
+            self.query_pattern = list(query_pattern)
+            return
+        self._parse(cypher_query)
+        _parsed_queries[key] = (
+            [list(wcard) for wcard in self.wcards],
+            dict(self.wcard_pos),
+            [list(conditions) for conditions in self.filters],
+            list(self.query_pattern),
+        )
+        while len(_parsed_queries) > _MAX_PARSED_QUERIES:
+            _parsed_queries.popitem(last=False)
+
+    def _parse(self, cypher_query):
+        """Parses the query and builds its predicates."""
         model = None
         try:
-            model = cypher_query_mm.model_from_str(cypher_query)
+            model = _cypher_query_metamodel().model_from_str(cypher_query)
         except TextXError as e:
             # TODO Change to a "raise-from" expression when Python 2.7 support is dropped
             raise InvalidQueryPath(
@@ -123,9 +397,8 @@ class StringQuery(Query):
         self.wcard_pos = {}
         self._parse_path(model.path_expr)
         self.filters = [[] for _ in self.wcards]
-        self._parse_conditions(model.cond_expr)
-        self.lambda_filters = [None for _ in self.wcards]
-        self._build_lambdas()
+        if model.cond_expr is not None:
+            self._parse_conditions(model.cond_expr)
         self._build_query()
 
     def _build_query(self):
@@ -137,43 +410,17 @@ class StringQuery(Query):
             # TODO Remove this when Python 2.7 support is dropped.
             if sys.version_info[0] == 2 and not isinstance(wcard, Real):
                 wcard = wcard.encode("ascii", "ignore")
-            filt_str = self.lambda_filters[i]
-            if filt_str is None:
+            if len(self.filters[i]) == 0:
                 if i == 0:
                     self.match(quantifier=wcard)
                 else:
                     self.rel(quantifier=wcard)
             else:
+                predicate = _compile_predicate(self.filters[i], self.multi_index_mode)
                 if i == 0:
-                    self.match(quantifier=wcard, predicate=eval(filt_str))
+                    self.match(quantifier=wcard, predicate=predicate)
                 else:
-                    self.rel(quantifier=wcard, predicate=eval(filt_str))
-
-    def _build_lambdas(self):
-        """Constructs the final predicate lambdas from the pre-parsed
-        predicate information.
-        """
-        for i in range(0, len(self.wcards)):
-            n = self.wcards[i]
-            if n[1] != "":
-                bool_expr = ""
-                type_check = ""
-                for j, cond in enumerate(self.filters[i]):
-                    if cond[0] is not None:
-                        bool_expr += " {}".format(cond[0])
-                    bool_expr += " {}".format(cond[1])
-                    if cond[2] is not None:
-                        if j == 0:
-                            type_check += " {}".format(cond[2])
-                        else:
-                            type_check += " and {}".format(cond[2])
-                bool_expr = "lambda df_row: {}".format(bool_expr)
-                bool_expr = (
-                    'lambda df_row: filter_check_types("{}", df_row, {})'.format(
-                        type_check, bool_expr
-                    )
-                )
-                self.lambda_filters[i] = bool_expr
+                    self.rel(quantifier=wcard, predicate=predicate)
 
     def _parse_path(self, path_obj):
         """Parses the MATCH statement of a String-based query."""
@@ -194,20 +441,19 @@ class StringQuery(Query):
         """
         conditions = cond_expr.conditions
         for cond in conditions:
-            converted_condition = None
+            bool_op = None
             if self._is_unary_cond(cond):
-                converted_condition = self._parse_unary_cond(cond)
+                name, converted_condition = self._parse_unary_cond(cond)
             elif self._is_binary_cond(cond):
-                converted_condition = self._parse_binary_cond(cond)
+                bool_op = "and" if cname(cond) == "AndCond" else "or"
+                name, converted_condition = self._parse_unary_cond(cond.subcond)
             else:
                 raise RuntimeError("Bad Condition")
-            self.filters[self.wcard_pos[converted_condition[1]]].append(
-                [converted_condition[0], converted_condition[2], converted_condition[3]]
-            )
-        for i in range(0, len(self.filters)):
-            if len(self.filters[i]) > 0:
-                if self.filters[i][0][0] != "not":
-                    self.filters[i][0][0] = None
+            filters = self.filters[self.wcard_pos[name]]
+            # the first condition on a node is not combined with anything
+            if len(filters) == 0:
+                bool_op = None
+            filters.append((bool_op, converted_condition))
 
     def _is_unary_cond(self, obj):
         """Detect whether a predicate is unary or not."""
@@ -226,209 +472,48 @@ class StringQuery(Query):
             return True
         return False
 
-    def _parse_binary_cond(self, obj):
-        """Top level function for parsing binary predicates."""
-        if cname(obj) == "AndCond":
-            return self._parse_and_cond(obj)
-        if cname(obj) == "OrCond":
-            return self._parse_or_cond(obj)
-        raise RuntimeError("Bad Binary Condition")
-
-    def _parse_or_cond(self, obj):
-        """Top level function for parsing predicates combined with logical OR."""
-        converted_subcond = self._parse_unary_cond(obj.subcond)
-        converted_subcond[0] = "or"
-        return converted_subcond
-
-    def _parse_and_cond(self, obj):
-        """Top level function for parsing predicates combined with logical AND."""
-        converted_subcond = self._parse_unary_cond(obj.subcond)
-        converted_subcond[0] = "and"
-        return converted_subcond
-
     def _parse_unary_cond(self, obj):
-        """Top level function for parsing unary predicates."""
+        """Top level function for parsing unary predicates.
+
+        Returns:
+            (tuple): the name of the query node and the _Condition
+        """
         if cname(obj) == "NotCond":
-            return self._parse_not_cond(obj)
+            name, converted_subcond = self._parse_single_cond(obj.subcond)
+            converted_subcond.negate = not converted_subcond.negate
+            return name, converted_subcond
         return self._parse_single_cond(obj)
 
-    def _parse_not_cond(self, obj):
-        """Parse predicates containing the logical NOT operator."""
-        converted_subcond = self._parse_single_cond(obj.subcond)
-        converted_subcond[2] = "not {}".format(converted_subcond[2])
-        return converted_subcond
-
-    def _run_method_based_on_multi_idx_mode(self, method_name, obj):
-        real_method_name = method_name
-        if self.multi_index_mode != "off":
-            real_method_name = method_name + "_multi_idx"
-        method = eval("StringQuery.{}".format(real_method_name))
-        return method(self, obj)
-
     def _parse_single_cond(self, obj):
         """Top level function for parsing individual numeric or string predicates."""
         if self._is_str_cond(obj):
-            return self._parse_str(obj)
+            return obj.name, self._parse_str(obj)
         if self._is_num_cond(obj):
-            return self._parse_num(obj)
-        if cname(obj) == "NoneCond":
-            return self._run_method_based_on_multi_idx_mode("_parse_none", obj)
-        if cname(obj) == "NotNoneCond":
-            return self._run_method_based_on_multi_idx_mode("_parse_not_none", obj)
+            return obj.name, self._parse_num(obj)
+        if cname(obj) in ("NoneCond", "NotNoneCond"):
+            op = "is_none" if cname(obj) == "NoneCond" else "is_not_none"
+            target = self._node_property(obj)
+            if target is not None:
+                return obj.name, _Condition(target, op)
+            return obj.name, _Condition("metric", op, key=self._metric_key(obj))
         if cname(obj) == "LeafCond":
-            return self._run_method_based_on_multi_idx_mode("_parse_leaf", obj)
+            return obj.name, _Condition("node", "leaf")
         if cname(obj) == "NotLeafCond":
-            return self._run_method_based_on_multi_idx_mode("_parse_not_leaf", obj)
+            return obj.name, _Condition("node", "leaf", negate=True)
         raise RuntimeError("Bad Single Condition")
 
-    def _parse_none(self, obj):
-        """Parses 'property IS NONE'."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "df_row.name._depth is None",
-                None,
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "df_row.name._hatchet_nid is None",
-                None,
-            ]
-        return [
-            None,
-            obj.name,
-            "df_row[{}] is None".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-            None,
-        ]
-
-    def _add_aggregation_call_to_multi_idx_predicate(self, predicate):
-        if self.multi_index_mode == "any":
-            return predicate + ".any()"
-        return predicate + ".all()"
-
-    def _parse_none_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._depth is None",
-                None,
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._hatchet_nid is None",
-                None,
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "df_row[{}].apply(lambda elem: elem is None)".format(
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                )
-            ),
-            None,
-        ]
-
-    def _parse_not_none(self, obj):
-        """Parses 'property IS NOT NONE'."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "df_row.name._depth is not None",
-                None,
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "df_row.name._hatchet_nid is not None",
-                None,
-            ]
-        return [
-            None,
-            obj.name,
-            "df_row[{}] is not None".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-            None,
-        ]
-
-    def _parse_not_none_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._depth is not None",
-                None,
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._hatchet_nid is not None",
-                None,
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "df_row[{}].apply(lambda elem: elem is not None)".format(
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                )
-            ),
-            None,
-        ]
-
-    def _parse_leaf(self, obj):
-        """Parses 'node IS LEAF'."""
-        return [
-            None,
-            obj.name,
-            "len(df_row.name.children) == 0",
-            None,
-        ]
-
-    def _parse_leaf_multi_idx(self, obj):
-        return [
-            None,
-            obj.name,
-            "len(df_row.index.get_level_values('node')[0].children) == 0",
-            None,
-        ]
-
-    def _parse_not_leaf(self, obj):
-        """Parses 'node IS NOT LEAF'."""
-        return [
-            None,
-            obj.name,
-            "len(df_row.name.children) > 0",
-            None,
-        ]
-
-    def _parse_not_leaf_multi_idx(self, obj):
-        return [
-            None,
-            obj.name,
-            "len(df_row.index.get_level_values('node')[0].children) > 0",
-            None,
-        ]
+    def _node_property(self, obj):
+        """Returns the node property ("depth" or "node_id") used by a
+        predicate, or None if the predicate uses a metric."""
+        if len(obj.prop.ids) == 1 and obj.prop.ids[0] in ("depth", "node_id"):
+            return obj.prop.ids[0]
+        return None
+
+    def _metric_key(self, obj):
+        """Returns the DataFrame column used by a predicate."""
+        if len(obj.prop.ids) > 1:
+            return tuple(obj.prop.ids)
+        return str(obj.prop.ids[0])
 
     def _is_str_cond(self, obj):
         """Determines whether a predicate is for string data."""
@@ -459,1232 +544,67 @@ class StringQuery(Query):
         return False
 
     def _parse_str(self, obj):
-        """Function that redirects processing of string predicates
-        to the correct function.
-        """
-        if cname(obj) == "StringEq":
-            return self._run_method_based_on_multi_idx_mode("_parse_str_eq", obj)
-        if cname(obj) == "StringStartsWith":
-            return self._run_method_based_on_multi_idx_mode(
-                "_parse_str_starts_with", obj
-            )
-        if cname(obj) == "StringEndsWith":
-            return self._run_method_based_on_multi_idx_mode("_parse_str_ends_with", obj)
-        if cname(obj) == "StringContains":
-            return self._run_method_based_on_multi_idx_mode("_parse_str_contains", obj)
+        """Processes string predicates."""
+        ops = {
+            "StringEq": "==",
+            "StringStartsWith": "startswith",
+            "StringEndsWith": "endswith",
+            "StringContains": "contains",
+            "StringMatch": "match",
+        }
+        if cname(obj) not in ops:
+            raise RuntimeError("Bad String Op Class")
+        value = _python_string(obj.val)
         if cname(obj) == "StringMatch":
-            return self._run_method_based_on_multi_idx_mode("_parse_str_match", obj)
-        raise RuntimeError("Bad String Op Class")
-
-    def _parse_str_eq(self, obj):
-        """Processes string equivalence predicates."""
-        return [
-            None,
-            obj.name,
-            'df_row[{}] == "{}"'.format(
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-                obj.val,
-            ),
-            "isinstance(df_row[{}], str)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_eq_multi_idx(self, obj):
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                'df_row[{}].apply(lambda elem: elem == "{}")'.format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_string_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_starts_with(self, obj):
-        """Processes string 'startswith' predicates."""
-        return [
-            None,
-            obj.name,
-            'df_row[{}].startswith("{}")'.format(
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-                obj.val,
-            ),
-            "isinstance(df_row[{}], str)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_starts_with_multi_idx(self, obj):
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                'df_row[{}].apply(lambda elem: elem.startswith("{}"))'.format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_string_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_ends_with(self, obj):
-        """Processes string 'endswith' predicates."""
-        return [
-            None,
-            obj.name,
-            'df_row[{}].endswith("{}")'.format(
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-                obj.val,
-            ),
-            "isinstance(df_row[{}], str)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_ends_with_multi_idx(self, obj):
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                'df_row[{}].apply(lambda elem: elem.endswith("{}"))'.format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_string_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_contains(self, obj):
-        """Processes string 'contains' predicates."""
-        return [
-            None,
-            obj.name,
-            '"{}" in df_row[{}]'.format(
-                obj.val,
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-            ),
-            "isinstance(df_row[{}], str)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_contains_multi_idx(self, obj):
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                'df_row[{}].apply(lambda elem: "{}" in elem)'.format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_string_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_match(self, obj):
-        """Processes string regex match predicates."""
-        return [
-            None,
-            obj.name,
-            're.match("{}", df_row[{}]) is not None'.format(
-                obj.val,
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-            ),
-            "isinstance(df_row[{}], str)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_str_match_multi_idx(self, obj):
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                'df_row[{}].apply(lambda elem: re.match("{}", elem) is not None)'.format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_string_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
+            value = re.compile(value)
+        return _Condition(
+            "metric",
+            ops[cname(obj)],
+            value,
+            key=self._metric_key(obj),
+            check="str",
+        )
 
     def _parse_num(self, obj):
-        """Function that redirects processing of numeric predicates
-        to the correct function.
-        """
-        if cname(obj) == "NumEq":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_eq", obj)
-        if cname(obj) == "NumLt":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_lt", obj)
-        if cname(obj) == "NumGt":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_gt", obj)
-        if cname(obj) == "NumLte":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_lte", obj)
-        if cname(obj) == "NumGte":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_gte", obj)
-        if cname(obj) == "NumNan":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_nan", obj)
-        if cname(obj) == "NumNotNan":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_not_nan", obj)
-        if cname(obj) == "NumInf":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_inf", obj)
-        if cname(obj) == "NumNotInf":
-            return self._run_method_based_on_multi_idx_mode("_parse_num_not_inf", obj)
-        raise RuntimeError("Bad Number Op Class")
-
-    def _parse_num_eq(self, obj):
-        """Processes numeric equivalence predicates."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val == -1:
-                return [
-                    None,
-                    obj.name,
-                    "len(df_row.name.children) == 0",
-                    None,
-                ]
-            elif obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.name._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._depth == {}".format(obj.val),
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.name._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._hatchet_nid == {}".format(obj.val),
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "df_row[{}] == {}".format(
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-                obj.val,
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_eq_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val == -1:
-                return [
-                    None,
-                    obj.name,
-                    "len(df_row.index.get_level_values('node')[0].children) == 0",
-                    None,
-                ]
-            elif obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._depth == {}".format(obj.val),
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._hatchet_nid == {}".format(
-                    obj.val
-                ),
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "df_row[{}].apply(lambda elem: elem == {})".format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_lt(self, obj):
-        """Processes numeric less-than predicates."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.name._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._depth < {}".format(obj.val),
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.name._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._hatchet_nid < {}".format(obj.val),
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "df_row[{}] < {}".format(
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-                obj.val,
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_lt_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._depth < {}".format(obj.val),
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._hatchet_nid < {}".format(
-                    obj.val
-                ),
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "df_row[{}].apply(lambda elem: elem < {})".format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_gt(self, obj):
-        """Processes numeric greater-than predicates."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be true.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "True",
-                    "isinstance(df_row.name._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._depth > {}".format(obj.val),
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be true.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "True",
-                    "isinstance(df_row.name._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._hatchet_nid > {}".format(obj.val),
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "df_row[{}] > {}".format(
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-                obj.val,
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_gt_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be true.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "True",
-                    "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._depth > {}".format(obj.val),
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be true.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "True",
-                    "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._hatchet_nid > {}".format(
-                    obj.val
-                ),
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "df_row[{}].apply(lambda elem: elem > {})".format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_lte(self, obj):
-        """Processes numeric less-than-or-equal-to predicates."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.name._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._depth <= {}".format(obj.val),
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.name._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._hatchet_nid <= {}".format(obj.val),
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "df_row[{}] <= {}".format(
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-                obj.val,
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_lte_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._depth <= {}".format(obj.val),
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be false.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "False",
-                    "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._hatchet_nid <= {}".format(
-                    obj.val
-                ),
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "df_row[{}].apply(lambda elem: elem <= {})".format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_gte(self, obj):
-        """Processes numeric greater-than-or-equal-to predicates."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be true.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "True",
-                    "isinstance(df_row.name._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._depth >= {}".format(obj.val),
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be true.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "True",
-                    "isinstance(df_row.name._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.name._hatchet_nid >= {}".format(obj.val),
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "df_row[{}] >= {}".format(
-                (
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                ),
-                obj.val,
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_gte_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'depth' property of a Node is strictly non-negative.
-                    This condition will always be true.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "True",
-                    "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._depth >= {}".format(obj.val),
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids == "node_id":
-            if obj.val < 0:
-                warnings.warn(
-                    """
-                    The 'node_id' property of a Node is strictly non-negative.
-                    This condition will always be true.
-                    The statement that triggered this warning is:
-                    {}
-                    """.format(
-                        obj
-                    ),
-                    RedundantQueryFilterWarning,
-                )
-                return [
-                    None,
-                    obj.name,
-                    "True",
-                    "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-                ]
-            return [
-                None,
-                obj.name,
-                "df_row.index.get_level_values('node')[0]._hatchet_nid >= {}".format(
-                    obj.val
-                ),
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "df_row[{}].apply(lambda elem: elem >= {})".format(
-                    (
-                        str(tuple(obj.prop.ids))
-                        if len(obj.prop.ids) > 1
-                        else "'{}'".format(obj.prop.ids[0])
-                    ),
-                    obj.val,
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_nan(self, obj):
-        """Processes predicates that check for NaN."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "pd.isna(df_row.name._depth)",
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "pd.isna(df_row.name._hatchet_nid)",
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "pd.isna(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_nan_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "pd.isna(df_row.index.get_level_values('node')[0]._depth)",
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "pd.isna(df_row.index.get_level_values('node')[0]._hatchet_nid)",
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "pd.isna(df_row[{}])".format(
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_not_nan(self, obj):
-        """Processes predicates that check for NaN."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "not pd.isna(df_row.name._depth)",
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "not pd.isna(df_row.name._hatchet_nid)",
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "not pd.isna(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_not_nan_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "not pd.isna(df_row.index.get_level_values('node')[0]._depth)",
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "not pd.isna(df_row.index.get_level_values('node')[0]._hatchet_nid)",
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "not pd.isna(df_row[{}])".format(
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_inf(self, obj):
-        """Processes predicates that check for Infinity."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "np.isinf(df_row.name._depth)",
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "np.isinf(df_row.name._hatchet_nid)",
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "np.isinf(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_inf_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "np.isinf(df_row.index.get_level_values('node')[0]._depth)",
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "np.isinf(df_row.index.get_level_values('node')[0]._hatchet_nid)",
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "np.isinf(df_row[{}])".format(
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_not_inf(self, obj):
-        """Processes predicates that check for not-Infinity."""
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "not np.isinf(df_row.name._depth)",
-                "isinstance(df_row.name._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "not np.isinf(df_row.name._hatchet_nid)",
-                "isinstance(df_row.name._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            "not np.isinf(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-            "isinstance(df_row[{}], Real)".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
-
-    def _parse_num_not_inf_multi_idx(self, obj):
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "depth":
-            return [
-                None,
-                obj.name,
-                "not np.isinf(df_row.index.get_level_values('node')[0]._depth)",
-                "isinstance(df_row.index.get_level_values('node')[0]._depth, Real)",
-            ]
-        if len(obj.prop.ids) == 1 and obj.prop.ids[0] == "node_id":
-            return [
-                None,
-                obj.name,
-                "not np.isinf(df_row.index.get_level_values('node')[0]._hatchet_nid)",
-                "isinstance(df_row.index.get_level_values('node')[0]._hatchet_nid, Real)",
-            ]
-        return [
-            None,
-            obj.name,
-            self._add_aggregation_call_to_multi_idx_predicate(
-                "not np.isinf(df_row[{}])".format(
-                    str(tuple(obj.prop.ids))
-                    if len(obj.prop.ids) > 1
-                    else "'{}'".format(obj.prop.ids[0])
-                )
-            ),
-            "is_numeric_dtype(df_row[{}])".format(
-                str(tuple(obj.prop.ids))
-                if len(obj.prop.ids) > 1
-                else "'{}'".format(obj.prop.ids[0])
-            ),
-        ]
+        """Processes numeric predicates."""
+        comparisons = {
+            "NumEq": "==",
+            "NumLt": "<",
+            "NumGt": ">",
+            "NumLte": "<=",
+            "NumGte": ">=",
+        }
+        checks = {
+            "NumNan": ("isna", False),
+            "NumNotNan": ("isna", True),
+            "NumInf": ("isinf", False),
+            "NumNotInf": ("isinf", True),
+        }
+        target = self._node_property(obj)
+        if cname(obj) in comparisons:
+            op = comparisons[cname(obj)]
+            if target == "depth" and op == "==" and obj.val == -1:
+                # depth == -1 matches leaves
+                return _Condition("node", "leaf")
+            if target is not None and obj.val < 0:
+                _warn_redundant(obj, target, "true" if op in (">", ">=") else "false")
+            value = obj.val
+            negate = False
+        elif cname(obj) in checks:
+            op, negate = checks[cname(obj)]
+            value = None
+        else:
+            raise RuntimeError("Bad Number Op Class")
+        if target is not None:
+            return _Condition(target, op, value, check="real", negate=negate)
+        return _Condition(
+            "metric",
+            op,
+            value,
+            key=self._metric_key(obj),
+            check="real",
+            negate=negate,
+        )
 
 
 def parse_string_dialect(query_str, multi_index_mode="off"):
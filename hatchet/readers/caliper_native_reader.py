@@ -13,7 +13,7 @@ import caliperreader as cr
 import hatchet.graphframe
 from hatchet.node import Node
 from hatchet.graph import Graph
-from hatchet.frame import Frame
+from hatchet.frame import FramePool
 from hatchet.util.timer import Timer
 
 
@@ -65,6 +65,7 @@ class CaliperNativeReader:
         self.node_dicts = []
         self.callpath_to_node = {}
         self.idx_to_node = {}
+        self.frames = FramePool()
         self.callpath_to_idx = {}
         self.global_nid = 0
         self.node_ordering = False
@@ -232,7 +233,8 @@ class CaliperNativeReader:
                     parent_name = parent_callpath[-1]
 
                     parent_node = Node(
-                        Frame({"type": "function", "name": parent_name}), None
+                        self.frames.intern({"type": "function", "name": parent_name}),
+                        None,
                     )
 
                     self.callpath_to_node[parent_callpath] = parent_node
@@ -292,7 +294,9 @@ class CaliperNativeReader:
                             if "min#min#aggregate.slot" in record:
                                 self.node_ordering = True
                                 order = record["min#min#aggregate.slot"]
-                            frame = Frame({"type": node_type, "name": node_label})
+                            frame = self.frames.intern(
+                                {"type": node_type, "name": node_label}
+                            )
                             order = int(order)
                             hnode = Node(frame, hnid=order)
                             self.callpath_to_node[node_callpath] = hnode
@@ -326,7 +330,9 @@ class CaliperNativeReader:
 
                         if root_callpath not in self.callpath_to_node:
                             # create the root since it doesn't exist
-                            frame = Frame({"type": "function", "name": root_label})
+                            frame = self.frames.intern(
+                                {"type": "function", "name": root_label}
+                            )
                             graph_root = Node(frame, None)
 
                             # store callpaths to identify the root
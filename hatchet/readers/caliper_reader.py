@@ -16,7 +16,7 @@ import numpy as np
 import hatchet.graphframe
 from hatchet.node import Node
 from hatchet.graph import Graph
-from hatchet.frame import Frame
+from hatchet.frame import FramePool
 from hatchet.util.timer import Timer
 from hatchet.util.executable import which
 
@@ -46,6 +46,7 @@ class CaliperReader:
 
         self.metadata = {}
 
+        self.frames = FramePool()
         self.idx_to_label = {}
         self.idx_to_node = {}
 
@@ -162,7 +163,10 @@ class CaliperReader:
                 if "parent" not in node:
                     # since this node does not have a parent, this is a root
                     graph_root = Node(
-                        Frame({"type": self.node_type, "name": node_label}), hnid=order
+                        self.frames.intern(
+                            {"type": self.node_type, "name": node_label}
+                        ),
+                        hnid=order,
                     )
                     list_roots.append(graph_root)
 
@@ -175,7 +179,9 @@ class CaliperReader:
                 else:
                     parent_hnode = (self.idx_to_node[node["parent"]])["node"]
                     hnode = Node(
-                        Frame({"type": self.node_type, "name": node_label}),
+                        self.frames.intern(
+                            {"type": self.node_type, "name": node_label}
+                        ),
                         hnid=order,
                     )
                     parent_hnode.add_child(hnode)
@@ -293,7 +299,7 @@ class CaliperReader:
                         max_nid += 1
                         idx = max_nid
                         hnode = Node(
-                            Frame(
+                            self.frames.intern(
                                 {"type": "statement", "file": file_path, "line": line}
                             ),
                             sn_hnode,
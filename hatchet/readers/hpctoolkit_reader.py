@@ -36,7 +36,7 @@ import hatchet.graphframe
 from hatchet.node import Node
 from hatchet.graph import Graph
 from hatchet.util.timer import Timer
-from hatchet.frame import Frame
+from hatchet.frame import FramePool
 
 
 src_file = 0
@@ -144,6 +144,7 @@ class HPCToolkitReader:
         # this list of dicts will hold all the node information such as
         # procedure name, load module, filename, etc. for all the nodes
         self.node_dicts = []
+        self.frames = FramePool()
 
         self.timer = Timer()
 
@@ -260,7 +261,7 @@ class HPCToolkitReader:
             # start with the root and create the callpath and node for the root
             # also a corresponding node_dict to be inserted into the dataframe
             graph_root = Node(
-                Frame(
+                self.frames.intern(
                     {"type": "function", "name": self.procedure_names[root.get("n")]}
                 ),
                 None,
@@ -341,7 +342,9 @@ class HPCToolkitReader:
             src_file = xml_node.get("f")
             line = int(xml_node.get("l"))
 
-            hnode = Node(Frame({"type": "function", "name": name}), hparent)
+            hnode = Node(
+                self.frames.intern({"type": "function", "name": name}), hparent
+            )
             node_dict = self.create_node_dict(
                 nid,
                 hnode,
@@ -361,7 +364,9 @@ class HPCToolkitReader:
             )
 
             hnode = Node(
-                Frame({"type": "loop", "file": self.src_files[src_file], "line": line}),
+                self.frames.intern(
+                    {"type": "loop", "file": self.src_files[src_file], "line": line}
+                ),
                 hparent,
             )
             node_dict = self.create_node_dict(
@@ -375,7 +380,7 @@ class HPCToolkitReader:
             name = os.path.basename(self.src_files[src_file]) + ":" + str(line)
 
             hnode = Node(
-                Frame(
+                self.frames.intern(
                     {
                         "type": "statement",
                         "file": self.src_files[src_file],
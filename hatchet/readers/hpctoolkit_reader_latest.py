@@ -10,7 +10,7 @@ from typing import Dict, Union
 
 import pandas as pd
 
-from hatchet.frame import Frame
+from hatchet.frame import FramePool
 from hatchet.graph import Graph
 from hatchet.graphframe import GraphFrame
 from hatchet.node import Node
@@ -75,6 +75,7 @@ class HPCToolkitReaderLatest:
         self._inclusive_metrics = {}
         self._exclusive_metrics = {}
 
+        self._frames = FramePool()
         self._cct_roots = []
         self._metrics_table = []
 
@@ -219,7 +220,7 @@ class HPCToolkitReaderLatest:
     def _store_cct_node(
         self, ctxId: int, frame: dict, parent: Node = None, depth: int = 0
     ) -> Node:
-        node = Node(Frame(frame), parent=parent, hnid=ctxId, depth=depth)
+        node = Node(self._frames.intern(frame), parent=parent, hnid=ctxId, depth=depth)
         if parent is None:
             self._cct_roots.append(node)
         else:
@@ -5,6 +5,13 @@
 
 from __future__ import division
 
+import gc
+import weakref
+
+import numpy as np
+import pytest
+
+import hatchet.graphframe
 from hatchet import GraphFrame
 
 
@@ -282,3 +289,155 @@ def test_imul_operator(mock_graph_literal):
 
     assert gf1.dataframe["time"].sum() == 1575
     assert gf1.dataframe["time (inc)"].sum() == 37900
+
+
+def test_chained_operators(mock_graph_literal):
+    gf1 = GraphFrame.from_literal(mock_graph_literal)
+    gf2 = gf1.copy()
+    gf2.dataframe = gf1.dataframe.assign(time=gf1.dataframe["time"] * 2 + 1)
+    time1 = gf1.dataframe["time"].to_numpy()
+    time2 = gf2.dataframe["time"].to_numpy()
+
+    # the metrics are not written into a dataframe until it is accessed
+    gf3 = (gf1 - gf2) / gf2
+    assert gf3.graph is gf1.graph
+    assert gf3._pending is not None
+    assert (gf3.dataframe["time"].to_numpy() == (time1 - time2) / time2).all()
+    assert gf3._pending is None
+    assert (gf3.dataframe["time (inc)"] == 0).all()
+    assert list(gf3.dataframe.columns) == list(gf1.dataframe.columns)
+    assert (gf3.dataframe["name"] == gf1.dataframe["name"]).all()
+
+    # the operands are not modified
+    assert (gf1.dataframe["time"].to_numpy() == time1).all()
+    assert (gf2.dataframe["time"].to_numpy() == time2).all()
+
+    # rows missing from other keep the values of self
+    gf4 = gf1.filter(lambda x: x["time"] > 5.0, squash=False)
+    gf5 = gf1 * gf4
+    kept = gf1.dataframe["time"] > 5.0
+    assert (
+        gf5.dataframe.loc[kept, "time"] == gf1.dataframe.loc[kept, "time"] ** 2
+    ).all()
+    assert (gf5.dataframe.loc[~kept, "time"] == gf1.dataframe.loc[~kept, "time"]).all()
+
+    # in place operators also defer writing the metrics
+    gf6 = gf1.copy()
+    gf6 += gf2
+    gf6 -= gf2
+    assert gf6._pending is not None
+    assert (gf6.dataframe["time"].to_numpy() == time1).all()
+    assert (gf1.dataframe["time"].to_numpy() == time1).all()
+
+
+def test_operators_keep_integer_columns(mock_graph_literal):
+    gf1 = GraphFrame.from_literal(mock_graph_literal)
+    gf1.dataframe = gf1.dataframe.astype({"time": "int64"})
+
+    # as with DataFrame.update, integer results keep the dtype of the column
+    gf2 = gf1 - gf1.filter(lambda x: x["time"] > 5, squash=False)
+    assert gf2.dataframe["time"].dtype == np.int64
+    assert gf2.dataframe["time (inc)"].dtype == np.float64
+    gf3 = (gf1 + gf1) * gf1
+    assert gf3.dataframe["time"].dtype == np.int64
+    assert (gf3.dataframe["time"] == 2 * gf1.dataframe["time"] ** 2).all()
+
+    # other results are floats
+    gf4 = gf1.copy()
+    gf4.dataframe = gf1.dataframe.assign(time=gf1.dataframe["time"] + 2)
+    assert (gf1 / gf4).dataframe["time"].dtype == np.float64
+
+
+def test_operators_with_string_metric(mock_dag_literal_module_more_complex):
+    gf1 = GraphFrame.from_literal(mock_dag_literal_module_more_complex)
+    assert "module" in gf1.exc_metrics
+    module = gf1.dataframe["module"]
+    time = gf1.dataframe["time"]
+
+    # non-numeric metrics are combined by pandas
+    gf2 = (gf1 + gf1) + gf1
+    assert (gf2.dataframe["module"] == module * 3).all()
+    assert (gf2.dataframe["time"] == time * 3).all()
+
+    # with other graphs, the operators combine the unified graphframes
+    gf3 = gf1.filter(lambda x: x["time"] > 5)
+    for gf4 in (gf1 - gf3, gf1 / gf3):
+        assert gf4.dataframe["module"].dropna().tolist() == module.tolist()
+        assert gf4.dataframe["time"].dtype == np.float64
+
+    with pytest.raises(TypeError):
+        gf1 - gf1
+
+
+def test_alignments_do_not_keep_graphs_alive(mock_graph_literal):
+    gf1 = GraphFrame.from_literal(mock_graph_literal)
+    gf2 = gf1.filter(lambda x: x["time"] > 5.0, squash=False)
+    gf1 - gf2
+    assert len(hatchet.graphframe._alignments) > 0
+
+    graph = weakref.ref(gf1.graph)
+    keys = list(hatchet.graphframe._alignments)
+    del gf1, gf2
+    gc.collect()
+    assert graph() is None
+    assert not set(keys) & set(hatchet.graphframe._alignments)
+
+
+def test_unify_many(mock_graph_literal):
+    gf1 = GraphFrame.from_literal(mock_graph_literal)
+    gf2 = GraphFrame.from_literal(mock_graph_literal)
+    gf3 = gf1.filter(lambda x: x["time"] > 5.0)
+
+    gf = GraphFrame.unify_many([gf1, gf2, gf3], profiles=["a", "b", "c"])
+
+    assert gf.graph == gf1.graph.union(gf3.graph)
+    assert list(gf.dataframe.index.names) == ["node", "profile"]
+    assert len(gf.dataframe) == 2 * len(gf1.dataframe) + len(gf3.dataframe)
+    assert set(gf.dataframe.index.get_level_values("node")) <= set(gf.graph.traverse())
+    for profile, orig in (("a", gf1), ("b", gf2), ("c", gf3)):
+        rows = gf.dataframe.xs(profile, level="profile")
+        assert sorted(zip(rows["name"], rows["time"])) == sorted(
+            zip(orig.dataframe["name"], orig.dataframe["time"])
+        )
+        assert all(n.frame["name"] == name for n, name in rows["name"].items())
+    assert gf.exc_metrics == gf1.exc_metrics
+    assert gf.inc_metrics == gf1.inc_metrics
+
+    # the inputs are not modified
+    assert len(gf1.dataframe) == len(gf1.graph)
+    assert gf1.dataframe.index.names == ["node"]
+
+
+def test_reduce(mock_graph_literal):
+    gf1 = GraphFrame.from_literal(mock_graph_literal)
+    gf2 = GraphFrame.from_literal(mock_graph_literal)
+    gf2.dataframe["time"] *= 3
+
+    total = GraphFrame.reduce([gf1, gf2], "sum")
+    assert total.graph == gf1.add(gf2).graph
+    assert len(total.dataframe) == len(total.graph)
+    assert total.dataframe["time"].sum() == 4 * gf1.dataframe["time"].sum()
+    assert total.dataframe["time (inc)"].sum() == 1320
+    assert sorted(total.dataframe["name"]) == sorted(gf1.dataframe["name"])
+
+    mean = GraphFrame.reduce([gf1, gf2], "mean")
+    assert mean.dataframe["time"].sum() == 2 * gf1.dataframe["time"].sum()
+    median = GraphFrame.reduce([gf1, gf2], 50)
+    assert median.dataframe["time"].equals(mean.dataframe["time"])
+    high = GraphFrame.reduce([gf1, gf2], "max")
+    assert high.dataframe["time"].equals(
+        GraphFrame.reduce([gf1, gf2], 100).dataframe["time"]
+    )
+
+    # nodes missing from a graphframe are aggregated over the others
+    gf3 = gf1.filter(lambda x: x["time"] > 5.0)
+    low = GraphFrame.reduce([gf1, gf2, gf3], "min")
+    assert len(low.dataframe) == len(low.graph)
+    for node, row in low.dataframe.iterrows():
+        assert row["time"] == min(
+            gf.dataframe.loc[n, "time"]
+            for gf in (gf1, gf2, gf3)
+            for n in gf.graph.traverse()
+            if n.path()
+            and [p.frame for p in n.path()] == [p.frame for p in node.path()]
+        )
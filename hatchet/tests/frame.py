@@ -5,7 +5,7 @@
 
 import pytest
 
-from hatchet.frame import Frame
+from hatchet.frame import Frame, FramePool
 
 
 def test_constructors():
@@ -97,3 +97,23 @@ def test_str():
         str(Frame(foo="baz", bar="quux"))
         == "{'bar': 'quux', 'foo': 'baz', 'type': 'None'}"
     )
+
+
+def test_frame_pool():
+    pool = FramePool()
+    attrs = {"name": "foo", "type": "function"}
+    f1 = pool.intern(attrs)
+    f2 = pool.intern({"type": "function", "name": "foo"})
+    f3 = pool.intern({"name": "bar"})
+
+    assert f1 is f2
+    assert f1.attrs is not attrs
+    assert f1 == Frame(attrs) and hash(f1) == hash(Frame(attrs))
+    assert f3 == Frame(name="bar")
+    assert f3 != f1
+    assert (f1.pool_id, f3.pool_id) == (0, 1)
+    assert Frame(attrs).pool_id is None
+    assert len(pool) == 2 and list(pool) == [f1, f3]
+
+    with pytest.raises(ValueError):
+        pool.intern({})
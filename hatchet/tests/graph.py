@@ -35,6 +35,55 @@ def test_len_tree():
     assert len(graph) == 5
 
 
+def test_traverse_after_add_child():
+    graph = Graph.from_lists(("a", ("b", "c"), "d"))
+    graph.enumerate_traverse()
+    assert len(graph) == 4
+    assert graph.is_tree()
+
+    graph.roots[0].add_child(Node(Frame(name="e")))
+    assert list(graph.traverse(attrs="name")) == ["a", "b", "c", "d", "e"]
+    assert len(graph) == 5
+
+    # a node reached twice
+    c = graph.roots[0].children[0].children[0]
+    graph.roots[0].children[1].add_child(c)
+    c.add_parent(graph.roots[0].children[1])
+    assert list(graph.traverse(attrs="name")) == ["a", "b", "c", "d", "e"]
+    assert not graph.is_tree()
+
+
+def test_compact_after_edits():
+    graph = Graph.from_lists(("a", ("b", "c"), "d"))
+    graph.enumerate_traverse()
+    compact = graph.compact()
+
+    # building another graph does not drop the cached arrays
+    Graph.from_lists(("a", "b")).compact()
+    assert graph.compact() is compact
+
+    # copies and unions see the edges added since the arrays were built
+    a, b, c, d = graph.traverse()
+    e = Node(Frame(name="e"))
+    a.add_child(e)
+    e.add_parent(a)
+    assert graph.compact() is not compact
+    assert list(graph.copy().traverse(attrs="name")) == ["a", "b", "c", "d", "e"]
+    union = graph.union(Graph.from_lists(("a", "f")))
+    assert list(union.traverse(attrs="name")) == ["a", "b", "c", "d", "e", "f"]
+
+    # and the children replaced since
+    graph.compact()
+    b.children = []
+    assert list(graph.copy().traverse(attrs="name")) == ["a", "b", "d", "e"]
+    assert len(graph) == 4
+
+    # lists modified in place need the cache to be invalidated
+    b.children.append(c)
+    graph.invalidate_cache()
+    assert len(graph.copy()) == 5
+
+
 def test_copy():
     d = Node(Frame(name="d"))
     diamond_subdag = Node.from_lists(("a", ("b", d), ("c", d)))
@@ -46,6 +95,36 @@ def test_copy():
     assert gc.node_ordering == g.node_ordering
 
 
+def test_copy_arrays():
+    g = Graph.from_lists(("a", ("b", "c", "d"), ("e", "f")), ("g", "h"))
+    old_to_new = {}
+    gc = g.copy(old_to_new)
+
+    # siblings have distinct frames, so the copy reuses the arrays
+    assert gc.compact().child_indices is g.compact().child_indices
+    assert list(gc.compact().nodes) == list(gc.traverse())
+    assert [n._hatchet_nid for n in gc.traverse()] == list(range(len(gc)))
+    assert [n._depth for n in gc.traverse()] == [n._depth for n in g.traverse()]
+    for old, new in old_to_new.items():
+        assert new is not old
+        assert new.frame == old.frame
+        assert [c.frame for c in new.children] == [c.frame for c in old.children]
+        assert [p.frame for p in new.parents] == [p.frame for p in old.parents]
+
+    # equal siblings are traversed in an order that depends on the nodes
+    g = Graph.from_lists(("a", ("b", "c"), ("b", "d")))
+    gc = g.copy()
+    assert gc.compact().child_indices is not g.compact().child_indices
+    assert gc == g
+    assert [n._hatchet_nid for n in gc.traverse()] == list(range(len(gc)))
+
+    # a node shared with another graph only keeps the parents of this one
+    d = Node(Frame(name="d"))
+    Graph.from_lists(("x", d))
+    g = Graph.from_lists(("a", d))
+    assert [p.frame["name"] for p in g.copy().roots[0].children[0].parents] == ["a"]
+
+
 def test_union_dag():
     # make graphs g1, g2, and g3, where you know g3 is the union of g1 and g2
     c = Node.from_lists(("c", "d"))
@@ -65,6 +144,60 @@ def test_union_dag():
     assert g4 == g3
 
 
+def test_union_trees():
+    g1 = Graph.from_lists(("a", ("b", "c", "d"), ("e", "f")), ("g", "h"))
+    g2 = Graph.from_lists(("a", ("b", "d", "i"), "f"), ("j", "h"))
+    assert Graph._union_paths([g1, g2]) is not None
+
+    graph, self_map, other_map = g1.union_map(g2)
+    old_to_new = {}
+    merged = g1._union_merge(g2, old_to_new)
+
+    assert graph == merged
+    assert list(graph.traverse(attrs="name")) == list(merged.traverse(attrs="name"))
+    assert [n._hatchet_nid for n in graph.traverse()] == list(range(len(graph)))
+    assert [n._depth for n in graph.traverse()] == [n._depth for n in merged.traverse()]
+    for g, node_map in ((g1, self_map), (g2, other_map)):
+        assert [n._hatchet_nid for n in node_map] == [
+            old_to_new[id(n)]._hatchet_nid for n in g.compact().nodes
+        ]
+
+    # the compact form built with the union matches one built from scratch
+    compact = graph.compact()
+    graph.invalidate_cache()
+    rebuilt = graph.compact()
+    for attr in (
+        "nids",
+        "child_offsets",
+        "child_indices",
+        "parent_offsets",
+        "parent_indices",
+        "roots",
+        "tree_parent",
+        "tree_depth",
+        "tree_end",
+        "postorder",
+        "depth",
+    ):
+        assert list(getattr(compact, attr)) == list(getattr(rebuilt, attr))
+    assert list(compact.nodes) == list(rebuilt.nodes)
+    assert [compact.frames[i] for i in compact.frame_ids] == [
+        n.frame for n in rebuilt.nodes
+    ]
+
+
+def test_union_siblings_with_equal_frames():
+    # siblings with equal frames are merged recursively
+    g1 = Graph.from_lists(("a", ("b", "c"), ("b", "d")))
+    g2 = Graph.from_lists(("a", ("b", "c")))
+    assert Graph._union_paths([g1, g2]) is None
+
+    graph, self_map, other_map = g1.union_map(g2)
+    assert len(graph) == 5
+    assert any(other_map[1] is self_map[i] for i in (1, 3))
+    assert other_map[2].parents == [other_map[1]]
+
+
 def test_dag_is_not_tree():
     g = Graph.from_lists(("b", "c"), ("d", "e"))
     assert not g.is_tree()
@@ -92,3 +225,61 @@ def test_trees_are_trees():
         ("a", ("b", "e", "f", "g"), ("c", "e", "f", "g"), ("d", "e", "f", "g"))
     )
     assert g.is_tree()
+
+
+def test_compact():
+    d = Node(Frame(name="d"))
+    g = Graph.from_lists(("a", ("b", d), ("c", d, "e")))
+    (a, b, d, c, e) = g.traverse()
+    compact = g.compact()
+
+    assert compact is g.compact()
+    assert list(compact.nodes) == [a, b, d, c, e]
+    assert list(compact.nids) == [0, 1, 2, 3, 4]
+    assert list(compact.child_offsets) == [0, 2, 3, 3, 5, 5]
+    assert list(compact.child_indices) == [1, 3, 2, 2, 4]
+    assert list(compact.parent_offsets) == [0, 0, 1, 3, 4, 5]
+    assert list(compact.parent_indices) == [0, 1, 3, 0, 3]
+    assert list(compact.depth) == [n._depth for n in (a, b, d, c, e)]
+    assert len(compact.frames) == 5
+    assert list(compact.frame_ids) == [0, 1, 2, 3, 4]
+    assert list(g.traverse(order="post")) == [d, b, e, c, a]
+    assert list(g.traversal_nids()) == [0, 1, 2, 3, 4]
+    assert list(g.traversal_nids(order="post")) == [2, 1, 4, 3, 0]
+
+
+def test_compact_invalidated_by_changes():
+    g = Graph.from_lists(("a", "b", "c"))
+    (a, b, c) = g.traverse()
+    assert len(g) == 3 and g.is_tree()
+
+    d = Node(Frame(name="d"), parent=b)
+    b.add_child(d)
+    c.add_child(d)
+    d.add_parent(c)
+    g.enumerate_traverse()
+    assert len(g) == 4 and not g.is_tree()
+    assert d._depth == 2
+
+    g.roots = [b]
+    assert list(g.traverse()) == [b, d]
+
+
+def test_normalize():
+    d1 = Node(Frame(name="d"))
+    d2 = Node(Frame(name="d"))
+    g = Graph.from_lists(("a", ("b", d1, "e"), ("b", d2, ("c", d1)), ("c", d2)))
+    nodes = list(g.traverse())
+    merges = g.normalize()
+    g.enumerate_traverse()
+
+    d = Node(Frame(name="d"))
+    assert len(g) == 6
+    assert g == Graph.from_lists(("a", ("b", d, "e", ("c", d)), ("c", d)))
+
+    # every node is mapped to a node that is still part of the graph
+    remaining = set(id(n) for n in g.traverse())
+    assert all(id(merges.get(n, n)) in remaining for n in nodes)
+    for node in g.traverse():
+        frames = [c.frame for c in node.children]
+        assert len(frames) == len(set(frames))
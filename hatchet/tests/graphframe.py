@@ -8,6 +8,7 @@
 from __future__ import division
 
 import os
+import sys
 
 import pytest
 
@@ -58,6 +59,71 @@ def test_deepcopy(mock_graph_literal):
     assert self.metadata == other.metadata
 
 
+def test_deepcopy_keeps_parents(mock_graph_literal_duplicates, calc_pi_callgrind_dot):
+    def parent_names(graph):
+        return [[p.frame["name"] for p in n.parents] for n in graph.traverse()]
+
+    for gf in (
+        GraphFrame.from_literal(mock_graph_literal_duplicates),
+        GraphFrame.from_gprof_dot(str(calc_pi_callgrind_dot)),
+    ):
+        other = gf.deepcopy()
+        assert parent_names(other.graph) == parent_names(gf.graph)
+        assert all(not root.parents for root in other.graph.roots)
+        assert other.tree() == gf.tree()
+
+
+def test_deepcopy_after_add_child(mock_graph_literal):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    gf.update_inclusive_columns()
+    num_nodes = len(gf.graph)
+
+    root = gf.graph.roots[0]
+    node = Node(Frame(name="z", type="function"))
+    root.add_child(node)
+    node.add_parent(root)
+    assert len(gf.graph) == num_nodes + 1
+    assert len(gf.deepcopy().graph) == num_nodes + 1
+
+
+def test_deepcopy_copy_on_write(mock_graph_literal):
+    self = GraphFrame.from_literal(mock_graph_literal)
+    self.copy_on_write = True
+    other = self.deepcopy()
+
+    # the graph is shared until the topology of one of them changes
+    assert other.copy_on_write
+    assert self.graph is other.graph
+    assert self.graph.shared
+    assert self.dataframe is not other.dataframe
+    assert self.dataframe.equals(other.dataframe)
+    other.dataframe["time"] += 1
+    assert not self.dataframe["time"].equals(other.dataframe["time"])
+
+    graph = self.graph
+    nodes = list(graph.traverse())
+    assert other.own_graph() is other.graph
+    assert other.graph is not graph
+    assert not other.graph.shared
+    assert other.graph == graph
+    assert len(other.dataframe) == len(self.dataframe)
+    assert set(other.dataframe.index) == set(other.graph.traverse())
+    assert not set(map(id, other.dataframe.index)) & set(map(id, nodes))
+
+    # modifying the copy leaves the original intact
+    other.graph.roots[0].children = []
+    assert list(self.graph.traverse()) == nodes
+
+    # filtered GraphFrames share the graph too
+    filtered = self.filter(lambda x: x["time"] > 5.0, squash=False)
+    assert filtered.graph is graph and filtered.copy_on_write
+
+    default = GraphFrame.from_literal(mock_graph_literal)
+    assert not default.copy_on_write
+    assert not default.deepcopy().graph.shared
+    assert default.own_graph() is default.graph
+
+
 def test_drop_index_levels(calc_pi_hpct_db):
     gf = GraphFrame.from_hpctoolkit(str(calc_pi_hpct_db))
     num_nodes = len(gf.graph)
@@ -167,6 +233,85 @@ def test_subtree_product():
     assert gf.dataframe.loc[e, "out2"] == 2
 
 
+def test_subgraph_sum_dag():
+    d = Node(Frame(name="d"))
+    e = Node(Frame(name="e"))
+    gf = GraphFrame.from_lists(("a", ("b", d, e), ("c", d, ("f", e)), ("g", "h")))
+    (a, b, d, e, c, f, g, h) = gf.graph.traverse()
+
+    assert not gf.graph.is_tree()
+    assert gf.dataframe.loc[a, "time (inc)"] == 8
+    assert gf.dataframe.loc[b, "time (inc)"] == 3
+    assert gf.dataframe.loc[c, "time (inc)"] == 4
+    assert gf.dataframe.loc[f, "time (inc)"] == 2
+    assert gf.dataframe.loc[g, "time (inc)"] == 2
+
+    gf.dataframe.loc[d, "time"] = np.nan
+    gf.dataframe.loc[e, "time"] = np.nan
+    gf.dataframe["time2"] = gf.dataframe["time"]
+    gf.subgraph_sum(["time"], ["fast"])
+    gf._subgraph_sum_reference(["time2"], ["time2"], lambda x: x.sum(min_count=1))
+    assert gf.dataframe["fast"].equals(gf.dataframe["time2"])
+    assert np.isnan(gf.dataframe.loc[e, "fast"])
+    assert gf.dataframe.loc[a, "fast"] == 6
+
+
+def test_subgraph_min_max_dag():
+    d = Node(Frame(name="d"))
+    gf = GraphFrame.from_lists(("a", ("b", d), ("c", d)))
+    (a, b, d, c) = gf.graph.traverse()
+    gf.dataframe["time"] = [4.0, 3.0, 1.0, 5.0]
+
+    gf.subgraph_sum(["time"], ["min"], function="min")
+    gf.subgraph_sum(["time"], ["max"], function="max")
+    assert list(gf.dataframe.loc[[a, b, d, c], "min"]) == [1.0, 1.0, 1.0, 1.0]
+    assert list(gf.dataframe.loc[[a, b, d, c], "max"]) == [5.0, 3.0, 1.0, 5.0]
+
+    with pytest.raises(ValueError):
+        gf.subgraph_sum(["time"], ["out"], function="mean")
+
+
+def test_subgraph_sum_cycle(hatchet_cycle_pstats):
+    gf = GraphFrame.from_cprofile(str(hatchet_cycle_pstats))
+    expected = gf.copy()
+    expected.dataframe = gf.dataframe.copy()
+
+    gf.subgraph_sum(["time"], ["out"])
+    expected._init_sum_columns(["time"], ["out"])
+    expected._subgraph_sum_reference(["time"], ["out"], lambda x: x.sum(min_count=1))
+    assert gf.dataframe["out"].equals(expected.dataframe["out"])
+
+
+def test_subtree_sum_dag():
+    d = Node(Frame(name="d"))
+    gf = GraphFrame.from_lists(("a", ("b", d), ("c", d, "e")))
+    (a, b, d, c, e) = gf.graph.traverse()
+    gf.dataframe.loc[e, "time"] = np.nan
+    gf.dataframe["time2"] = gf.dataframe["time"]
+
+    gf.subtree_sum(["time"], ["fast"])
+    gf._subtree_sum_reference(["time2"], lambda x: x.sum(min_count=1))
+    assert gf.dataframe["fast"].equals(gf.dataframe["time2"])
+    # d is counted once through b and once through c
+    assert gf.dataframe.loc[a, "fast"] == 5
+    assert np.isnan(gf.dataframe.loc[e, "fast"])
+
+    gf.subtree_sum(["time"], ["max"], function="max")
+    assert list(gf.dataframe.loc[[a, b, d, c], "max"]) == [1, 1, 1, 1]
+
+
+def test_subtree_sum_multi_index(calc_pi_hpct_db):
+    gf = GraphFrame.from_hpctoolkit(str(calc_pi_hpct_db))
+    expected = gf.copy()
+    expected.dataframe = gf.dataframe.copy()
+
+    gf.subtree_sum(["time"], ["out"])
+    expected._init_sum_columns(["time"], ["out"])
+    expected._subtree_sum_reference(["out"], lambda x: x.sum(min_count=1))
+    assert np.allclose(gf.dataframe["out"], expected.dataframe["out"])
+    assert np.allclose(gf.dataframe["out"], gf.dataframe["time (inc)"])
+
+
 def check_filter_no_squash(gf, filter_func, num_rows):
     """Ensure filtering and squashing results in the right Graph and GraphFrame."""
 
@@ -499,6 +644,71 @@ def test_filter_squash_bunny_to_goat_with_merge():
     )
 
 
+def test_squash_multi_index():
+    """Test that squash merges the rows of merged nodes for each rank.
+
+    Metric columns are summed (NaN if all values are NaN), other columns
+    keep the value of the first row, even if it is NaN.
+
+    """
+    d1 = Node(Frame(name="d"))
+    d2 = Node(Frame(name="d"))
+    graph = Graph.from_lists(("a", ("b", d1), ("c", d2)))
+    graph.enumerate_traverse()
+    (a, b, d1, c, d2) = graph.traverse()
+
+    index = pd.MultiIndex.from_product([[a, b, d1, c, d2], [0, 1]])
+    index.names = ["node", "rank"]
+    df = pd.DataFrame(
+        {
+            "time": [1.0, 1.0, 2.0, 2.0, np.nan, 3.0, 4.0, 4.0, np.nan, 5.0],
+            "count": [1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+            "note": ["a", "a", "b", "b", np.nan, "d1", "c", "c", "x", "y"],
+        },
+        index=index,
+    )
+    gf = GraphFrame(graph, df, ["time", "count"], [])
+
+    # remove b and c; the two d nodes are merged under a
+    filtered = gf.copy()
+    filtered.dataframe = gf.dataframe.drop(index=[b, c], level="node")
+    squashed = filtered.squash(update_inc_cols=False)
+
+    assert squashed.graph == Graph.from_lists(("a", "d"))
+    (new_a, new_d) = squashed.graph.traverse()
+    result = squashed.dataframe
+    assert list(result.index) == [(new_a, 0), (new_a, 1), (new_d, 0), (new_d, 1)]
+    assert list(result.index.levels[0]) == [new_a, new_d]
+    assert np.isnan(result.loc[(new_d, 0), "time"])
+    assert result.loc[(new_d, 1), "time"] == 8.0
+    assert result["count"].dtype == np.int64
+    assert list(result["count"]) == [1, 1, 2, 2]
+    assert pd.isna(result.loc[(new_d, 0), "note"])
+    assert result.loc[(new_d, 1), "note"] == "d1"
+
+
+def test_squash_deep_chain():
+    """Test squash on a chain deeper than the recursion limit."""
+    depth = 2 * sys.getrecursionlimit()
+    nodes = [Node(Frame(name="n%d" % i)) for i in range(depth)]
+    for parent, child in zip(nodes, nodes[1:]):
+        parent.add_child(child)
+        child.add_parent(parent)
+    graph = Graph(nodes[:1])
+    graph.enumerate_traverse()
+    df = pd.DataFrame({"node": nodes, "time": [1.0] * depth}).set_index("node")
+    gf = GraphFrame(graph, df, ["time"], [])
+
+    # only keep every other node of the chain
+    filtered = gf.copy()
+    filtered.dataframe = gf.dataframe.loc[nodes[::2]]
+    squashed = filtered.squash()
+
+    assert len(squashed.graph) == depth // 2
+    assert squashed.graph.is_tree()
+    assert list(squashed.dataframe["time (inc)"])[:2] == [depth // 2, depth // 2 - 1]
+
+
 def test_filter_no_squash_mock_literal(mock_graph_literal):
     """Test the squash operation with a foo-bar tree."""
     gf = GraphFrame.from_literal(mock_graph_literal)
@@ -535,6 +745,102 @@ def test_filter_no_squash_mock_literal_multi_subtree_merge(mock_graph_literal):
     assert all(n in filtered_gf.graph.traverse() for n in filtered_gf.dataframe["node"])
 
 
+def test_filter_parallel(monkeypatch, mock_graph_literal, tau_profile_dir):
+    import hatchet.graphframe
+
+    monkeypatch.setattr(hatchet.graphframe, "_MIN_ROWS_PER_PROC", 1)
+    monkeypatch.setattr(hatchet.graphframe, "_FILTER_SAMPLE_ROWS", 2)
+    monkeypatch.setattr(hatchet.graphframe, "_PARALLEL_COST_PER_ROW", 0)
+    monkeypatch.setattr(hatchet.graphframe, "_PARALLEL_COST_PER_NODE", 0)
+    monkeypatch.setattr(hatchet.graphframe.mp, "cpu_count", lambda: 4)
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    nodes = list(gf.graph.traverse())
+    filters = [
+        lambda x: x["time"] > 5.0,
+        lambda x: x["node"].frame["name"].startswith("b"),
+        lambda x: x["node"] in nodes[:10] and x["node"]._hatchet_nid % 2 == 0,
+        # the topology of the graph is visible to the filter
+        lambda x: len(x["node"].children) == 0,
+        lambda x: [p.frame["name"] for p in x["node"].parents] == ["foo"],
+        lambda x: any(
+            n.frame["name"] == "corge" for c in x["node"].children for n in c.children
+        ),
+    ]
+    for filter_func in filters:
+        serial = gf.filter(filter_func, squash=False, num_procs=1)
+        parallel = gf.filter(filter_func, squash=False, num_procs=3)
+        assert len(serial.dataframe) > 0
+        assert parallel.dataframe.equals(serial.dataframe)
+        # the rows keep the nodes of the graph
+        assert all(
+            node is nodes[nodes.index(node)] for node in parallel.dataframe.index
+        )
+        assert parallel.filter(lambda x: True, num_procs=3).graph == (
+            serial.filter(lambda x: True, num_procs=1).graph
+        )
+
+    gf = GraphFrame.from_tau(str(tau_profile_dir))
+    filter_func = lambda x: x["rank"] > 0 and x["time"] > 100  # noqa: E731
+    serial = gf.filter(filter_func, squash=False, num_procs=1)
+    parallel = gf.filter(filter_func, squash=False, num_procs=4)
+    assert parallel.dataframe.equals(serial.dataframe)
+
+    def raise_error(row):
+        raise ValueError("bad filter")
+
+    with pytest.raises(ValueError, match="bad filter"):
+        gf.filter(raise_error, num_procs=2)
+
+    # a worker that dies is reported instead of waited for
+    pid = os.getpid()
+
+    def kill_worker(row):
+        if os.getpid() != pid:
+            os._exit(1)
+        return True
+
+    with pytest.raises(RuntimeError, match="died"):
+        gf.filter(kill_worker, num_procs=2)
+    assert len(gf.filter(filter_func, squash=False, num_procs=2).dataframe) == len(
+        serial.dataframe
+    )
+
+
+def test_filter_vectorized(mock_graph_literal, tau_profile_dir):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    for squash in (False, True):
+        expected = gf.filter(lambda x: x["time"] > 5.0, squash=squash, num_procs=1)
+        filtered = gf.filter(
+            lambda df: df["time"] > 5.0, squash=squash, vectorized=True
+        )
+        assert filtered.dataframe.equals(expected.dataframe)
+        assert filtered.graph == expected.graph
+
+    # the "node" column and numpy arrays are supported
+    filtered = gf.filter(
+        lambda df: np.array([n.frame["name"] == "bar" for n in df["node"]]),
+        squash=False,
+        vectorized=True,
+    )
+    expected = gf.filter(
+        lambda x: x["node"].frame["name"] == "bar", squash=False, num_procs=1
+    )
+    assert len(filtered.dataframe) == 3
+    assert filtered.dataframe.equals(expected.dataframe)
+
+    gf = GraphFrame.from_tau(str(tau_profile_dir))
+    expected = gf.filter(lambda x: x["rank"] > 0 and x["time"] > 100, num_procs=1)
+    filtered = gf.filter(
+        lambda df: (df["rank"] > 0) & (df["time"] > 100), vectorized=True
+    )
+    assert filtered.dataframe.equals(expected.dataframe)
+
+    with pytest.raises(InvalidFilter):
+        gf.filter(lambda df: df["time"].max() > 100, vectorized=True)
+    with pytest.raises(EmptyFilter):
+        gf.filter(lambda df: df["time"] < 0, vectorized=True)
+
+
 def test_filter_squash_mock_literal_multi_subtree_merge(mock_graph_literal):
     gf = GraphFrame.from_literal(mock_graph_literal)
     gf.drop_index_levels()
@@ -744,6 +1050,52 @@ def test_unify_diff_graphs():
     assert len(gf1.graph) == gf1.dataframe.shape[0]
 
 
+def test_insert_missing_rows_multiindex():
+    gf1 = GraphFrame.from_lists(("a", "b", "c"))
+    gf2 = GraphFrame.from_lists(("a", "b", "d"))
+    for gf, ranks in ((gf1, [0, 1]), (gf2, [1, 2])):
+        gf.dataframe = pd.concat(
+            [gf.dataframe.assign(rank=rank) for rank in ranks]
+        ).set_index("rank", append=True)
+
+    gf3 = gf1 - gf2
+    assert len(gf3.graph) == 4
+    assert list(gf3.dataframe.index.names) == ["node", "rank"]
+
+    # rows are matched by node and rank
+    missing = {
+        (node.frame["name"], rank): value
+        for (node, rank), value in gf3.dataframe["_missing_node"].items()
+    }
+    assert missing == {
+        ("a", 0): 1,
+        ("b", 0): 1,
+        ("c", 0): 1,
+        ("c", 1): 1,
+        ("a", 1): 0,
+        ("b", 1): 0,
+        ("a", 2): 2,
+        ("b", 2): 2,
+        ("d", 1): 2,
+        ("d", 2): 2,
+    }
+    rows = gf3.dataframe["_missing_node"]
+    assert (gf3.dataframe.loc[rows == 0, "time"] == 0).all()
+    assert gf3.dataframe.loc[rows == 2, "time"].isna().all()
+
+    # without common levels, rows are matched by node
+    gf4 = GraphFrame.from_lists(("a", "b", "d"))
+    gf1.unify(gf4)
+    assert gf1.graph is gf4.graph
+    missing = gf1.dataframe.groupby(
+        gf1.dataframe.index.get_level_values("node").map(lambda n: n.frame["name"])
+    )["_missing_node"].unique()
+    assert missing.to_dict() == {"a": [0], "b": [0], "c": [1], "d": [2]}
+    assert gf1.dataframe.loc[gf1.dataframe["_missing_node"] == 2, "name"].tolist() == [
+        "d"
+    ]
+
+
 def test_sub_decorator(monkeypatch, small_mock1, small_mock2, small_mock3):
     monkeypatch.setattr("sys.stdout.isatty", (lambda: False))
     gf1 = GraphFrame.from_literal(small_mock1)
@@ -1192,3 +1544,20 @@ def test_generate_exclusive_columns_w_multi_index(calc_pi_hpct_db):
     gf_time.generate_exclusive_columns()
     assert "time (exc)" in gf_time.exc_metrics
     assert gf.dataframe["time"].equals(gf_time.dataframe["time (exc)"])
+
+
+def test_generate_exclusive_columns_dag():
+    d = Node(Frame(name="d"))
+    gf = GraphFrame.from_lists(("a", ("b", d), ("c", d, "e")))
+    (a, b, d, c, e) = gf.graph.traverse()
+    gf.dataframe.loc[e, "time (inc)"] = np.nan
+    gf.dataframe.drop(columns=["time"], inplace=True)
+    gf.exc_metrics.remove("time")
+    expected = gf.copy()
+
+    gf.generate_exclusive_columns()
+    expected._generate_exclusive_columns_reference([("time", "time (inc)")])
+    assert gf.dataframe["time"].equals(expected.dataframe["time"])
+    # NaN inclusive values of children are ignored
+    assert gf.dataframe.loc[c, "time"] == 2
+    assert np.isnan(gf.dataframe.loc[e, "time"])
@@ -3,8 +3,11 @@
 #
 # SPDX-License-Identifier: MIT
 
+import sys
+
 import pytest
 
+from hatchet import GraphFrame
 from hatchet.node import Node, MultiplePathError
 from hatchet.frame import Frame
 from hatchet.graph import Graph
@@ -57,6 +60,34 @@ def test_traverse_dag():
     assert list(node.traverse(attrs="name")) == ["a", "b", "d", "c"]
 
 
+def test_traverse_deep_chain():
+    root = node = Node(Frame(name="n"))
+    for i in range(5 * sys.getrecursionlimit()):
+        child = Node(Frame(name="n%d" % i), parent=node)
+        node.add_child(child)
+        node = child
+
+    visited = {}
+    nodes = list(root.traverse(order="post", visited=visited))
+    assert len(nodes) == len(visited)
+    assert nodes[0] is node and nodes[-1] is root
+
+
+def test_sorted_children():
+    node = Node.from_lists(["a", "c", "b"])
+    assert [c.frame["name"] for c in node.sorted_children()] == ["b", "c"]
+
+    node.add_child(Node(Frame(name="a")))
+    assert [c.frame["name"] for c in node.sorted_children()] == ["a", "b", "c"]
+
+    node.children = node.children[:1]
+    assert [c.frame["name"] for c in node.sorted_children()] == ["c"]
+
+    # children replaced in place
+    node.children[0] = Node(Frame(name="d"))
+    assert list(node.traverse(attrs="name")) == ["a", "d"]
+
+
 def test_node_repr():
     d = Node(Frame(a=1, b=2, c=3))
     assert repr(d) == "Node({'a': 1, 'b': 2, 'c': 3, 'type': 'None'})"
@@ -122,3 +153,35 @@ def check_dag_equal():
 
     assert not diamond.dag_equal(chain)
     assert not diamond.dag_equal(tree)
+
+
+def graph_bytes_per_node(graph):
+    """Average memory used by the nodes and (distinct) frames of a graph."""
+    nodes = list(graph.traverse())
+    frames = {id(n.frame): n.frame for n in nodes}
+    size = 0
+    for obj in nodes + list(frames.values()):
+        size += sys.getsizeof(obj)
+        if hasattr(obj, "__dict__"):
+            size += sys.getsizeof(obj.__dict__)
+    for node in nodes:
+        size += sys.getsizeof(node.children) + sys.getsizeof(node.parents)
+    for frame in frames.values():
+        size += sys.getsizeof(frame.attrs)
+    return size / len(nodes)
+
+
+@pytest.mark.parametrize(
+    "reader, data",
+    [
+        (GraphFrame.from_hpctoolkit, "calc_pi_hpct_db"),
+        (GraphFrame.from_caliper, "lulesh_caliper_json"),
+        (GraphFrame.from_cprofile, "hatchet_cycle_pstats"),
+    ],
+)
+def test_memory_per_node(reader, data, request):
+    gf = reader(str(request.getfixturevalue(data)))
+    bytes_per_node = graph_bytes_per_node(gf.graph)
+
+    assert not hasattr(Node(Frame(name="a")), "__dict__")
+    assert bytes_per_node < 600
@@ -5,12 +5,18 @@
 
 import pytest
 
+import gc
 import re
+import sys
+import weakref
 
 import numpy as np
+import pandas as pd
 
 from hatchet import GraphFrame
-from hatchet.node import traversal_order
+from hatchet.frame import Frame
+from hatchet.graph import Graph
+from hatchet.node import Node, traversal_order
 from hatchet.query import (
     Query,
     ObjectQuery,
@@ -24,6 +30,7 @@ from hatchet.query import (
     DisjunctionQuery,
     ExclusiveDisjunctionQuery,
     NegationQuery,
+    vectorized_predicate,
 )
 from hatchet.query.errors import MultiIndexModeMismatch
 
@@ -247,6 +254,121 @@ def test_node_caching(mock_graph_literal):
     assert 3 not in engine.search_cache[node._hatchet_nid]
 
 
+def test_nodes_caching(mock_graph_literal):
+    path = [{"name": "fr[a-z]+"}, ("+", {"time (inc)": ">= 25.0"}), {"name": "baz"}]
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    query = ObjectQuery(path)
+
+    engine = QueryEngine()
+    engine._cache_nodes(query, gf.graph, gf.dataframe)
+    expected = QueryEngine()
+    for node in gf.graph.traverse():
+        expected._cache_node(node, query, gf.dataframe)
+    assert engine.search_cache == expected.search_cache
+
+
+def test_vectorized_predicate(mock_graph_literal):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+
+    def row_predicate(row):
+        raise AssertionError("vectorized predicates are not evaluated per row")
+
+    predicate = vectorized_predicate(
+        row_predicate,
+        lambda df: (df["time (inc)"] >= 25.0).groupby(level="node").any(),
+    )
+    query = Query().match(".", lambda row: row["name"] == "foo").rel("*", predicate)
+    expected = (
+        Query()
+        .match(".", lambda row: row["name"] == "foo")
+        .rel("*", lambda row: row["time (inc)"] >= 25.0)
+    )
+
+    engine = QueryEngine()
+    expected_matches = engine.apply(expected, gf.graph, gf.dataframe)
+    matches = engine.apply(query, gf.graph, gf.dataframe)
+    assert len(matches) > 1
+    assert sorted(matches) == sorted(expected_matches)
+    assert len(engine.search_cache) == len(gf.graph)
+
+
+def test_predicate_cache(mock_graph_literal):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    calls = []
+
+    def frame_predicate(df):
+        calls.append(df)
+        return (df["time (inc)"] >= 25.0).groupby(level="node").any()
+
+    def make_predicate():
+        return vectorized_predicate(
+            lambda row: row["time (inc)"] >= 25.0,
+            frame_predicate,
+            fingerprint="time (inc) >= 25",
+        )
+
+    engine = QueryEngine()
+    query = Query().match("*", make_predicate())
+    matches = engine.apply(query, gf.graph, gf.dataframe)
+    assert len(calls) == 1
+
+    # equivalent predicates are evaluated once per DataFrame
+    query = Query().match(".", make_predicate()).rel("+", make_predicate())
+    engine.apply(query, gf.graph, gf.dataframe)
+    assert sorted(
+        engine.apply(Query().match("*", make_predicate()), gf.graph, gf.dataframe)
+    ) == sorted(matches)
+    assert len(calls) == 1
+
+    # replacing a column invalidates the cached results
+    gf.dataframe["time (inc)"] = gf.dataframe["time (inc)"] * 2
+    more_matches = engine.apply(
+        Query().match("*", make_predicate()), gf.graph, gf.dataframe
+    )
+    assert len(calls) == 2
+    assert len(more_matches) > len(matches)
+
+    # and so does modifying its values in place
+    gf.dataframe.loc[:, "time (inc)"] = 0.0
+    assert (
+        engine.apply(Query().match("*", make_predicate()), gf.graph, gf.dataframe) == []
+    )
+    assert len(calls) == 3
+
+    engine.clear_predicate_cache()
+    engine.apply(Query().match("*", make_predicate()), gf.graph, gf.dataframe)
+    assert len(calls) == 4
+
+    # the cache is bounded
+    engine = QueryEngine(max_cached_predicates=2)
+    for name in ["foo", "bar", "baz"]:
+        engine.apply(ObjectQuery([{"name": name}]), gf.graph, gf.dataframe)
+    assert len(engine.predicate_cache) == 2
+
+    # subqueries of compound queries share their results
+    query = Query().match(".", make_predicate()) | Query().match("+", make_predicate())
+    engine = QueryEngine()
+    engine.apply(query, gf.graph, gf.dataframe)
+    assert len(calls) == 5
+
+    # the cache does not keep the data alive
+    dframe = gf.dataframe.set_axis(gf.dataframe.index.copy())
+    index = weakref.ref(dframe.index)
+    engine.apply(ObjectQuery([{"name": "foo"}]), gf.graph, dframe)
+    assert len(engine.predicate_cache) == 2
+    del dframe
+    gc.collect()
+    assert index() is None
+
+    # through GraphFrame.filter
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    filtered = gf.filter([{"time": "> 9"}], squash=False)
+    assert len(filtered.dataframe) == (gf.dataframe["time"] > 9).sum()
+    gf.dataframe.loc[:, "time"] = 100.0
+    filtered = gf.filter([{"time": "> 9"}], squash=False)
+    assert len(filtered.dataframe) == len(gf.dataframe)
+
+
 def test_match_0_or_more_wildcard(mock_graph_literal):
     path = [
         {"name": "qux"},
@@ -490,6 +612,60 @@ def test_apply(mock_graph_literal):
     assert sorted(engine.apply(query, gf.graph, gf.dataframe)) == sorted(match)
 
 
+def test_apply_matches_paths(mock_graph_literal):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    queries = [
+        Query().match("*").rel(".", lambda row: row["name"] == "baz"),
+        Query().match(".", lambda row: row["time"] >= 5.0).rel("*").rel("."),
+        Query()
+        .match("+", lambda row: row["time (inc)"] > 10.0)
+        .rel("*", lambda row: row["name"] != "corge")
+        .rel(".", lambda row: row["name"] == "grault"),
+        Query().match(2).rel("*", lambda row: row["time"] < 10.0),
+    ]
+    for query in queries:
+        # all the nodes of the paths that match the query from every node
+        engine = QueryEngine()
+        engine._cache_nodes(query, gf.graph, gf.dataframe)
+        expected = set()
+        for node in gf.graph.traverse():
+            starts = [0]
+            if query.query_pattern[0][0] == "*":
+                starts.append(1)
+            for i in starts:
+                if i in engine.search_cache[node._hatchet_nid]:
+                    paths = engine._match_pattern(query, gf.dataframe, node, i)
+                    for path in paths or []:
+                        expected.update(path)
+        matches = QueryEngine().apply(query, gf.graph, gf.dataframe)
+        assert len(matches) == len(set(matches))
+        assert set(matches) == expected
+
+
+def test_apply_deep_wildcards():
+    depth = 2 * sys.getrecursionlimit()
+    nodes = [Node(Frame(name="n%d" % (i % 3))) for i in range(depth)]
+    for parent, child in zip(nodes, nodes[1:]):
+        parent.add_child(child)
+        child.add_parent(parent)
+    graph = Graph(nodes[:1])
+    graph.enumerate_traverse()
+    df = pd.DataFrame(
+        {"node": nodes, "name": [n.frame["name"] for n in nodes]}
+    ).set_index("node")
+
+    query = (
+        Query()
+        .match("*")
+        .rel(".", lambda row: row["name"] == "n1")
+        .rel("*")
+        .rel(".", lambda row: row["name"] == "n2")
+    )
+    # the nodes after the last "n2" are not part of any match
+    matches = QueryEngine().apply(query, graph, df)
+    assert sorted(matches) == sorted(nodes[: depth - depth % 3])
+
+
 def test_apply_indices(calc_pi_hpct_db):
     gf = GraphFrame.from_hpctoolkit(str(calc_pi_hpct_db))
     main = gf.graph.roots[0].children[0]
@@ -694,6 +870,35 @@ def test_object_dialect_multi_condition_one_attribute(mock_graph_literal):
     assert sorted(engine.apply(query, gf.graph, gf.dataframe)) == sorted(matches)
 
 
+def test_object_dialect_vectorized(mock_graph_literal, tau_profile_dir):
+    queries = [
+        ("off", GraphFrame.from_literal(mock_graph_literal)),
+        ("any", GraphFrame.from_tau(tau_profile_dir)),
+        ("all", GraphFrame.from_tau(tau_profile_dir)),
+    ]
+    filters = [
+        {"name": "[a-z]+", "time (inc)": ["> 5", "<= 17983.0"]},
+        {"name": ".*a.*", "depth": "< 2"},
+        {"time": "!= np.nan", "node_id": "> 2"},
+        {"time": 5.0},
+    ]
+    for mode, gf in queries:
+        for attr_filter in filters:
+            query = ObjectQuery([attr_filter], multi_index_mode=mode)
+            predicate = query.query_pattern[0][1]
+            frame_matches = predicate.vectorized(gf.dataframe)
+            assert frame_matches is not None
+            for node, row in QueryEngine()._node_rows(gf.dataframe):
+                assert frame_matches[node] == predicate(row)
+
+    # Mismatched types are reported by the per-node predicate
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    query = ObjectQuery([{"name": 5}])
+    assert query.query_pattern[0][1].vectorized(gf.dataframe) is None
+    with pytest.raises(InvalidQueryFilter):
+        QueryEngine().apply(query, gf.graph, gf.dataframe)
+
+
 def test_obj_query_is_query():
     assert issubclass(ObjectQuery, Query)
 
@@ -835,6 +1040,125 @@ def test_exc_disjunction_query(mock_graph_literal):
     )
 
 
+def test_compound_query_masks(mock_graph_literal):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    query1 = [("*", {"time (inc)": [">= 5.0", "<= 10.0"]})]
+    query2 = [("*", {"time (inc)": 10.0})]
+    engine = QueryEngine()
+    nodes = list(gf.graph.compact().nodes)
+    results = [
+        set(engine.apply(query, gf.graph, gf.dataframe))
+        for query in [ObjectQuery(query1), ObjectQuery(query2)]
+    ]
+    compound_queries = [
+        (ConjunctionQuery(query1, query2), results[0] & results[1]),
+        (DisjunctionQuery(query1, query2), results[0] | results[1]),
+        (ExclusiveDisjunctionQuery(query1, query2), results[0] ^ results[1]),
+        (NegationQuery(query1), set(nodes) - results[0]),
+    ]
+    for compound_query, expected in compound_queries:
+        mask = engine.apply_mask(compound_query, gf.graph, gf.dataframe)
+        assert mask.dtype == bool and len(mask) == len(nodes)
+        assert {n for n, m in zip(nodes, mask) if m} == expected
+
+    # compound queries that only combine lists of nodes
+    class FirstQuery(CompoundQuery):
+        def _apply_op_to_results(self, subquery_results, graph):
+            return subquery_results[0]
+
+    mask = engine.apply_mask(FirstQuery(query1, query2), gf.graph, gf.dataframe)
+    assert {n for n, m in zip(nodes, mask) if m} == results[0]
+
+
+def test_apply_parallel(monkeypatch, mock_graph_literal, tau_profile_dir):
+    import hatchet.query.engine
+
+    monkeypatch.setattr(hatchet.query.engine, "_MIN_NODES_PER_PROC", 1)
+    engine = QueryEngine()
+
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    # predicates on single rows, which are evaluated node by node
+    query = (
+        Query()
+        .match(".", lambda row: row["name"] == "foo")
+        .rel("*")
+        .rel(".", lambda row: row["time (inc)"] >= 5 and row["name"] != "qux")
+    )
+    serial = engine.apply(query, gf.graph, gf.dataframe)
+    assert sorted(serial) == sorted(
+        engine.apply(query, gf.graph, gf.dataframe, num_procs=3)
+    )
+    assert gf.filter(query, num_procs=1).dataframe.equals(
+        gf.filter(query, num_procs=3).dataframe
+    )
+    # predicates reading the graph around the node see the whole graph
+    query = Query().match(
+        ".",
+        lambda row: not row.name.children
+        and [p.frame["name"] for p in row.name.parents] == ["waldo"],
+    )
+    serial = engine.apply(query, gf.graph, gf.dataframe)
+    assert len(serial) > 0
+    assert sorted(serial) == sorted(
+        engine.apply(query, gf.graph, gf.dataframe, num_procs=3)
+    )
+
+    gf = GraphFrame.from_tau(str(tau_profile_dir))
+    query = Query().match(".", lambda df: df["time"].max() > 1000)
+    serial = engine.apply(query, gf.graph, gf.dataframe)
+    assert len(serial) > 0
+    assert sorted(serial) == sorted(
+        engine.apply(query, gf.graph, gf.dataframe, num_procs=4)
+    )
+
+    # errors raised by predicates in other processes are reraised
+    def raise_error(row):
+        raise ValueError("bad predicate")
+
+    with pytest.raises(ValueError, match="bad predicate"):
+        engine.apply(
+            Query().match(".", raise_error), gf.graph, gf.dataframe, num_procs=2
+        )
+
+
+def test_explain(mock_graph_literal):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    engine = QueryEngine()
+    time_ge_5 = vectorized_predicate(
+        lambda row: row["time (inc)"] >= 5,
+        lambda df: df["time (inc)"] >= 5,
+        fingerprint="time (inc) >= 5",
+    )
+    query = Query().match(".", lambda row: row["name"] == "foo").rel("*", time_ge_5)
+
+    report = engine.explain(query, gf.graph, gf.dataframe)
+    matches = engine.apply(query, gf.graph, gf.dataframe)
+    assert report.num_nodes == len(gf.graph)
+    assert report.num_matches == len(matches)
+    assert [stage["quantifier"] for stage in report.stages] == [".", "*"]
+    assert [stage["evaluation"] for stage in report.stages] == ["rows", "vectorized"]
+    assert report.stages[0]["evaluations"] == len(gf.graph)
+    assert report.stages[0]["matches"] == 1
+    assert report.stages[1]["matches"] == len(
+        gf.dataframe[gf.dataframe["time (inc)"] >= 5]
+    )
+    assert report.stages[1]["expansions"] > 0
+    assert report.stages[1]["accepted"] <= report.stages[1]["reached"]
+    assert "predicates" in str(report.timer)
+    assert "match" in str(report.timer)
+
+    # the vectorized predicate is now cached, and the report is nested
+    # for compound queries
+    report = engine.explain(query | query, gf.graph, gf.dataframe)
+    assert report.operation == "DisjunctionQuery"
+    assert report.num_matches == len(matches)
+    assert [sub.stages[1]["evaluation"] for sub in report.subqueries] == [
+        "cached",
+        "cached",
+    ]
+    assert "DisjunctionQuery" in str(report)
+
+
 def test_construct_string_dialect():
     mock_node_mpi = {"name": "MPI_Bcast"}
     mock_node_ibv = {"name": "ibv_reg_mr"}
@@ -1142,6 +1466,73 @@ def test_apply_string_dialect(mock_graph_literal):
     assert engine.apply(query, gf.graph, gf.dataframe) == match
 
 
+def test_string_dialect_vectorized(mock_graph_literal, tau_profile_dir):
+    queries = [
+        ("off", GraphFrame.from_literal(mock_graph_literal)),
+        ("any", GraphFrame.from_tau(tau_profile_dir)),
+        ("all", GraphFrame.from_tau(tau_profile_dir)),
+    ]
+    conditions = """WHERE p."name" STARTS WITH "M" OR p."time" < 24.0
+        AND NOT p."time (inc)" IS NAN OR p IS LEAF AND p."depth" > 1"""
+    for mode, gf in queries:
+        query = StringQuery('MATCH (".", p)->("*") ' + conditions, mode)
+        predicate = query.query_pattern[0][1]
+        frame_matches = predicate.vectorized(gf.dataframe)
+        assert frame_matches is not None
+        for node, row in QueryEngine()._node_rows(gf.dataframe):
+            assert frame_matches[node] == predicate(row)
+
+    # Unchecked conditions on missing columns are evaluated row by row
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    query = StringQuery("""MATCH (p) WHERE p."name" = "foo" OR p."missing" IS NONE""")
+    assert query.query_pattern[0][1].vectorized(gf.dataframe) is None
+    matches = QueryEngine().apply(query, gf.graph, gf.dataframe)
+    assert matches == [gf.graph.roots[0]]
+
+
+def test_string_dialect_without_conditions(mock_graph_literal):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    engine = QueryEngine()
+    query = StringQuery("MATCH (p)")
+    assert sorted(engine.apply(query, gf.graph, gf.dataframe)) == sorted(
+        gf.graph.traverse()
+    )
+    query = StringQuery(
+        """MATCH (p)->(".", q)
+        WHERE p."name" = "bar"
+        """
+    )
+    matches = engine.apply(ObjectQuery([{"name": "bar"}, "."]), gf.graph, gf.dataframe)
+    assert len(matches) == 9
+    assert sorted(engine.apply(query, gf.graph, gf.dataframe)) == sorted(matches)
+
+
+def test_string_dialect_parse_cache(mock_graph_literal):
+    gf = GraphFrame.from_literal(mock_graph_literal)
+    engine = QueryEngine()
+    path = """MATCH (p)->("*")->(q)
+    WHERE p."name" = "foo" AND q."time (inc)" >= 5
+    """
+    query1 = StringQuery(path)
+    query2 = StringQuery(path)
+    query3 = StringQuery(path, multi_index_mode="any")
+    assert query1 is not query2
+    # the query is parsed once per multi_index_mode
+    assert [p for _, p in query1] == [p for _, p in query2]
+    assert [p for _, p in query1] != [p for _, p in query3]
+    assert sorted(engine.apply(query1, gf.graph, gf.dataframe)) == sorted(
+        engine.apply(query2, gf.graph, gf.dataframe)
+    )
+
+    # modifying a query doesn't modify the cached one
+    query1.rel(".")
+    assert len(query1) == len(query2) + 1
+    assert len(StringQuery(path)) == len(query2)
+
+    with pytest.raises(InvalidQueryPath):
+        StringQuery("MATCH p")
+
+
 def test_string_conj_compound_query(mock_graph_literal):
     gf = GraphFrame.from_literal(mock_graph_literal)
     compound_query1 = parse_string_dialect(
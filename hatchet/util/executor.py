@@ -0,0 +1,284 @@
+# Copyright 2017-2023 Lawrence Livermore National Security, LLC and other
+# Hatchet Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+
+import atexit
+import gc
+import pickle
+import time
+
+import multiprocess as mp
+from multiprocess import shared_memory
+import numpy as np
+import pandas as pd
+
+from ..frame import Frame
+from ..node import Node
+
+
+# Process pool reused by all parallel operations, created on first use
+_pool = None
+_pool_size = 0
+
+
+def get_pool(num_procs):
+    """Get the process pool shared by parallel operations.
+
+    The pool is created the first time it is needed, and only re-created
+    when more processes are requested than it has.
+
+    Arguments:
+        num_procs (int): the number of processes needed
+
+    Returns:
+        (multiprocess.pool.Pool): the pool
+    """
+    global _pool, _pool_size
+    if _pool is None or _pool_size < num_procs:
+        shutdown_pool()
+        # Keep the garbage collector of the workers from scanning the objects
+        # inherited from this process every time they build DataFrames
+        _pool = mp.Pool(num_procs, initializer=gc.freeze)
+        _pool_size = num_procs
+    return _pool
+
+
+def shutdown_pool():
+    """Terminate the processes of the shared pool, if it was created."""
+    global _pool, _pool_size
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+    _pool = None
+    _pool_size = 0
+
+
+atexit.register(shutdown_pool)
+
+# Seconds between checks that the workers of the pool are still alive
+_POLL_INTERVAL = 0.1
+
+
+def run_in_pool(function, arguments, num_procs, timeout=None):
+    """Apply a function to every tuple of arguments in the shared pool.
+
+    Unlike ``Pool.starmap``, this does not wait forever for the results of
+    a worker that died (e.g., killed for running out of memory): the pool
+    is then terminated, and an error raised.
+
+    Arguments:
+        function (callable): the function, accepting each tuple of arguments
+        arguments (list): the tuples of arguments
+        num_procs (int): the number of processes
+        timeout (float, optional): the number of seconds after which to stop
+            waiting for the results (default: no limit)
+
+    Returns:
+        (list): the results, in the order of the arguments
+    """
+    pool = get_pool(num_procs)
+    workers = list(pool._pool)
+    result = pool.starmap_async(function, arguments)
+    start = time.monotonic()
+    while not result.ready():
+        result.wait(_POLL_INTERVAL)
+        if result.ready():
+            break
+        if not all(worker.is_alive() for worker in workers):
+            shutdown_pool()
+            raise RuntimeError("A worker process of the pool died.")
+        if timeout is not None and time.monotonic() - start > timeout:
+            shutdown_pool()
+            raise TimeoutError(
+                "The workers of the pool did not finish in %g seconds." % timeout
+            )
+    return result.get()
+
+
+# The graph of the last SharedFrame read by this (worker) process, as the
+# name of its block of shared memory and its nodes
+_worker_graph = None
+
+
+class SharedFrame(object):
+    """A DataFrame split into chunks of rows processed by the shared pool.
+
+    The columns with a numeric NumPy dtype are copied once into shared
+    memory, which the chunks only reference. The nodes of the "node" column
+    are referenced by their positions in the graph, whose frames and
+    topology are pickled once into shared memory as well. Every worker
+    rebuilds a copy of the graph from them (once per SharedFrame), so the
+    nodes seen by the workers have the same nids, depths, frames, parents
+    and children as the nodes of the graph, and compare equal to them. The
+    other columns are pickled with each chunk.
+
+    The shared memory is released by ``close``.
+
+    Arguments:
+        dframe (pandas.DataFrame): the rows
+        compact (CompactGraph): the array-based view of the graph of the
+            nodes of the "node" column, which must all be part of it
+    """
+
+    def __init__(self, dframe, compact):
+        self.dframe = dframe
+        self.columns = []
+        self.blocks = []
+        self.graph = None
+        try:
+            for name, column in dframe.items():
+                values = column.values
+                if name == "node" and len(values) and isinstance(values[0], Node):
+                    positions = compact.positions(values)
+                    if (positions < 0).any():
+                        raise ValueError("The nodes are not all part of the graph.")
+                    if self.graph is None:
+                        self.graph = self._share_graph(compact)
+                    self.columns.append((name, "node", self._share(positions)))
+                elif isinstance(values, np.ndarray) and values.dtype.kind in "biufcmM":
+                    self.columns.append((name, "shared", self._share(values)))
+                else:
+                    self.columns.append((name, "object", values))
+        except BaseException:
+            self.close()
+            raise
+
+    def _share(self, values):
+        """Copy an array into a new block of shared memory."""
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        self.blocks.append(block)
+        shared = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+        shared[:] = values
+        return (block.name, values.dtype.str, len(values))
+
+    def _share_graph(self, compact):
+        """Pickle the frames and topology of a graph into a new block of
+        shared memory."""
+        nodes = compact.nodes
+        graph = pickle.dumps(
+            (
+                [node.frame.attrs for node in nodes],
+                [node._hatchet_nid for node in nodes],
+                [node._depth for node in nodes],
+                compact.child_offsets.tolist(),
+                compact.child_indices.tolist(),
+                compact.parent_offsets.tolist(),
+                compact.parent_indices.tolist(),
+            ),
+            pickle.HIGHEST_PROTOCOL,
+        )
+        block = shared_memory.SharedMemory(create=True, size=len(graph))
+        self.blocks.append(block)
+        block.buf[: len(graph)] = graph
+        return (block.name, len(graph))
+
+    def chunks(self, num_chunks=None, bounds=None):
+        """Split the rows into contiguous chunks, to be passed to the workers
+        of the shared pool (see ``read_chunk``).
+
+        Arguments:
+            num_chunks (int): the number of chunks, of about the same size
+            bounds (list, optional): the rows at which the chunks start,
+                followed by the number of rows, instead of num_chunks
+
+        Returns:
+            (list): the chunks, pickled (with the standard pickle module,
+            much faster than dill on large lists and dicts)
+        """
+        if bounds is None:
+            bounds = np.linspace(0, len(self.dframe), num_chunks + 1).astype(np.int64)
+        bounds = np.asarray(bounds, dtype=np.int64)
+        chunks = []
+        for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            columns = []
+            for name, kind, payload in self.columns:
+                if kind == "object":
+                    payload = payload[start:end]
+                elif kind == "node":
+                    payload = (payload, self.graph)
+                columns.append((name, kind, payload))
+            chunk = (start, end, self.dframe.index[start:end], columns)
+            chunks.append(pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL))
+        return chunks
+
+    def close(self):
+        """Release the shared memory."""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def read_chunk(chunk):
+    """Rebuild the rows of a chunk of a SharedFrame in a worker.
+
+    Returns:
+        (pandas.DataFrame): the rows
+    """
+    start, end, index, columns = pickle.loads(chunk)
+    data = {}
+    for name, kind, payload in columns:
+        if kind == "object":
+            data[name] = payload
+        elif kind == "shared":
+            data[name] = _read_shared(payload, start, end)
+        else:
+            shared, graph = payload
+            data[name] = _read_graph(graph)[_read_shared(shared, start, end)]
+    return pd.DataFrame(data, index=index)
+
+
+def _read_graph(graph):
+    """Rebuild the graph of a SharedFrame, unless this process already did.
+
+    Returns:
+        (ndarray): the nodes, indexed by position
+    """
+    global _worker_graph
+    name, size = graph
+    if _worker_graph is None or _worker_graph[0] != name:
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            (
+                attrs,
+                nids,
+                depths,
+                child_offsets,
+                child_indices,
+                parent_offsets,
+                parent_indices,
+            ) = pickle.loads(bytes(block.buf[:size]))
+        finally:
+            block.close()
+        # the collector would scan the graph over and over while the nodes
+        # are allocated (see Graph.copy)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            nodes = [
+                Node(Frame(dict(frame_attrs)), hnid=nid, depth=depth)
+                for frame_attrs, nid, depth in zip(attrs, nids, depths)
+            ]
+            children = [nodes[c] for c in child_indices]
+            parents = [nodes[p] for p in parent_indices]
+            for i, node in enumerate(nodes):
+                node.children = children[child_offsets[i] : child_offsets[i + 1]]
+                node.parents = parents[parent_offsets[i] : parent_offsets[i + 1]]
+        finally:
+            if gc_enabled:
+                gc.enable()
+        array = np.empty(len(nodes), dtype=object)
+        array[:] = nodes
+        _worker_graph = (name, array)
+    return _worker_graph[1]
+
+
+def _read_shared(shared, start, end):
+    """Copy a slice of an array out of a block of shared memory."""
+    name, dtype, length = shared
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(length, dtype=dtype, buffer=block.buf)[start:end].copy()
+    finally:
+        block.close()
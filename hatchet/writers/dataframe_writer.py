@@ -58,6 +58,8 @@ class DataframeWriter(ABC):
 
     def write(self, gf, **kwargs):
         gf_cpy = gf.deepcopy()
+        # the nodes are unlinked from the graph below
+        gf_cpy.own_graph()
         dump_df = _fill_children_and_parents(gf_cpy.dataframe)
         dump_df["exc_metrics"] = None
         dump_df.iat[0, dump_df.columns.get_loc("exc_metrics")] = gf_cpy.exc_metrics